@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Time GitLogsParser.get_contributors(), parse() and format_results() on synthetic repositories of several sizes, and report the timings as JSON.
+
+The repositories are built in a temporary directory, so no network access is needed, e.g.:
+    python benchmarks/bench_parse.py --scales small,medium --output report.json
+
+Compare a report with one made before a change, to spot regressions in review:
+    python benchmarks/bench_parse.py --scales small,medium --baseline report.json
+which exits with status 1 if any operation became slower than the threshold allows.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from gitlogstats import GitLogsParser
+from gitlogstats.constants import OUTPUT_FORMATS
+
+from synthetic import EXCLUSIONS, make_repository
+
+# the settings of the synthetic repository of each scale
+SCALES = {
+    "small": {"commits": 500, "authors": 10, "files": 50},
+    "medium": {"commits": 5000, "authors": 50, "files": 300},
+    "large": {"commits": 20000, "authors": 200, "files": 1000},
+}
+
+# the ways of parsing timed at each scale, as (mode, backend, where exclusions are matched) tuples
+PARSE_MODES = [
+    ("per-contributor", "git", "git"),
+    ("single-pass", "git", "git"),
+    ("per-contributor", "python", "git"),
+    ("single-pass", "python", "git"),
+    ("per-contributor", "git", "python"),
+    ("single-pass", "git", "python"),
+]
+
+# results are formatted as if from this many repositories, since a single repository's rows take next to no time
+FORMAT_REPOSITORIES = 100
+
+
+def time_call(function, repeat):
+    """
+    Time several calls of a function.
+    @param function: the function to call, without arguments
+    @param repeat: how many times to call it
+    @returns: a tuple of a dictionary of the fastest, median and every time taken, in seconds, and the value the last call returned
+    """
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = function()
+        seconds.append(time.perf_counter() - started)
+    timing = {
+        "min": round(min(seconds), 6),
+        "median": round(statistics.median(seconds), 6),
+        "seconds": [round(s, 6) for s in seconds],
+    }
+    return timing, value
+
+
+def benchmark(repo, repeat):
+    """
+    Time each operation of interest on a repository.
+    @param repo: the path to the repository
+    @param repeat: how many times to time each operation
+    @returns: a dictionary of timings, by the name of the operation, e.g. "parse/single-pass/git"
+    """
+
+    def make_parser(single_pass=False, backend="git", match_exclusions="git"):
+        return GitLogsParser(
+            repo=repo,
+            start="01/01/2023",
+            end="12/31/2030",
+            username=None,
+            exclusions=EXCLUSIONS,
+            clean=True,
+            single_pass=single_pass,
+            backend=backend,
+            match_exclusions=match_exclusions,
+        )
+
+    timings = {}
+    timings["get_contributors"], _ = time_call(
+        lambda: make_parser().get_contributors(), repeat
+    )
+    formatter = make_parser()
+    results = None
+    for mode, backend, match_exclusions in PARSE_MODES:
+        # named as before exclusions could be matched in python, so earlier reports can still be compared
+        name = f"parse/{mode}/{backend}"
+        if match_exclusions != "git":
+            name += f"/match-exclusions-{match_exclusions}"
+        timings[name], parsed = time_call(
+            lambda: make_parser(mode == "single-pass", backend, match_exclusions).parse(), repeat
+        )
+        if results is None:
+            results = parsed
+        elif sorted(parsed, key=lambda e: e["username"]) != sorted(
+            results, key=lambda e: e["username"]
+        ):
+            raise RuntimeError(f"{name} disagrees with the results of the first mode")
+    rows = results * FORMAT_REPOSITORIES
+    for output_format in OUTPUT_FORMATS:
+        timings[f"format_results/{output_format}"], _ = time_call(
+            lambda: formatter.format_results(rows, output_format), repeat
+        )
+    return timings
+
+
+def compare(report, baseline, threshold):
+    """
+    Find the operations that became slower since a baseline report.
+    @param report: the report just made
+    @param baseline: an earlier report, of the same scales
+    @param threshold: how many times slower than before an operation may be without counting as a regression, e.g. 1.25
+    @returns: a list of (scale, operation, seconds before, seconds now) tuples, comparing the fastest times
+    """
+    before = {
+        (scale["name"], operation): timing["min"]
+        for scale in baseline["scales"]
+        for operation, timing in scale["timings"].items()
+    }
+    regressions = []
+    for scale in report["scales"]:
+        for operation, timing in scale["timings"].items():
+            seconds = before.get((scale["name"], operation))
+            if seconds and timing["min"] > seconds * threshold:
+                regressions.append((scale["name"], operation, seconds, timing["min"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scales",
+        help=f"A comma-separated list of the scales to benchmark, from {', '.join(SCALES)}",
+        default="small,medium",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="How many times to time each operation")
+    parser.add_argument("--binary-ratio", type=float, default=0.05)
+    parser.add_argument("--excluded-ratio", type=float, default=0.1)
+    parser.add_argument("--merge-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="The file to write the report to.  Defaults to the standard output")
+    parser.add_argument("--baseline", help="An earlier report to compare the timings with")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="How many times slower than the baseline an operation may be before it counts as a regression",
+    )
+    args = parser.parse_args()
+    scales = args.scales.split(",")
+    for name in scales:
+        if name not in SCALES:
+            parser.error(f"unknown scale {name}, choose from {', '.join(SCALES)}")
+
+    report = {
+        "python": platform.python_version(),
+        "git": subprocess.run(["git", "--version"], capture_output=True, text=True).stdout.strip(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "scales": [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in scales:
+            settings = dict(
+                SCALES[name],
+                binary_ratio=args.binary_ratio,
+                excluded_ratio=args.excluded_ratio,
+                merge_ratio=args.merge_ratio,
+                seed=args.seed,
+            )
+            repo = os.path.join(tmp, name)
+            started = time.perf_counter()
+            make_repository(repo, **settings)
+            print(f"{name}: built in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+            timings = benchmark(repo, args.repeat)
+            report["scales"].append({"name": name, "settings": settings, "timings": timings})
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf8") as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        for scale, operation, before, now in regressions:
+            print(f"slower: {scale} {operation}: {before:.3f}s -> {now:.3f}s", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
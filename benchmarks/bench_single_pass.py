@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Compare the time taken by GitLogsParser.parse() when walking the git logs once per contributor versus once in total.
+
+Builds a synthetic repository in a temporary directory, so no network access is needed, e.g.:
+    python benchmarks/bench_single_pass.py --commits 5000 --authors 80
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from gitlogstats import GitLogsParser
+
+from synthetic import make_repository
+
+
+def time_parse(repo, single_pass):
+    """
+    Time one full parse of the given repository.
+    @returns: a tuple of the elapsed seconds and the parsed results
+    """
+    parser = GitLogsParser(
+        repo=repo,
+        start="01/01/2023",
+        end="12/31/2025",
+        username=None,
+        clean=True,
+        single_pass=single_pass,
+    )
+    started = time.perf_counter()
+    results = parser.parse()
+    return time.perf_counter() - started, results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--commits", type=int, default=2000)
+    parser.add_argument("--authors", type=int, default=40)
+    parser.add_argument("--files", type=int, default=200)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = os.path.join(tmp, "synthetic")
+        make_repository(repo, args.commits, args.authors, args.files)
+        try:
+            per_contributor, expected = time_parse(repo, single_pass=False)
+            single_pass, results = time_parse(repo, single_pass=True)
+        finally:
+            os.chdir(cwd)
+
+    def by_name(entries):
+        return sorted(entries, key=lambda entry: entry["username"])
+
+    print(f"commits: {args.commits}, authors: {args.authors}")
+    print(f"per-contributor: {per_contributor:.3f}s")
+    print(f"single pass:     {single_pass:.3f}s")
+    print(f"speedup:         {per_contributor / single_pass:.1f}x")
+    print(f"same results:    {by_name(expected) == by_name(results)}")
+
+
+if __name__ == "__main__":
+    main()
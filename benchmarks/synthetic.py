@@ -0,0 +1,110 @@
+"""
+Generate local git repositories with synthetic histories to benchmark gitlogstats against, without any network access.
+
+Histories are written with git fast-import, so even tens of thousands of commits take only seconds to build, and are the same every time for the same settings.
+"""
+
+import random
+import subprocess
+
+# 01/01/2023, the date of the first commit of every synthetic history
+FIRST_TIMESTAMP = 1672531200
+
+# the exclusions that match the excluded paths of synthetic histories, i.e. gitlogstats' default exclusions that apply
+EXCLUSIONS = ["*.json", "*.png"]
+
+
+def make_repository(
+    path,
+    commits,
+    authors,
+    files,
+    seed=0,
+    binary_ratio=0.0,
+    excluded_ratio=0.0,
+    merge_ratio=0.0,
+):
+    """
+    Create a git repository at the given path with a synthetic history, using git fast-import.
+    @param path: the directory in which to create the repository
+    @param commits: the number of commits to create, including merges
+    @param authors: the number of distinct authors to spread the commits across
+    @param files: the number of distinct files of each kind the commits touch
+    @param seed: the random seed, so runs are repeatable
+    @param binary_ratio: the fraction of changes made to binary files, e.g. 0.05
+    @param excluded_ratio: the fraction of changes made to files matched by EXCLUSIONS, e.g. 0.1
+    @param merge_ratio: the fraction of commits that merge a topic branch into main, e.g. 0.1.  when above 0, about half of all other commits are made on the topic branch, and any made since its last merge are left on it.
+    """
+    rng = random.Random(seed)
+    subprocess.run(["git", "init", "-q", "-b", "main", path], check=True)
+    stream = []
+    contents = {}  # path -> list of lines of a text file
+    timestamp = FIRST_TIMESTAMP
+    main = None  # the marks of the commits at the tip of each branch
+    topic = None
+    for i in range(1, commits + 1):
+        author = f"{rng.randrange(authors):04d}"  # fixed width, so no name is a substring of another
+        timestamp += rng.randrange(60, 3600)
+        merge = topic is not None and rng.random() < merge_ratio
+        on_topic = not merge and main is not None and merge_ratio > 0 and rng.random() < 0.5
+        message = f"Change number {i}"
+        stream.append("commit refs/heads/topic\n" if on_topic else "commit refs/heads/main\n")
+        stream.append(f"mark :{i}\n")
+        stream.append(
+            f"author Author {author} <author{author}@example.com> {timestamp} +0000\n"
+        )
+        stream.append(
+            f"committer Author {author} <author{author}@example.com> {timestamp} +0000\n"
+        )
+        stream.append(f"data {len(message)}\n{message}\n")
+        parent = (topic or main) if on_topic else main
+        if parent is not None:
+            stream.append(f"from :{parent}\n")
+        if merge:
+            # the topic branch is merged without changing any files, so the merge itself shows no stats, just like git log
+            stream.append(f"merge :{topic}\n")
+            main, topic = i, None
+            continue
+        for _ in range(rng.randrange(1, 4)):
+            roll = rng.random()
+            if roll < binary_ratio:
+                name = f"assets/image{rng.randrange(files)}.png"
+                data = b"\x89PNG\r\n\x1a\n\x00" + bytes(
+                    rng.randrange(256) for _ in range(rng.randrange(16, 512))
+                )
+            elif roll < binary_ratio + excluded_ratio:
+                name = f"data/records{rng.randrange(files)}.json"
+                data = "".join(
+                    f'{{"id": {rng.randrange(10 ** 6)}}}\n' for _ in range(rng.randrange(1, 40))
+                ).encode("utf-8")
+            else:
+                name = f"src/file{rng.randrange(files)}.py"
+                data = edit(rng, contents.setdefault(name, []))
+            stream.append(f"M 100644 inline {name}\n".encode("utf-8"))
+            stream.append(f"data {len(data)}\n".encode("utf-8") + data + b"\n")
+        if on_topic:
+            topic = i
+        else:
+            main = i
+    stream = [s if isinstance(s, bytes) else s.encode("utf-8") for s in stream]
+    subprocess.run(
+        ["git", "fast-import", "--quiet"],
+        input=b"".join(stream),
+        cwd=path,
+        check=True,
+    )
+    subprocess.run(["git", "checkout", "-q", "main"], cwd=path, check=True)
+
+
+def edit(rng, lines):
+    """
+    Make a random edit to the lines of a text file, deleting some and inserting others, as a developer might.
+    @param rng: the random number generator to use
+    @param lines: the lines of the file, which are changed in place
+    @returns: the new contents of the file
+    """
+    for _ in range(rng.randrange(0, min(len(lines), 5) + 1)):
+        del lines[rng.randrange(len(lines))]
+    for _ in range(rng.randrange(1, 20)):
+        lines.insert(rng.randrange(len(lines) + 1), f"line {rng.random()}\n")
+    return "".join(lines).encode("utf-8")
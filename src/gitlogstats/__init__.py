@@ -1,3 +1,10 @@
-from .git_logs_parser import GitLogsParser
-
 __all__ = ["GitLogsParser"]
+
+
+def __getattr__(name):
+    # the parser, and everything it imports, is only loaded once it is used, so the command line starts quickly
+    if name == "GitLogsParser":
+        from .git_logs_parser import GitLogsParser
+
+        return GitLogsParser
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
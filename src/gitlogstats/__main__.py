@@ -1,15 +1,78 @@
 import os
-import subprocess
 import argparse
+import contextlib
 import datetime
 import re
-from . import GitLogsParser
+import sys
+import time
+
+# only what every run needs is imported up front.  the rest is imported where it is used, so --help, and runs that do not use it, start quickly
+from .constants import (
+    BACKENDS,
+    BUCKETS,
+    CLONE_MODES,
+    DEFAULT_EXCLUSIONS,
+    EXCLUSION_MATCHERS,
+    OUTPUT_FORMATS,
+    REPORTS,
+    ROLLUPS,
+)
+
+
+def parse_repository(repo_dir, repos_dir, args, cache=None, profiler=None):
+    """
+    Parse the logs of the local copy of a repository.
+    @param repo_dir: the path to the local copy of the repository
+    @param repos_dir: the directory in which all cloned repositories are kept
+    @param args: the parsed command-line arguments
+    @param cache: the ResultCache to reuse earlier results from, if any
+    @param profiler: the Profiler to measure parsing with, if any
+    @returns: a tuple of the parser used and its results
+    """
+    from .git_logs_parser import GitLogsParser
+
+    store = None
+    if args.incremental:
+        from .commit_store import CommitStore
+
+        store = CommitStore(
+            os.path.join(
+                repos_dir, ".gitlogstats-commits", os.path.basename(repo_dir) + ".jsonl"
+            )
+        )
+    parser = GitLogsParser(
+        repo=repo_dir,
+        start=args.start,
+        end=args.end,
+        username=args.user,
+        exclusions=args.exclusions,
+        verbose=args.verbose,
+        clean=args.clean,
+        single_pass=args.single_pass,
+        branch=args.branch,
+        cache=cache,
+        store=store,
+        backend=args.backend,
+        profiler=profiler,
+        match_exclusions=args.match_exclusions,
+        branches=args.branches,
+        bucket=args.bucket,
+        aliases=args.aliases,
+    )
+    if args.report == "churn":
+        return parser, parser.parse_churn(args.top)
+    return parser, parser.parse()
 
 
 def main():
     """
-    Generate results using the GitLogsParser with command-line arguments.
+    Generate results using the GitLogsParser with command-line arguments, or serve them with "gitlogstats serve".
     """
+    if sys.argv[1:2] == ["serve"]:
+        from .server import main as serve  # only loaded by those running the server
+
+        return serve(sys.argv[2:])
+
     # use default dates
     today = datetime.date.today()
     str_today = today.strftime("%m/%d/%Y")  # the date today in standard US format
@@ -18,25 +81,6 @@ def main():
     )  # the the date one year ago from today
     str_last_year = last_year.strftime("%m/%d/%Y")
 
-    # default files to exclude from analysis
-    exclusions = [
-        "package.json",
-        "package-lock.json",
-        "Pipfile",
-        "Pipfile.lock",
-        "requirements.txt",
-        "*.jpg",
-        "*.png",
-        "*.gif",
-        "*.svg",
-        "*.pdf",
-        "*.zip",
-        "*.gz",
-        "*.tar",
-        "*.csv",
-        "*.json",
-    ]
-
     # get the command-line arguments
     parser = argparse.ArgumentParser()
     group = parser.add_mutually_exclusive_group(required=True)
@@ -66,14 +110,49 @@ def main():
         "-x",
         "--exclusions",
         help='A comma-separated string of files to exclude, e.g. --excusions "foo.zip, *.jpg, *.json" ',
-        default=",".join(exclusions),
+        default=",".join(DEFAULT_EXCLUSIONS),
+    )
+    parser.add_argument(
+        "--aliases",
+        help='The path to a file mapping the names and emails contributors have committed under to one id each, one contributor per line, e.g. "Ann Lee: ann, Ann L, ann@example.com".  Each contributor is then reported once, and --user is matched against these ids exactly',
+        default=None,
+    )
+    parser.add_argument(
+        "--bucket",
+        help="Split each contributor's stats into days, weeks starting on Monday, or months, reporting each with its own start and end dates.  The logs are still walked only once",
+        default=None,
+        choices=BUCKETS,
+    )
+    parser.add_argument(
+        "--report",
+        help="Report each contributor's commits, insertions, deletions and files changed, or the files and directories each contributor churned the most, i.e. inserted and deleted the most lines of",
+        default="contributions",
+        choices=REPORTS,
+    )
+    parser.add_argument(
+        "--top",
+        help="The most files, and the most directories, to report per contributor with --report churn.  Defaults to 10",
+        type=int,
+        default=10,
+    )
+    parser.add_argument(
+        "--rollup",
+        help="Report each contributor to each repository (the default), each repository's totals over all its contributors, or each contributor's totals over all the repositories.  Only one row per repository or contributor is kept in memory",
+        default="user+repo",
+        choices=ROLLUPS,
     )
     parser.add_argument(
         "-f",
         "--format",
         help="The format in which to output the results",
         default="csv",
-        choices=["csv", "json", "markdown"],
+        choices=OUTPUT_FORMATS,
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="The file to write the results to.  Defaults to the standard output",
+        default=None,
     )
     parser.add_argument(
         "-b",
@@ -81,6 +160,11 @@ def main():
         help="The branch to parse, if not the default branch",
         default=None,
     )
+    parser.add_argument(
+        "--branches",
+        help='A comma-separated list of branches to parse without checking any out, reporting stats per branch, e.g. --branches "main, develop, release/*".  Wild cards accepted',
+        default=None,
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -95,13 +179,111 @@ def main():
         default=True,
         action="store_true",
     )
+    parser.add_argument(
+        "-sp",
+        "--single-pass",
+        help="Collect all contributors' stats from one walk of the git logs, rather than one walk per contributor",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="The number of repositories to parse at the same time",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--connections",
+        help="The number of repositories to clone or pull at the same time.  Defaults to the number of jobs",
+        type=int,
+        default=None,
+    )
+    parser.add_argument(
+        "--no-cache",
+        help="Parse every repository again, rather than reusing results cached by earlier runs",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        help="Keep the stats of every commit, so later runs only read commits made since",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--clone-mode",
+        help="How to clone repositories not cloned by an earlier run.  all but full skip checking out the files, since only the history is read",
+        default="full",
+        choices=CLONE_MODES,
+    )
+    parser.add_argument(
+        "--backend",
+        help="How to read the history of each repository.  python reads git's files directly, without running git, falling back to git for any repository it can not read",
+        default="git",
+        choices=BACKENDS,
+    )
+    parser.add_argument(
+        "--match-exclusions",
+        help="Where to match file paths against the exclusions.  python walks the logs of each repository once with git log --numstat, and leaves out the excluded files itself, rather than giving every git command the exclusions to match",
+        default="git",
+        choices=EXCLUSION_MATCHERS,
+    )
+    parser.add_argument(
+        "--optimize-repos",
+        help="Write or refresh the commit-graph and multi-pack-index of each repository after fetching it, so its logs are read faster.  Parse timings are appended to repos/.gitlogstats-timings.jsonl on every run, with or without this flag",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile",
+        help="Output a summary of where the time went, by phase and by repository, to the standard error",
+        default=False,
+        action="store_true",
+    )
+    parser.add_argument(
+        "--profile-json",
+        help="The file to write the measurements of where the time went to, as JSON",
+        default=None,
+    )
+    parser.add_argument(
+        "--cprofile",
+        help="The file to write cProfile statistics of parsing and formatting to, for python -m pstats.  Repositories are then parsed and formatted one at a time, since cProfile can only profile one thread at a time, though they are still fetched --jobs at a time",
+        default=None,
+    )
     args = parser.parse_args()
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.connections is None:
+        args.connections = args.jobs
+    if args.connections < 1:
+        parser.error("--connections must be at least 1")
+    if args.branches and args.branch:
+        parser.error("--branches can not be used with --branch")
+    if args.branches and args.incremental:
+        parser.error("--branches can not be used with --incremental")
+    if args.branches and args.bucket:
+        parser.error("--branches can not be used with --bucket")
+    if args.top < 1:
+        parser.error("--top must be at least 1")
+    if args.report == "churn" and args.branches:
+        parser.error("--report churn can not be used with --branches")
+    if args.report == "churn" and args.rollup == "user":
+        # the same paths in different repositories are different files and directories, so can not be added up
+        parser.error("--report churn can not be used with --rollup user")
 
     # fix up exclusions
     args.exclusions = re.split(
         r",\s*", args.exclusions
     )  # split up comma-separated string into list
     #   print(f'Exclusions: {args.exclusions}')
+    if args.branches:
+        args.branches = re.split(r",\s*", args.branches.strip())
+    if args.aliases:
+        from .aliases import Aliases
+
+        args.aliases = Aliases.read(args.aliases)
 
     # deal with repofile, if specified
     repository_urls = [args.repository]
@@ -111,7 +293,7 @@ def main():
             line for line in f.read().strip().split("\n")
         ]  # a list of urls from the file
 
-    # navigate into the directory where repos will be stored
+    # the directory where repos will be stored
     repos_dir = os.path.join(
         os.getcwd(), "repos"
     )  # where we will clone the repos we will parse
@@ -119,56 +301,109 @@ def main():
     if not os.path.exists(repos_dir):
         os.makedirs(repos_dir)
 
-    # loop through each git repository url, accumulating all results
-    all_results = []
-    last_parser = None
-    for repo_url in repository_urls:
-        os.chdir(repos_dir)  # start from the parent directory of all repos
-        # code = subprocess.run(['pwd']) # check the directory
-
-        repo_dir = GitLogsParser.repo_name_from_url(
-            repo_url
-        )  # extract the humanish repo name from the URL
-        repo_dir = os.path.join(repos_dir, repo_dir)  # convert to absolute path
-        # clone or pull the repo into the repo_dir
-        if not os.path.exists(repo_dir):
-            # has not yet been cloned... do a clone
-            subprocess.run(
-                ["git", "clone", repo_url], capture_output=True, check=True
-            )  # clone the code from github
-            os.chdir(repo_dir)  # navigate into this repository's directory
-        else:
-            # has previously been cloned... do a pull
-            os.chdir(repo_dir)  # navigate into this repository's directory
-            subprocess.run(
-                ["git", "pull"], capture_output=True, check=True
-            )  # clone the code from github
-
-        if args.branch:
-            subprocess.run(
-                ["git", "checkout", args.branch], capture_output=True, check=True
-            )
+    # results of earlier runs are kept alongside the repos
+    cache = None
+    if not args.no_cache:
+        from .cache import ResultCache
+
+        cache = ResultCache(os.path.join(repos_dir, ".gitlogstats-cache.json"))
+
+    # where the time goes is only measured when asked for
+    profiler = None
+    if args.profile or args.profile_json or args.cprofile:
+        from .profiling import Profiler
+
+        profiler = Profiler(cprofile=bool(args.cprofile))
+
+    # results are written as soon as each repository has been parsed, all in one table or JSON array
+    output = sys.stdout
+    if args.output:
+        output = open(args.output, "w", encoding="utf8", newline="")
+    from .repositories import has_commit_graph, record_timings, update_repository, update_repository_async
+    from .rollup import Rollup
+    from .writers import ResultWriter
+
+    writer = ResultWriter(output, args.format)
+    rollup = Rollup(args.rollup)
+
+    # the seconds spent optimizing and parsing each repository, by URL, recorded on every run so optimized and unoptimized runs can be compared
+    timings = {}
 
-        last_parser = GitLogsParser(
-            repo=repo_dir,
-            start=args.start,
-            end=args.end,
-            username=args.user,
-            exclusions=args.exclusions,
-            verbose=args.verbose,
-            clean=args.clean,
+    def fetch_options(repo_url):
+        timings[repo_url] = {}
+        return dict(
+            branch=args.branch,
+            clone_mode=args.clone_mode,
+            since=args.start,
+            optimize=args.optimize_repos,
+            timings=timings[repo_url],
+            profiler=profiler,
         )
-        results = last_parser.parse()
 
-        if args.format == "json":
-            all_results.extend(
-                results
-            )  # collect across repos; emit one valid JSON array
+    def fetch(repo_url):
+        return update_repository_async(repo_url, repos_dir, **fetch_options(repo_url))
+
+    def parse(repo_url, repo_dir):
+        started = time.perf_counter()
+        with profiled():
+            processed = parse_repository(repo_dir, repos_dir, args, cache, profiler)
+        timings[repo_url]["parse"] = time.perf_counter() - started
+        record_timings(
+            os.path.join(repos_dir, ".gitlogstats-timings.jsonl"),
+            repo_url,
+            timings[repo_url],
+            optimized=has_commit_graph(repo_dir),
+            cached=processed[0].cache_hit,
+        )
+        return processed
+
+    def profiled():
+        return profiler.cprofiled() if profiler is not None else contextlib.nullcontext()
+
+    def emit(processed):
+        repo_parser, results = processed
+        with profiled(), repo_parser.phase("format"):
+            writer.write(rollup.add(results))
+
+    # repos are fetched concurrently, and each is parsed as soon as it has been fetched
+    # results are emitted in the same order as the urls, however many are processed at once
+    try:
+        if len(repository_urls) == 1:
+            # a single repository has nothing to overlap with, so is fetched and parsed without an event loop, or loading asyncio at all
+            repo_url = repository_urls[0]
+            emit(parse(repo_url, update_repository(repo_url, repos_dir, **fetch_options(repo_url))))
         else:
-            print(last_parser.format_results(results, args.format))
+            from .pipeline import run_pipeline
+
+            run_pipeline(
+                repository_urls,
+                fetch=fetch,
+                parse=parse,
+                emit=emit,
+                connections=args.connections,
+                jobs=args.jobs,
+            )
+        writer.write(rollup.finish())
+        writer.close()
+        if args.format == "json":
+            output.write("\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if cache is not None:
+            cache.flush()  # save when each result found in the cache was used
+
+    if profiler is not None:
+        if args.profile:
+            sys.stderr.write(profiler.summary())
+        if args.profile_json:
+            import json
 
-    if args.format == "json" and last_parser is not None:
-        print(last_parser.format_results(all_results, "json"))
+            with open(args.profile_json, "w", encoding="utf8") as f:
+                json.dump(profiler.to_dict(), f, indent=2)
+                f.write("\n")
+        if args.cprofile:
+            profiler.dump_cprofile(args.cprofile)
 
 
 # if this script is being run directly...
@@ -0,0 +1,98 @@
+"""
+A reader of alias files, which map the names and email addresses contributors have committed under to one canonical id per contributor.
+
+Each line of an alias file gives a canonical id, a colon, then a comma-separated list of the names and email addresses it has committed under, e.g.:
+    Ann Lee: ann, Ann L, ann@example.com, <1234+annlee@users.noreply.github.com>
+Blank lines and lines starting with # are ignored.  Names and emails are matched exactly, ignoring case, and a commit's email takes precedence over its name.
+"""
+
+
+class Aliases:
+    def __init__(self):
+        """
+        Initialize an empty set of aliases, which maps every author to their own name.
+        """
+        self.names = {}  # lowercased name -> canonical id
+        self.emails = {}  # lowercased email -> canonical id
+        self.resolved = {}  # (name, email) -> canonical id, so each distinct author is only looked up once
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Build a set of aliases from the contents of an alias file.
+        @param text: the contents of the file
+        @returns: an Aliases
+        """
+        aliases = cls()
+        for line in text.splitlines():
+            aliases.add_line(line)
+        return aliases
+
+    @classmethod
+    def read(cls, path):
+        """
+        Build a set of aliases from an alias file.
+        @param path: the path to the file
+        @returns: an Aliases
+        """
+        with open(path, "r", encoding="utf8") as f:
+            return cls.parse(f.read())
+
+    def add_line(self, line):
+        """
+        Add the aliases on one line of an alias file, e.g. "Ann Lee: ann, ann@example.com".  later lines win over earlier ones.
+        @param line: the line
+        """
+        line = line.strip()
+        if not line or line.startswith("#") or ":" not in line:
+            return
+        canonical, names = line.split(":", 1)
+        canonical = canonical.strip()
+        if not canonical:
+            return
+        self.add(canonical, canonical)
+        for alias in names.split(","):
+            self.add(canonical, alias)
+
+    def add(self, canonical, alias):
+        """
+        Map a name or email address to a canonical id.
+        @param canonical: the canonical id
+        @param alias: a name, or an email address, with or without angle brackets
+        """
+        alias = alias.strip()
+        if alias.startswith("<") and alias.endswith(">"):
+            alias = alias[1:-1].strip()
+        if not alias:
+            return
+        if "@" in alias:
+            self.emails[alias.lower()] = canonical
+        else:
+            self.names[alias.lower()] = canonical
+        self.resolved = {}
+
+    def resolve(self, name, email=None):
+        """
+        Find the canonical id of an author.
+        @param name: the name the author committed under
+        @param email: the email address the author committed under, if known
+        @returns: the canonical id the email or name is an alias of, in that order, or else the name itself
+        """
+        key = (name, email)
+        canonical = self.resolved.get(key)
+        if canonical is None:
+            canonical = self.emails.get(email.lower()) if email else None
+            if canonical is None:
+                canonical = self.names.get(name.lower(), name) if name is not None else name
+            self.resolved[key] = canonical
+        return canonical
+
+    def to_dict(self):
+        """
+        Describe the aliases in a form that can be written as JSON, e.g. to tell results resolved with different aliases apart.
+        @returns: a dictionary of the canonical ids of names, and of emails
+        """
+        return {"names": dict(sorted(self.names.items())), "emails": dict(sorted(self.emails.items()))}
+
+    def __bool__(self):
+        return bool(self.names or self.emails)
@@ -0,0 +1,499 @@
+"""
+The backends GitLogsParser reads a repository's history with.  By default it runs git, but it can instead read git's files itself, without spawning any process.
+"""
+
+import binascii
+import heapq
+import os
+import re
+
+from .commit_graph import CommitGraph
+from .diffstat import (
+    BASENAME_SCORE,
+    MINIMUM_SCORE,
+    count_changes,
+    is_binary,
+    similarity,
+    span_hashes,
+)
+from .exclusions import exclusion_matcher
+from .log_stream import Commit, author_pattern
+from .mailmap import Mailmap
+from .objects import ObjectStore, ObjectStoreError
+
+# the modes of tree entries, as written in trees, that are not regular files
+TREE_MODE = b"40000"
+GITLINK_MODE = b"160000"
+FILE_TYPE_MASK = 0o170000
+REGULAR_FILE_TYPE = 0o100000
+
+# each entry of a tree object: its mode in octal, its name and its hash
+TREE_ENTRY_PATTERN = re.compile(rb"(\d+) ([^\0]*)\0(.{20})", re.DOTALL)
+
+# git only looks for renames of files that changed contents when fewer than this many files were deleted and added
+RENAME_LIMIT = 1000
+# the most likely sources of each added file that are considered when pairing up renames
+CANDIDATES_PER_FILE = 4
+
+# the most parsed trees to keep, so unchanged directories are not parsed again for every commit
+TREE_CACHE_SIZE = 10000
+
+
+class Backend:
+    """
+    What a backend reads for GitLogsParser.  Any method may raise an ObjectStoreError, after which GitLogsParser runs git instead.
+    Dates are unix timestamps, compared with each commit's commit date just as git's --after and --before filters do.
+    """
+
+    def head(self):
+        """
+        @returns: the full hash of the HEAD commit
+        """
+        raise NotImplementedError
+
+    def contributors(self, after, before):
+        """
+        @returns: the names of the authors of commits to the included files within the date range, those with the most commits first, just like git shortlog -s -n
+        """
+        raise NotImplementedError
+
+    def all_contributors(self):
+        """
+        @returns: the names of everyone who ever committed to the repository, in the order git log lists them
+        """
+        raise NotImplementedError
+
+    def commits(self, after, before, author=None):
+        """
+        @param author: a pattern to search each commit's "<author name> <<author email>>" for, just like git's --author filter
+        @returns: a list of the Commit tuples that git log --shortstat lists for the included files within the date range, in the same order
+        """
+        raise NotImplementedError
+
+
+class PythonBackend(Backend):
+    def __init__(self, repo, exclusions=None):
+        """
+        Open a repository to read its history without git.
+        @param repo: the path to the repository, either its working tree or a bare repository
+        @param exclusions: a list of files to leave out of the stats, just like GitLogsParser's
+        """
+        self.objects = ObjectStore(repo)
+        if self.objects.has_replacements():
+            raise ObjectStoreError("replaced objects are not supported")
+        self.shallow = self.objects.shallow_commits()
+        # like git, ignore the commit-graph of a shallow clone, which may list parents the clone does not have
+        self.graph = None
+        if not self.shallow:
+            self.graph = CommitGraph.open(os.path.join(self.objects.common_dir, "objects"))
+        self.excluded = exclusion_matcher(tuple(exclusions or []))
+
+        self.commit_info = {}  # hash -> (tree, parents, commit date)
+        self.author_info = {}  # hash -> (author name, author email), after mailmapping
+        self.tree_entries = {}  # hash -> {name: (mode, hash)}
+        self.commit_stats = {}  # hash -> (files, insertions, deletions)
+        self.windows = {}  # (after, before) -> a list of the commits git log lists in that date range
+        self.mailmap = self.read_mailmap(repo)
+
+    def read_mailmap(self, repo):
+        """
+        Read the .mailmap file git log uses to map authors to their proper names, i.e. the one in the working tree, or in HEAD for a bare repository.
+        @param repo: the path to the repository
+        @returns: a Mailmap
+        """
+        if os.path.normpath(repo) != self.objects.git_dir:
+            try:
+                with open(os.path.join(repo, ".mailmap"), "r", encoding="utf8", errors="replace") as f:
+                    return Mailmap.parse(f.read())
+            except (FileNotFoundError, IsADirectoryError):
+                return Mailmap()
+        head = self.objects.read_typed(self.objects.resolve("HEAD"), b"commit")
+        tree = binascii.unhexlify(head[len(b"tree ") : head.index(b"\n")])  # a commit's first line is always its tree
+        entry = self.entries(tree).get(b".mailmap")
+        if entry is None or not is_regular(entry):
+            return Mailmap()
+        data = self.objects.read_typed(entry[1], b"blob")
+        return Mailmap.parse(data.decode("utf-8", "replace"))
+
+    def head(self):
+        return binascii.hexlify(self.objects.resolve("HEAD")).decode("ascii")
+
+    def contributors(self, after, before):
+        counts = {}
+        for sha, _, _, _ in self.window(after, before):
+            name = self.author(sha)[0]
+            counts[name] = counts.get(name, 0) + 1
+        # like git shortlog -n, authors with the same number of commits are in order of their names' bytes
+        return sorted(counts, key=lambda name: (-counts[name], name.encode("utf-8", "surrogateescape")))
+
+    def all_contributors(self):
+        contributors = {}  # a dict, used as an ordered set
+        for sha, _, _, _ in self.walk(None, None, simplify=False):
+            contributors[self.author(sha)[0]] = True
+        return list(contributors)
+
+    def commits(self, after, before, author=None):
+        pattern = author_pattern(author) if author else None
+        commits = []
+        for sha, tree, parents, date in self.window(after, before):
+            name, email = self.author(sha)
+            if pattern is not None and not pattern.search(f"{name} <{email}>"):
+                continue
+            if len(parents) > 1:
+                files, insertions, deletions = 0, 0, 0  # git log shows no stats for merges
+            else:
+                files, insertions, deletions = self.stats(sha, tree, parents)
+            commits.append(
+                Commit(
+                    binascii.hexlify(sha).decode("ascii"),
+                    name,
+                    email,
+                    files,
+                    insertions,
+                    deletions,
+                    date,
+                )
+            )
+        return commits
+
+    def window(self, after, before):
+        """
+        List the commits git log lists within a date range, for the included files.
+        @param after: the earliest commit date of interest, as a unix timestamp
+        @param before: the latest commit date of interest, as a unix timestamp
+        @returns: a list of (hash, tree, parents, commit date) tuples
+        """
+        key = (after, before)
+        if key not in self.windows:
+            self.windows[key] = list(self.walk(after, before))
+        return self.windows[key]
+
+    def walk(self, after, before, simplify=True):
+        """
+        Walk the history from HEAD newest first, just as git log does.
+        @param after: the earliest commit date of interest, as a unix timestamp, or None for no limit.  like git, the walk goes no further back along any line of history than the first commit before this date.
+        @param before: the latest commit date of interest, as a unix timestamp, or None for no limit
+        @param simplify: leave out commits that changed none of the included files, and follow only one parent of merges that took all their included files from it, like git log does when given paths
+        @returns: a generator of (hash, tree, parents, commit date) tuples
+        """
+        head = self.objects.resolve("HEAD")
+        order = 0  # commits with the same date are walked in the order they were queued
+        queue = [(-self.read_commit(head)[2], order, head)]
+        seen = {head}
+        while queue:
+            _, _, sha = heapq.heappop(queue)
+            tree, parents, date = self.read_commit(sha)
+            if after is not None and date < after:
+                continue
+
+            treesame = False
+            if simplify:
+                if not parents:
+                    treesame = self.same_files(None, tree)
+                else:
+                    for parent in parents:
+                        if self.same_files(self.read_commit(parent)[0], tree):
+                            # the included files all came from this parent, so the others' histories are not of interest
+                            parents = [parent]
+                            treesame = True
+                            break
+
+            for parent in parents:
+                if parent not in seen:
+                    seen.add(parent)
+                    order += 1
+                    heapq.heappush(queue, (-self.read_commit(parent)[2], order, parent))
+
+            if before is not None and date > before:
+                continue
+            if treesame:
+                continue
+            yield sha, tree, parents, date
+
+    def read_commit(self, sha):
+        """
+        Read what the walk needs to know about a commit, from the commit-graph if it has the commit.
+        @param sha: the commit's hash, as 20 raw bytes
+        @returns: a tuple of the commit's tree, its parents and its commit date
+        """
+        info = self.commit_info.get(sha)
+        if info is not None:
+            return info
+        position = self.graph.find(sha) if self.graph is not None else None
+        if position is not None:
+            _, tree, parent_positions, date = self.graph.commit(position)
+            parents = [self.graph.sha(p) for p in parent_positions]
+            info = (tree, parents, date)
+        else:
+            info = self.parse_commit(sha)
+        if sha in self.shallow:
+            info = (info[0], [], info[2])  # a shallow clone has none of the parents of its oldest commits
+        self.commit_info[sha] = info
+        return info
+
+    def parse_commit(self, sha):
+        """
+        Read a commit object, keeping its author for later.
+        @param sha: the commit's hash, as 20 raw bytes
+        @returns: a tuple of the commit's tree, its parents and its commit date
+        """
+        data = self.objects.read_typed(sha, b"commit")
+        headers = data.split(b"\n\n", 1)[0]
+        tree = None
+        parents = []
+        date = None
+        for line in headers.split(b"\n"):
+            key, _, value = line.partition(b" ")
+            if key == b"tree" and tree is None:
+                tree = binascii.unhexlify(value)
+            elif key == b"parent":
+                parents.append(binascii.unhexlify(value))
+            elif key == b"author" and sha not in self.author_info:
+                name, email = split_ident(value)
+                self.author_info[sha] = self.mailmap.map(name, email)
+            elif key == b"committer" and date is None:
+                date = int(value[value.rindex(b">") + 1 :].split()[0])
+        if tree is None or date is None:
+            raise ObjectStoreError(f"unrecognized commit {binascii.hexlify(sha).decode('ascii')}")
+        return tree, parents, date
+
+    def author(self, sha):
+        """
+        @returns: the name and email of a commit's author, as git log's %aN and %aE show them
+        """
+        if sha not in self.author_info:
+            self.parse_commit(sha)
+        return self.author_info[sha]
+
+    def entries(self, tree):
+        """
+        Read the entries of a tree.
+        @param tree: the tree's hash, as 20 raw bytes, or None for an empty tree
+        @returns: a dictionary of each entry's name to its mode and hash, all as bytes
+        """
+        if tree is None:
+            return {}
+        entries = self.tree_entries.get(tree)
+        if entries is None:
+            data = self.objects.read_typed(tree, b"tree")
+            entries = {
+                name: (mode, sha)
+                for mode, name, sha in TREE_ENTRY_PATTERN.findall(data)
+            }
+            if len(self.tree_entries) >= TREE_CACHE_SIZE:
+                self.tree_entries.clear()
+            self.tree_entries[tree] = entries
+        return entries
+
+    def changes(self, old_tree, new_tree, prefix=b""):
+        """
+        Compare two trees, skipping directories whose hashes are the same, and excluded files.
+        @param old_tree, new_tree: the hashes of the trees, or None for an empty tree
+        @param prefix: the path of the trees' directory, with a trailing /, or b"" for the top of the repository
+        @returns: a generator of (path, old entry, new entry) tuples, in no particular order, each entry a (mode, hash) tuple, or None if the file does not exist on that side
+        """
+        if old_tree == new_tree:
+            return
+        old = self.entries(old_tree)
+        new = self.entries(new_tree)
+        names = [name for name, entry in new.items() if old.get(name) != entry]
+        names.extend(name for name in old if name not in new)
+        for name in names:
+            old_entry = old.get(name)
+            new_entry = new.get(name)
+            path = prefix + name
+            old_dir = old_entry is not None and old_entry[0] == TREE_MODE
+            new_dir = new_entry is not None and new_entry[0] == TREE_MODE
+            if old_dir or new_dir:
+                yield from self.changes(
+                    old_entry[1] if old_dir else None,
+                    new_entry[1] if new_dir else None,
+                    path + b"/",
+                )
+            old_file = old_entry if not old_dir else None
+            new_file = new_entry if not new_dir else None
+            if old_file != new_file:
+                path = path.decode("utf-8", "surrogateescape")
+                if not self.excluded(path):
+                    yield path, old_file, new_file
+
+    def same_files(self, old_tree, new_tree):
+        """
+        @returns: True if none of the included files differ between two trees
+        """
+        return next(self.changes(old_tree, new_tree), None) is None
+
+    def stats(self, sha, tree, parents):
+        """
+        Work out the stats git log --shortstat shows for a commit that is not a merge.
+        @param sha: the commit's hash, as 20 raw bytes
+        @param tree: the commit's tree
+        @param parents: the commit's parents, at most one
+        @returns: a tuple of the number of files changed, lines inserted and lines deleted
+        """
+        stats = self.commit_stats.get(sha)
+        if stats is None:
+            parent_tree = self.read_commit(parents[0])[0] if parents else None
+            changes = sorted(self.changes(parent_tree, tree))
+            changes = self.find_renames(changes)
+            insertions = deletions = 0
+            for _, old_entry, new_entry in changes:
+                inserted, deleted = self.count_lines(old_entry, new_entry)
+                insertions += inserted
+                deletions += deleted
+            stats = (len(changes), insertions, deletions)
+            self.commit_stats[sha] = stats
+        return stats
+
+    def contents(self, entry):
+        """
+        @returns: the contents git diffs for a tree entry.  a submodule's is the commit it is at.
+        """
+        if entry is None:
+            return b""
+        if entry[0] == GITLINK_MODE:
+            return b"Subproject commit " + binascii.hexlify(entry[1]) + b"\n"
+        return self.objects.read_typed(entry[1], b"blob")
+
+    def count_lines(self, old_entry, new_entry):
+        """
+        Count the lines inserted and deleted by a change to a file.  Like git, binary files have no lines.
+        @returns: a tuple of the number of lines inserted and deleted
+        """
+        if old_entry is not None and new_entry is not None and old_entry[1] == new_entry[1]:
+            return 0, 0  # only the mode or the name changed
+        old = self.contents(old_entry)
+        new = self.contents(new_entry)
+        if is_binary(old) or is_binary(new):
+            return 0, 0
+        return count_changes(old, new)
+
+    def find_renames(self, changes):
+        """
+        Pair up deleted and added files that git would show as renamed, so each pair counts as a single file changed, just as git's rename detection does.
+        Files with the same contents are paired up first, then those with the same name that are very similar, then any that are similar enough.
+        @param changes: a list of (path, old entry, new entry) tuples
+        @returns: the changes, with each rename a single change
+        """
+        sources = [c for c in changes if c[2] is None]
+        destinations = [c for c in changes if c[1] is None]
+        if not sources or not destinations:
+            return changes
+        renames = {}  # destination path -> source change
+
+        # files with exactly the same contents, preferring those with the same name
+        for destination in destinations:
+            best, best_score = None, -1
+            for source in sources:
+                if source[0] in renames.values() or source[1][1] != destination[2][1]:
+                    continue
+                if not (is_regular(source[1]) and is_regular(destination[2])) and source[1][0] != destination[2][0]:
+                    continue
+                score = same_basename(source[0], destination[0])
+                if score > best_score:
+                    best, best_score = source, score
+            if best is not None:
+                renames[destination[0]] = best[0]
+
+        sources = [s for s in sources if s[0] not in renames.values() and is_regular(s[1])]
+        destinations = [d for d in destinations if d[0] not in renames and is_regular(d[2])]
+        if sources and destinations and len(sources) * len(destinations) <= RENAME_LIMIT**2:
+            contents = {}
+            hashes = {}
+
+            def score(source, destination):
+                for change, entry in ((source, source[1]), (destination, destination[2])):
+                    if change[0] not in contents:
+                        contents[change[0]] = self.contents(entry)
+                old, new = contents[source[0]], contents[destination[0]]
+                result = similarity(old, new, hashes.get(source[0]), hashes.get(destination[0]))
+                if result and source[0] not in hashes:
+                    hashes[source[0]] = span_hashes(old)
+                if result and destination[0] not in hashes:
+                    hashes[destination[0]] = span_hashes(new)
+                return result
+
+            # files whose names are unique among those deleted and those added, and that are very similar
+            basenames = {}
+            for change in sources + destinations:
+                basenames.setdefault(basename(change[0]), []).append(change)
+            for changes_of_name in basenames.values():
+                if len(changes_of_name) != 2:
+                    continue
+                source, destination = changes_of_name
+                if source[2] is not None or destination[1] is not None:
+                    continue  # not one of each
+                if score(source, destination) >= BASENAME_SCORE:
+                    renames[destination[0]] = source[0]
+
+            # then any files that are similar enough, the most similar first
+            used = set(renames.values())
+            candidates = []
+            for d, destination in enumerate(destinations):
+                if destination[0] in renames:
+                    continue
+                scores = [
+                    (score(source, destination), same_basename(source[0], destination[0]), s)
+                    for s, source in enumerate(sources)
+                    if source[0] not in used
+                ]
+                scores.sort(key=lambda c: (-c[0], -c[1], c[2]))
+                candidates.extend((c[0], c[1], d, c[2]) for c in scores[:CANDIDATES_PER_FILE])
+            candidates.sort(key=lambda c: (-c[0], -c[1], c[2], c[3]))
+            for candidate_score, _, d, s in candidates:
+                if candidate_score < MINIMUM_SCORE:
+                    break
+                destination, source = destinations[d], sources[s]
+                if destination[0] in renames or source[0] in used:
+                    continue
+                renames[destination[0]] = source[0]
+                used.add(source[0])
+
+        if not renames:
+            return changes
+        by_path = {change[0]: change for change in changes}
+        renamed_sources = set(renames.values())
+        result = []
+        for change in changes:
+            if change[0] in renamed_sources and change[2] is None:
+                continue
+            if change[1] is None and change[0] in renames:
+                change = (change[0], by_path[renames[change[0]]][1], change[2])
+            result.append(change)
+        return result
+
+
+def split_ident(ident):
+    """
+    Split the identity on a commit's author or committer line, e.g. b"Alice <alice@example.com> 1704888000 +0000".
+    @param ident: the line, without its leading header name
+    @returns: a tuple of the name and email address
+    """
+    left = ident.find(b"<")
+    right = ident.find(b">", left + 1)
+    if left < 0 or right < 0:
+        raise ObjectStoreError(f"unrecognized identity {ident!r}")
+    name = ident[:left].strip().decode("utf-8", "replace")
+    email = ident[left + 1 : right].decode("utf-8", "replace")
+    return name, email
+
+
+def is_regular(entry):
+    """
+    @returns: True if a tree entry is a regular file, executable or not
+    """
+    return int(entry[0], 8) & FILE_TYPE_MASK == REGULAR_FILE_TYPE
+
+
+def basename(path):
+    """
+    @returns: the name of a file, without the directories it is in
+    """
+    return path.rsplit("/", 1)[-1]
+
+
+def same_basename(path1, path2):
+    """
+    @returns: 1 if two files have the same name, ignoring the directories they are in, otherwise 0
+    """
+    return int(basename(path1) == basename(path2))
@@ -0,0 +1,67 @@
+"""
+Analysis of several branches of a repository at once, without checking any of them out.
+Commits shared by several branches are walked once, and attributed to every branch they can be reached from with a bitmask of those branches.
+"""
+
+import fnmatch
+
+# the refs branches are looked up among, most preferred first.  a remote's branches are brought up to date by every fetch or pull, while local branches other than the one checked out are not.
+BRANCH_REF_PREFIXES = ["refs/remotes/origin/", "refs/heads/"]
+
+
+def match_branches(refs, patterns):
+    """
+    Pick out the branches whose names match any of a list of names or glob patterns.
+    @param refs: an iterable of (full ref name, commit hash) tuples, e.g. as listed by git for-each-ref
+    @param patterns: a list of branch names or glob patterns, e.g. ['main', 'develop', 'release/*']
+    @returns: a list of (branch name, commit hash) tuples, in the order of the patterns they match first, and by name within each pattern
+    """
+    tips = {}  # branch name -> (preference, commit hash)
+    for ref, sha in refs:
+        for preference, prefix in enumerate(BRANCH_REF_PREFIXES):
+            if ref.startswith(prefix):
+                name = ref[len(prefix) :]
+                if name != "HEAD" and (name not in tips or preference < tips[name][0]):
+                    tips[name] = (preference, sha)
+                break
+    branches = {}  # a dict, used as an ordered set, of the branches matched
+    for pattern in patterns:
+        for name in sorted(tips):
+            if fnmatch.fnmatchcase(name, pattern) and name not in branches:
+                branches[name] = tips[name][1]
+    return list(branches.items())
+
+
+def reachability(lines, tips):
+    """
+    Work out which branches each commit can be reached from, reading the output of git rev-list --topo-order --parents, in which every commit is listed before its parents.
+    @param lines: an iterable of lines of output, each "<commit hash> <parent hashes>"
+    @param tips: a list of the commit hashes at the tip of each branch
+    @returns: a dictionary of bitmasks, by commit hash, with bit i set if the commit can be reached from tips[i]
+    """
+    masks = {}  # commit hash -> bitmask of the branches it can be reached from
+    for i, sha in enumerate(tips):
+        masks[sha] = masks.get(sha, 0) | 1 << i
+    for line in lines:
+        hashes = line.split()
+        if not hashes:
+            continue
+        mask = masks.get(hashes[0], 0)
+        # every child of a commit is listed before it, so its own mask is complete by the time it is read
+        for parent in hashes[1:]:
+            masks[parent] = masks.get(parent, 0) | mask
+    return masks
+
+
+def branch_indexes(mask):
+    """
+    List the bits set in a bitmask of branches.
+    @param mask: the bitmask
+    @returns: a generator of the indexes of the branches, lowest first
+    """
+    i = 0
+    while mask:
+        if mask & 1:
+            yield i
+        mask >>= 1
+        i += 1
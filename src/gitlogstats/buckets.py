@@ -0,0 +1,40 @@
+"""
+Splitting a date range into buckets of time, e.g. weeks, so stats can be reported per bucket from a single walk of the logs.
+"""
+
+import datetime
+
+from .constants import BUCKETS
+
+
+def bucket_ranges(start, end, bucket):
+    """
+    Split a range of dates into calendar days, weeks starting on Monday, or months.  the first and last buckets are cut short to fit the range.
+    @param start: the first date of the range, as a date
+    @param end: the last date of the range, as a date
+    @param bucket: the size of each bucket, one of BUCKETS
+    @returns: a list of (first date, last date) tuples, one per bucket, in order
+    """
+    ranges = []
+    first = start
+    while first <= end:
+        following = next_bucket(first, bucket)
+        ranges.append((first, min(following - datetime.timedelta(days=1), end)))
+        first = following
+    return ranges
+
+
+def next_bucket(day, bucket):
+    """
+    Find the first date of the bucket after the one a date is in.
+    @param day: the date
+    @param bucket: the size of each bucket, one of BUCKETS
+    @returns: the first date of the next bucket
+    """
+    if bucket == "day":
+        return day + datetime.timedelta(days=1)
+    if bucket == "week":
+        return day + datetime.timedelta(days=7 - day.weekday())
+    if bucket == "month":
+        return (day.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+    raise ValueError(f"unknown bucket {bucket}, choose from {', '.join(BUCKETS)}")
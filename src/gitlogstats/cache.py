@@ -0,0 +1,116 @@
+"""
+A persistent cache of parse() results, so repositories without new commits are not parsed again.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class ResultCache:
+    def __init__(self, path, max_entries=1000, max_age=30 * 24 * 60 * 60):
+        """
+        Initialize a cache of results stored in a JSON file.
+        @param path: the path to the JSON file.  it is created when the first results are stored.
+        @param max_entries: the most results to keep.  the least recently used are evicted first.  defaults to 1000.
+        @param max_age: the number of seconds after which stored results are evicted.  defaults to 30 days.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.entries = None  # key -> {"created": ..., "used": ..., "results": ...}, loaded on first use
+        self.dirty = False  # whether results were used since the file was last saved, so their times of use are still to be saved
+        self.lock = threading.Lock()  # parsers on several threads may share one cache
+
+    @staticmethod
+    def key(**fields):
+        """
+        Build a cache key from everything that affects a set of results.
+        @param fields: the values that identify the results, e.g. the repository, HEAD commit and date range
+        @returns: a string that is the same whenever all the values are the same
+        """
+        fields_json = json.dumps(fields, sort_keys=True)
+        return hashlib.sha256(fields_json.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Look up previously stored results.
+        The time they were used is saved by the next put() or flush(), so results used on every run are the last to be evicted.
+        @param key: the cache key of the results
+        @returns: a copy of the results, or None if there are none, or they have expired
+        """
+        with self.lock:
+            self.load()
+            entry = self.entries.get(key)
+            now = time.time()
+            if entry is None or now - entry["created"] > self.max_age:
+                return None
+            entry["used"] = now
+            self.dirty = True
+            return [dict(result) for result in entry["results"]]
+
+    def put(self, key, results):
+        """
+        Store results, and save the cache file.
+        @param key: the cache key of the results
+        @param results: the list of result dictionaries to store
+        """
+        with self.lock:
+            self.load()
+            now = time.time()
+            self.entries[key] = {
+                "created": now,
+                "used": now,
+                "results": [dict(result) for result in results],
+            }
+            self.evict(now)
+            self.save()
+
+    def flush(self):
+        """
+        Save the cache file, if any results were used since it was last saved, e.g. at the end of a run in which every repository's results were found in the cache.
+        """
+        with self.lock:
+            if self.dirty:
+                self.save()
+
+    def load(self):
+        """
+        Read the cache file, if it has not been read yet.  A missing or unreadable file is treated as an empty cache.
+        """
+        if self.entries is not None:
+            return
+        try:
+            with open(self.path, "r", encoding="utf8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def evict(self, now):
+        """
+        Remove expired results, then the least recently used results beyond the maximum number of entries.
+        @param now: the current time, in seconds since the epoch
+        """
+        for key in [
+            key
+            for key, entry in self.entries.items()
+            if now - entry["created"] > self.max_age
+        ]:
+            del self.entries[key]
+        excess = len(self.entries) - self.max_entries
+        if excess > 0:
+            by_use = sorted(self.entries, key=lambda key: self.entries[key]["used"])
+            for key in by_use[:excess]:
+                del self.entries[key]
+
+    def save(self):
+        """
+        Write the cache file.  It is written to a temporary file first and then moved into place, so readers never see a partial file.
+        """
+        temp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf8") as f:
+            json.dump(self.entries, f)
+        os.replace(temp_path, self.path)
+        self.dirty = False
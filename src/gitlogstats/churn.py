@@ -0,0 +1,121 @@
+"""
+Finding the most churned files and directories, i.e. those with the most lines inserted and deleted, in bounded memory, however many paths a repository has.
+Each list of the most churned paths is kept with the Space-Saving algorithm: at most a fixed number of paths are counted at once, and a path seen when the list is full replaces the least churned one, taking over its count.
+"""
+
+import heapq
+import posixpath
+
+# the kinds of paths churn is reported for
+CHURN_KINDS = ["file", "directory"]
+
+# how many paths are counted at once for each one reported.  the spare counts keep paths that churn steadily from being replaced by each passing one before they can rank
+COUNTERS_PER_PATH = 10
+
+
+class TopK:
+    def __init__(self, k, counters=None):
+        """
+        Initialize a list of the most churned paths.
+        @param k: the most paths to list
+        @param counters: the most paths to count at once, at least k.  defaults to COUNTERS_PER_PATH times k.
+        """
+        self.k = k
+        self.capacity = max(k, counters) if counters is not None else k * COUNTERS_PER_PATH
+        self.counters = {}  # path -> [churn, commits, insertions, deletions]
+        self.heap = []  # (churn, path) of each count a path has had, some out of date, so the least churned path can be found quickly
+
+    def add(self, path, insertions, deletions, commits=1):
+        """
+        Count a change to a path.
+        @param path: the path changed
+        @param insertions: the lines inserted
+        @param deletions: the lines deleted
+        @param commits: the number of commits the change was made in.  defaults to 1.
+        """
+        counter = self.counters.get(path)
+        if counter is None:
+            floor = self.evict() if len(self.counters) >= self.capacity else 0
+            # the path may have been churned as much as the one it replaces before it was counted
+            counter = self.counters[path] = [floor, 0, 0, 0]
+        counter[0] += insertions + deletions
+        counter[1] += commits
+        counter[2] += insertions
+        counter[3] += deletions
+        heapq.heappush(self.heap, (counter[0], path))
+        if len(self.heap) > 4 * self.capacity + 64:
+            # drop the counts that are out of date, so the heap stays as small as the list
+            self.heap = [(counter[0], path) for path, counter in self.counters.items()]
+            heapq.heapify(self.heap)
+
+    def evict(self):
+        """
+        Stop counting the least churned path.
+        @returns: its churn
+        """
+        while True:
+            churn, path = heapq.heappop(self.heap)
+            counter = self.counters.get(path)
+            if counter is not None and counter[0] == churn:
+                del self.counters[path]
+                return churn
+
+    def top(self):
+        """
+        List the k most churned paths counted, most churned first.
+        The commits, insertions and deletions of a path are those counted since it was last added to the list, so are exact unless more paths were seen than are counted at once.
+        @returns: a list of (path, commits, insertions, deletions) tuples
+        """
+        ranked = heapq.nsmallest(self.k, self.counters.items(), key=lambda item: (-item[1][0], item[0]))
+        return [(path, commits, insertions, deletions) for path, (churn, commits, insertions, deletions) in ranked]
+
+
+class Churn:
+    def __init__(self, top=10):
+        """
+        Initialize a tally of the most churned files and directories of each of a number of groups of commits, e.g. by author and by week.
+        @param top: the most files, and the most directories, to count per group.  defaults to 10.
+        """
+        self.top = top
+        self.groups = {}  # group -> {kind: TopK}, in the order the groups were first seen
+
+    def add(self, group, changes):
+        """
+        Count the changes a commit made to each file, and to the directories the files are in.
+        A directory is counted once per commit, however many of its files were changed.
+        @param group: the group of commits the commit is in, e.g. its author
+        @param changes: a list of (path, insertions, deletions) tuples, e.g. from CommitFiles
+        """
+        counts = self.groups.get(group)
+        if counts is None:
+            counts = self.groups[group] = {kind: TopK(self.top) for kind in CHURN_KINDS}
+        directories = {}  # directory -> [insertions, deletions]
+        for path, insertions, deletions in changes:
+            counts["file"].add(path, insertions, deletions)
+            for directory in parent_directories(path):
+                lines = directories.setdefault(directory, [0, 0])
+                lines[0] += insertions
+                lines[1] += deletions
+        for directory, (insertions, deletions) in directories.items():
+            counts["directory"].add(directory, insertions, deletions)
+
+    def items(self):
+        """
+        List the most churned files and directories of each group.
+        @returns: a list of (group, kind, [(path, commits, insertions, deletions), ...]) tuples, in the order the groups were first seen, files before directories
+        """
+        return [(group, kind, counts[kind].top()) for group, counts in self.groups.items() for kind in CHURN_KINDS]
+
+
+def parent_directories(path):
+    """
+    List the directories a file is in, e.g. "src/" and "src/app/" for "src/app/main.py".
+    @param path: the path of the file, relative to the root of the repository
+    @returns: a list of the directories, each with a trailing slash, outermost first.  files at the root are in none.
+    """
+    directory = posixpath.dirname(path)
+    directories = []
+    while directory:
+        directories.append(directory + "/")
+        directory = posixpath.dirname(directory)
+    return directories[::-1]
@@ -0,0 +1,311 @@
+"""
+A compact, column-oriented store of the stats of many commits, so the stats of millions of commits can be kept in memory, and summed by author and by date.
+Each author is stored once, and commits refer to their author by number.  Hashes, timestamps and counts are stored in arrays of machine integers rather than as python objects, and are summed with numpy, if it is installed.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+
+from .log_stream import Commit
+
+try:
+    import numpy
+except ImportError:  # optional... sums are then computed in python
+    numpy = None
+
+# the timestamp stored for commits whose commit date was not read
+NO_TIMESTAMP = -(2**63)
+
+# the length of a SHA-1 commit hash, in bytes
+HASH_BYTES = 20
+
+
+class CommitColumns:
+    def __init__(self, commits=()):
+        """
+        Initialize a store of commit stats.
+        @param commits: an optional iterable of Commit tuples to store
+        """
+        self.authors = []  # the distinct (author name, author email) tuples, in the order they were first stored
+        self.author_ids = {}  # (author name, author email) -> its index in self.authors
+        self.hashes = bytearray()  # the hash of each commit, in binary
+        self.odd_hashes = {}  # commit index -> hash, for hashes that are not 40 hexadecimal digits, e.g. SHA-256 or abbreviated hashes
+        self.author = array("q")  # the index of each commit's author
+        self.timestamp = array("q")
+        self.files = array("q")
+        self.insertions = array("q")
+        self.deletions = array("q")
+        self.extend(commits)
+
+    def append(self, commit):
+        """
+        Store the stats of a commit.
+        @param commit: a Commit tuple
+        """
+        key = (commit.author, commit.email)
+        author = self.author_ids.get(key)
+        if author is None:
+            author = self.author_ids[key] = len(self.authors)
+            self.authors.append(key)
+        try:
+            raw = bytes.fromhex(commit.sha)
+        except ValueError:
+            raw = b""
+        if len(raw) != HASH_BYTES:
+            self.odd_hashes[len(self.author)] = commit.sha
+            raw = bytes(HASH_BYTES)
+        self.hashes += raw
+        self.author.append(author)
+        self.timestamp.append(NO_TIMESTAMP if commit.timestamp is None else commit.timestamp)
+        self.files.append(commit.files)
+        self.insertions.append(commit.insertions)
+        self.deletions.append(commit.deletions)
+
+    def extend(self, commits):
+        """
+        Store the stats of several commits.
+        @param commits: an iterable of Commit tuples
+        """
+        for commit in commits:
+            self.append(commit)
+
+    def __len__(self):
+        return len(self.author)
+
+    def __getitem__(self, i):
+        """
+        Return the stats of a stored commit.
+        @param i: the index of the commit, in the order commits were stored
+        @returns: a Commit tuple
+        """
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        sha = self.odd_hashes.get(i)
+        if sha is None:
+            sha = self.hashes[i * HASH_BYTES : (i + 1) * HASH_BYTES].hex()
+        name, email = self.authors[self.author[i]]
+        timestamp = self.timestamp[i]
+        return Commit(
+            sha,
+            name,
+            email,
+            self.files[i],
+            self.insertions[i],
+            self.deletions[i],
+            None if timestamp == NO_TIMESTAMP else timestamp,
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def matching_authors(self, predicate):
+        """
+        Find the authors that satisfy a condition, testing each distinct author only once.
+        @param predicate: a function that is passed an author's name and email, and returns whether the author is of interest
+        @returns: a set of the indexes of the authors of interest
+        """
+        return {author for author, (name, email) in enumerate(self.authors) if predicate(name, email)}
+
+    def select(self, after=None, before=None, authors=None):
+        """
+        Yield the stats of the stored commits made within a date range, by any of a set of authors.
+        @param after: the earliest commit timestamp to include, in seconds since the epoch.  defaults to no limit.
+        @param before: the latest commit timestamp to include, in seconds since the epoch.  defaults to no limit.
+        @param authors: a set of the indexes of the authors to include, e.g. from matching_authors().  defaults to every author.
+        @returns: a generator of Commit tuples, in the order they were stored
+        """
+        for i in self.indexes(after, before, authors):
+            yield self[i]
+
+    def totals(self, after=None, before=None, authors=None):
+        """
+        Sum the stats of the stored commits made within a date range, by any of a set of authors.
+        @param after, before, authors: as for select()
+        @returns: a tuple of the number of commits, files changed, insertions and deletions
+        """
+        totals = [0, 0, 0, 0]
+        for counts in self.totals_by_author(after, before, authors).values():
+            for j, count in enumerate(counts):
+                totals[j] += count
+        return tuple(totals)
+
+    def totals_by_author(self, after=None, before=None, authors=None):
+        """
+        Sum the stats of the stored commits made within a date range by each author.
+        @param after, before, authors: as for select()
+        @returns: a dictionary of (commits, files, insertions, deletions) tuples, by (author name, author email), in the order of each author's first commit included.  authors without any commits are left out.
+        """
+        return {
+            self.authors[author]: counts
+            for (author, window), counts in self.aggregate(after, before, authors).items()
+        }
+
+    def totals_by_window(self, boundaries, after=None, before=None, authors=None):
+        """
+        Sum the stats of the stored commits made within a date range by each author, in each of a series of windows of time.
+        @param boundaries: the timestamps at which each window starts, in ascending order.  each window ends where the next starts, and the last never ends.  commits made before the first are left out.
+        @param after, before, authors: as for select()
+        @returns: a dictionary of (commits, files, insertions, deletions) tuples, by ((author name, author email), index of the window), in the order of the first commit included of each.  windows without any commits are left out.
+        """
+        return {
+            (self.authors[author], window): counts
+            for (author, window), counts in self.aggregate(after, before, authors, boundaries).items()
+        }
+
+    def aggregate(self, after=None, before=None, authors=None, boundaries=None):
+        """
+        Sum the stats of the stored commits by author, and by window of time if given the windows, with numpy if it is installed.
+        @returns: a dictionary of (commits, files, insertions, deletions) tuples, by (author index, window index), in the order of the first commit included of each
+        """
+        if numpy is not None and len(self):
+            return self.aggregate_numpy(after, before, authors, boundaries)
+        sums = {}
+        for i in self.indexes(after, before, authors):
+            window = 0
+            if boundaries is not None:
+                window = bisect_right(boundaries, self.timestamp[i]) - 1
+                if window < 0:
+                    continue
+            key = (self.author[i], window)
+            counts = sums.get(key)
+            if counts is None:
+                counts = sums[key] = [0, 0, 0, 0]
+            counts[0] += 1
+            counts[1] += self.files[i]
+            counts[2] += self.insertions[i]
+            counts[3] += self.deletions[i]
+        return {key: tuple(counts) for key, counts in sums.items()}
+
+    def aggregate_numpy(self, after, before, authors, boundaries):
+        timestamp = numpy.frombuffer(self.timestamp, dtype=numpy.int64)
+        author = numpy.frombuffer(self.author, dtype=numpy.int64)
+        keep = self.keep_numpy(timestamp, author, after, before, authors)
+        windows = 1
+        window = 0
+        if boundaries is not None:
+            windows = max(len(boundaries), 1)
+            window = numpy.searchsorted(numpy.asarray(boundaries, dtype=numpy.int64), timestamp, side="right") - 1
+            keep &= window >= 0
+            window = window[keep]
+        # one bin per author and window, so each sum is a single pass over the columns
+        key = author[keep] * windows + window
+        bins = len(self.authors) * windows
+        commits = numpy.bincount(key, minlength=bins)
+        sums = [commits] + [
+            numpy.bincount(key, weights=numpy.frombuffer(column, dtype=numpy.int64)[keep], minlength=bins)
+            for column in [self.files, self.insertions, self.deletions]
+        ]
+        keys, first = numpy.unique(key, return_index=True)
+        return {
+            divmod(int(k), windows): tuple(int(s[k]) for s in sums)
+            for k in keys[numpy.argsort(first)]
+        }
+
+    def keep_numpy(self, timestamp, author, after, before, authors):
+        keep = numpy.ones(len(self), dtype=bool)
+        if after is not None:
+            keep &= timestamp >= after
+        if before is not None:
+            keep &= timestamp <= before
+        if authors is not None:
+            keep &= numpy.isin(author, numpy.fromiter(authors, dtype=numpy.int64, count=len(authors)))
+        return keep
+
+    def index(self):
+        """
+        Build an index of the stored commits by author and timestamp, to answer many queries for sums without summing the commits again for each.
+        Commits stored later are not in the index.
+        @returns: a TimestampIndex
+        """
+        return TimestampIndex(self)
+
+    def indexes(self, after=None, before=None, authors=None):
+        """
+        Find the stored commits made within a date range, by any of a set of authors.
+        @param after, before, authors: as for select()
+        @returns: an iterable of the indexes of the commits, in the order they were stored
+        """
+        if numpy is not None and len(self):
+            timestamp = numpy.frombuffer(self.timestamp, dtype=numpy.int64)
+            author = numpy.frombuffer(self.author, dtype=numpy.int64)
+            return numpy.flatnonzero(self.keep_numpy(timestamp, author, after, before, authors)).tolist()
+        return (
+            i
+            for i in range(len(self))
+            if (after is None or self.timestamp[i] >= after)
+            and (before is None or self.timestamp[i] <= before)
+            and (authors is None or self.author[i] in authors)
+        )
+
+
+class TimestampIndex:
+    def __init__(self, commits):
+        """
+        Index the stats of stored commits, sorted by author and then by timestamp, with running totals of their counts.
+        The totals of any author within any date range are then found by binary search, in time that grows with the logarithm of the number of commits.
+        @param commits: the CommitColumns to index
+        """
+        self.authors = list(commits.authors)  # the distinct (author name, author email) tuples, in the order they were first stored
+        n = len(commits)
+        if numpy is not None and n:
+            timestamp = numpy.frombuffer(commits.timestamp, dtype=numpy.int64)
+            author = numpy.frombuffer(commits.author, dtype=numpy.int64)
+            order = numpy.lexsort((timestamp, author))
+            self.timestamp = array("q", timestamp[order].tobytes())
+            self.running = [
+                array("q", numpy.concatenate(([0], numpy.cumsum(numpy.frombuffer(column, dtype=numpy.int64)[order]))).tobytes())
+                for column in [commits.files, commits.insertions, commits.deletions]
+            ]
+            counts = numpy.bincount(author, minlength=len(self.authors))
+        else:
+            order = sorted(range(n), key=lambda i: (commits.author[i], commits.timestamp[i]))
+            self.timestamp = array("q", (commits.timestamp[i] for i in order))
+            self.running = []
+            for column in [commits.files, commits.insertions, commits.deletions]:
+                running = array("q", [0])
+                total = 0
+                for i in order:
+                    total += column[i]
+                    running.append(total)
+                self.running.append(running)
+            counts = [0] * len(self.authors)
+            for i in range(n):
+                counts[commits.author[i]] += 1
+        # each author's commits are those from self.first[author] up to self.first[author + 1]
+        self.first = array("q", [0])
+        for count in counts:
+            self.first.append(self.first[-1] + int(count))
+
+    def totals(self, after=None, before=None, authors=None):
+        """
+        Sum the stats of the indexed commits made within a date range, by any of a set of authors.
+        @param after, before, authors: as for CommitColumns.select()
+        @returns: a tuple of the number of commits, files changed, insertions and deletions
+        """
+        totals = [0, 0, 0, 0]
+        for counts in self.totals_by_author(after, before, authors).values():
+            for j, count in enumerate(counts):
+                totals[j] += count
+        return tuple(totals)
+
+    def totals_by_author(self, after=None, before=None, authors=None):
+        """
+        Sum the stats of the indexed commits made within a date range by each author.
+        @param after, before, authors: as for CommitColumns.select()
+        @returns: a dictionary of (commits, files, insertions, deletions) tuples, by (author name, author email), in the order the authors were first stored.  authors without any commits are left out.
+        """
+        totals = {}
+        for author in sorted(authors) if authors is not None else range(len(self.authors)):
+            low, high = self.first[author], self.first[author + 1]
+            if after is not None:
+                low = bisect_left(self.timestamp, after, low, high)
+            if before is not None:
+                high = bisect_right(self.timestamp, before, low, high)
+            if high > low:
+                totals[self.authors[author]] = (high - low,) + tuple(
+                    running[high] - running[low] for running in self.running
+                )
+        return totals
@@ -0,0 +1,164 @@
+"""
+A reader of git's commit-graph files, which hold every commit's parents, date and tree, so a history can be walked without inflating each commit.
+"""
+
+import mmap
+import os
+import struct
+
+from .objects import ObjectStoreError
+
+# the parent position that means a commit has no parent in that slot
+NO_PARENT = 0x70000000
+# the flag on a second parent's position that means it is an index into the list of extra edges of an octopus merge
+EXTRA_EDGES = 0x80000000
+
+
+class CommitGraph:
+    def __init__(self, layers):
+        """
+        Initialize a commit-graph from its layers.
+        @param layers: a list of mapped graph files, the base layer first.  a commit's position counts the commits of all the layers before its own.
+        """
+        self.layers = layers
+        self.first_positions = []  # the position of the first commit of each layer
+        position = 0
+        for layer in layers:
+            self.first_positions.append(position)
+            position += layer.count
+
+    @classmethod
+    def open(cls, objects_dir):
+        """
+        Open a repository's commit-graph, whether written as a single file or as a chain of incremental files.
+        @param objects_dir: the repository's objects directory
+        @returns: a CommitGraph, or None if the repository has none
+        """
+        info_dir = os.path.join(objects_dir, "info")
+        single = os.path.join(info_dir, "commit-graph")
+        chain = os.path.join(info_dir, "commit-graphs", "commit-graph-chain")
+        if os.path.isfile(chain):
+            with open(chain, "r", encoding="utf8") as f:
+                hashes = f.read().split()
+            return cls(
+                [
+                    GraphLayer(os.path.join(info_dir, "commit-graphs", f"graph-{h}.graph"))
+                    for h in hashes
+                ]
+            )
+        if os.path.isfile(single):
+            return cls([GraphLayer(single)])
+        return None
+
+    def find(self, sha):
+        """
+        Look up a commit.
+        @param sha: the commit's hash, as 20 raw bytes
+        @returns: the commit's position in the graph, or None if the graph does not hold it, e.g. because it was made after the graph was written
+        """
+        for layer, first in zip(reversed(self.layers), reversed(self.first_positions)):
+            i = layer.find(sha)
+            if i is not None:
+                return first + i
+        return None
+
+    def commit(self, position):
+        """
+        Read a commit's details from the graph.
+        @param position: the commit's position in the graph
+        @returns: a tuple of the commit's hash, its tree's hash, its parents' positions and its commit date as a unix timestamp
+        """
+        for layer, first in zip(reversed(self.layers), reversed(self.first_positions)):
+            if position >= first:
+                return layer.commit(position - first)
+        raise ObjectStoreError(f"no commit at position {position} of the commit-graph")
+
+    def sha(self, position):
+        """
+        @returns: the hash of the commit at a position in the graph, as 20 raw bytes
+        """
+        for layer, first in zip(reversed(self.layers), reversed(self.first_positions)):
+            if position >= first:
+                return layer.name(position - first)
+        raise ObjectStoreError(f"no commit at position {position} of the commit-graph")
+
+
+class GraphLayer:
+    def __init__(self, path):
+        """
+        Map a single commit-graph file into memory and find its chunks.
+        @param path: the path to the file
+        """
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        signature, version, hash_version, chunk_count = struct.unpack_from(">4sBBB", self.data, 0)
+        if signature != b"CGPH" or version != 1 or hash_version != 1:
+            raise ObjectStoreError(f"unsupported commit-graph {path}")
+
+        # the table of contents lists each chunk's id and offset, followed by an entry that marks where the last chunk ends
+        chunks = {}
+        for i in range(chunk_count):
+            chunk_id, offset = struct.unpack_from(">4sQ", self.data, 8 + i * 12)
+            chunks[chunk_id] = offset
+        for required in (b"OIDF", b"OIDL", b"CDAT"):
+            if required not in chunks:
+                raise ObjectStoreError(f"commit-graph {path} has no {required.decode()} chunk")
+        self.fanout = struct.unpack_from(">256I", self.data, chunks[b"OIDF"])
+        self.count = self.fanout[255]
+        self.names_offset = chunks[b"OIDL"]
+        self.commits_offset = chunks[b"CDAT"]
+        self.edges_offset = chunks.get(b"EDGE")
+
+    def name(self, i):
+        """
+        @returns: the hash of the i-th commit in this layer, as 20 raw bytes
+        """
+        start = self.names_offset + i * 20
+        return self.data[start : start + 20]
+
+    def find(self, sha):
+        """
+        Look up a commit in this layer.
+        @param sha: the commit's hash, as 20 raw bytes
+        @returns: the commit's index within this layer, or None if this layer does not hold it
+        """
+        first = sha[0]
+        lo = self.fanout[first - 1] if first > 0 else 0
+        hi = self.fanout[first]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            name = self.name(mid)
+            if name < sha:
+                lo = mid + 1
+            elif name > sha:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def commit(self, i):
+        """
+        Read the details of the i-th commit in this layer.
+        @returns: a tuple of the commit's hash, its tree's hash, its parents' positions and its commit date as a unix timestamp
+        """
+        start = self.commits_offset + i * 36
+        tree = self.data[start : start + 20]
+        parent1, parent2, generation_and_date_high, date_low = struct.unpack_from(
+            ">IIII", self.data, start + 20
+        )
+        parents = []
+        if parent1 != NO_PARENT:
+            parents.append(parent1)
+        if parent2 & EXTRA_EDGES:
+            # an octopus merge, whose second and later parents are listed among the extra edges
+            edge = self.edges_offset + (parent2 & ~EXTRA_EDGES) * 4
+            while True:
+                (position,) = struct.unpack_from(">I", self.data, edge)
+                parents.append(position & ~EXTRA_EDGES)
+                if position & EXTRA_EDGES:
+                    break
+                edge += 4
+        elif parent2 != NO_PARENT:
+            parents.append(parent2)
+        date = ((generation_and_date_high & 3) << 32) | date_low
+        return self.name(i), tree, parents, date
@@ -0,0 +1,169 @@
+"""
+A per-repository store of the stats of every commit, so later runs only have to read commits made since.
+"""
+
+import contextlib
+import json
+import os
+
+from .columns import CommitColumns
+from .log_stream import Commit
+
+try:
+    import fcntl
+except ImportError:  # windows... files are locked with msvcrt instead
+    fcntl = None
+    import msvcrt
+
+
+class CommitStore:
+    def __init__(self, path):
+        """
+        Initialize a store of commit stats kept in a file.
+        The file holds one JSON line per commit.  Each batch of commits is followed by a checkpoint line recording the HEAD commit the batch brought the store up to, so the file is only ever appended to, once any batch left without a checkpoint is cut off.
+        @param path: the path to the file.  it, and its directory, are created when the first commits are stored.
+        """
+        self.path = path
+        self.head = None  # the hash of the last HEAD commit the store was brought up to date with
+        self.exclusions = None  # the exclusions that applied when the stats were read
+        self.commits = CommitColumns()  # the stats of the commits in the store, kept in columns so millions fit in memory
+        self.end = 0  # the byte offset just past the last complete checkpoint in the file
+        self.stamp = None  # the size and modification time of the file when it was last read or written, to tell whether another process has changed it since
+        self.loaded = False
+
+    def load(self):
+        """
+        Read the file, if it has not been read yet.  Commits after the last complete checkpoint, e.g. left by an interrupted run, are ignored, and cut off the file by the next append().
+        """
+        if self.loaded:
+            return
+        self.loaded = True
+        self.stamp = self.file_stamp()
+        if self.stamp is None:
+            return
+        pending = []  # commits since the last checkpoint
+        offset = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                offset += len(line)
+                if not line.endswith(b"\n"):
+                    break  # a partially-written line
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if isinstance(record, list):
+                    pending.append(Commit(*record))
+                else:
+                    self.commits.extend(pending)
+                    pending = []
+                    self.head = record["head"]
+                    self.exclusions = record["exclusions"]
+                    self.end = offset
+
+    def append(self, commits, head, exclusions):
+        """
+        Add the stats of newly-read commits to the store, and save them.
+        Anything after the last complete checkpoint, e.g. the commits of an interrupted append, is cut off the file first, so no commit is stored twice.  If reading the commits fails, the store is read again from the file when next used.
+        @param commits: an iterable of the new Commit tuples
+        @param head: the hash of the HEAD commit the new commits bring the store up to date with
+        @param exclusions: the exclusions that applied when the stats were read
+        """
+        self.load()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "ab") as f:
+            f.truncate(self.end)
+            f.seek(self.end)
+            try:
+                for commit in commits:
+                    self.commits.append(commit)
+                    f.write(json.dumps(list(commit)).encode("utf8") + b"\n")
+            except BaseException:
+                # the commits read so far are left in the file, after the last checkpoint, to be cut off by the next append
+                self.unload()
+                raise
+            f.write(json.dumps({"head": head, "exclusions": exclusions}).encode("utf8") + b"\n")
+            self.end = f.tell()
+        self.stamp = self.file_stamp()
+        self.head = head
+        self.exclusions = exclusions
+
+    def clear(self):
+        """
+        Remove every commit from the store, e.g. when history has been rewritten.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.unload()
+        self.loaded = True
+
+    @contextlib.contextmanager
+    def locked(self):
+        """
+        Hold a lock on the store, shared by every process that uses the same file, e.g. the server and runs of the command line with -i, while it is brought up to date.
+        The lock is taken on a file beside the store's, so it is kept while the store's file is cleared.  If another process changed the store since it was read, it is read again.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path + ".lock", "a") as f:
+            lock_file(f)
+            try:
+                if self.loaded and self.file_stamp() != self.stamp:
+                    self.unload()
+                yield
+            finally:
+                unlock_file(f)
+
+    def file_stamp(self):
+        """
+        @returns: the size and modification time of the file, or None if there is none
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def unload(self):
+        """
+        Forget what was read of the file, so it is read again when next used.
+        """
+        self.head = None
+        self.exclusions = None
+        self.commits = CommitColumns()
+        self.end = 0
+        self.stamp = None
+        self.loaded = False
+
+    def authors(self):
+        """
+        Return the names of all the authors of commits in the store.
+        @returns: a list of author names, in the order they were first stored
+        """
+        return list(dict.fromkeys(name for name, email in self.commits.authors))
+
+
+def lock_file(f):
+    """
+    Wait for, and take, an exclusive lock on an open file, shared with other processes.
+    """
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        return
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            pass  # msvcrt gives up after ten seconds... keep waiting
+
+
+def unlock_file(f):
+    """
+    Release a lock taken with lock_file().
+    """
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
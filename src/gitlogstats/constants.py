@@ -0,0 +1,43 @@
+"""
+The choices offered on the command line, and the default exclusions.  Nothing is imported here, so the command line can list them without loading the modules that act on them.
+"""
+
+# the backends that can be chosen.  "git" runs git as a subprocess, "python" uses PythonBackend
+BACKENDS = ["git", "python"]
+
+# the sizes of bucket the stats can be split into
+BUCKETS = ["day", "week", "month"]
+
+# the ways a repository can be cloned.  all but a full clone skip the working tree, since only the history is read
+CLONE_MODES = ["full", "bare", "blobless", "shallow-since"]
+
+# the ways results can be rolled up: one row per repository, per contributor, or per contributor to each repository, as parsed
+ROLLUPS = ["repo", "user", "user+repo"]
+
+# the formats results can be written in
+OUTPUT_FORMATS = ["csv", "json", "ndjson", "markdown"]
+
+# the kinds of report that can be made
+REPORTS = ["contributions", "churn"]
+
+# where file paths can be matched against the exclusions: by git, given them as pathspecs, or by gitlogstats, given every path git logs
+EXCLUSION_MATCHERS = ["git", "python"]
+
+# default files to exclude from analysis
+DEFAULT_EXCLUSIONS = [
+    "package.json",
+    "package-lock.json",
+    "Pipfile",
+    "Pipfile.lock",
+    "requirements.txt",
+    "*.jpg",
+    "*.png",
+    "*.gif",
+    "*.svg",
+    "*.pdf",
+    "*.zip",
+    "*.gz",
+    "*.tar",
+    "*.csv",
+    "*.json",
+]
@@ -0,0 +1,401 @@
+"""
+Line counts and rename similarity of changed files, worked out the way git log --shortstat does, without running git.
+"""
+
+# git treats a file as binary if there is a NUL byte among its first few bytes
+FIRST_FEW_BYTES = 8000
+
+# the similarity scores of git's rename detection are out of this, and a rename must score at least half
+MAX_SCORE = 60000
+MINIMUM_SCORE = 30000
+# a rename between files of the same name must be more similar still to be paired up before all others
+BASENAME_SCORE = MINIMUM_SCORE + (MAX_SCORE - MINIMUM_SCORE) // 2
+# the modulus of the hashes of spans of files compared by rename detection
+HASHBASE = 107927
+
+# the limits of xdiff's heuristics, which git's default diff algorithm uses.
+# a line with at least this many matches, or the square root of the number of lines, counts as having many
+MAX_EQUAL_LIMIT = 1024
+# how far either side of a line with many matches to look for lines without any
+SIMILAR_SCAN_WINDOW = 100
+# a line with many matches is left out when fewer than one in this many lines around it have many matches too
+KEEP_MANY_RUN = 4
+# the fewest lines inserted and deleted searched for the shortest edit before giving up on it
+MAX_COST_MIN = 256
+# the cost after which to split at a long enough run of common lines, and how long that must be
+HEURISTIC_MIN_COST = 256
+SNAKE_COUNT = 20
+HEURISTIC_FACTOR = 4
+# larger than any line number
+LINE_MAX = 2**63 - 1
+
+
+def is_binary(data):
+    """
+    Check whether git would treat the contents of a file as binary, and so not count its lines.
+    @param data: the contents of the file
+    @returns: True if the file looks binary
+    """
+    return b"\0" in data[:FIRST_FEW_BYTES]
+
+
+def split_lines(data):
+    """
+    Split the contents of a file into lines just as git's diff does, so a last line without a line break differs from the same line with one.
+    @param data: the contents of the file
+    @returns: a list of lines, each with its line break, if any
+    """
+    lines = data.split(b"\n")
+    last = lines.pop()
+    lines = [line + b"\n" for line in lines]
+    if last:
+        lines.append(last)
+    return lines
+
+
+def count_changes(old, new):
+    """
+    Count the lines inserted and deleted by a change to a text file, just as git's default diff algorithm, xdiff's Myers diff with its heuristics, counts them.
+    git's diff is not always the shortest edit: lines it finds no use in matching up are left out before diffing, and the search for the edit is cut short once it gets too costly, so the counts are worked out in the same steps, not just from the edit distance.
+    @param old: the old contents of the file
+    @param new: the new contents of the file
+    @returns: a tuple of the number of lines inserted and deleted
+    """
+    a = split_lines(old)
+    b = split_lines(new)
+
+    # lines are compared by class, equal lines being of the same class
+    classes = {}
+    ha1 = [classes.setdefault(line, len(classes)) for line in a]
+    ha2 = [classes.setdefault(line, len(classes)) for line in b]
+    changed1 = [False] * len(a)
+    changed2 = [False] * len(b)
+
+    # lines common to the start or end of both files are never changed
+    start = 0
+    limit = min(len(a), len(b))
+    while start < limit and ha1[start] == ha2[start]:
+        start += 1
+    end = 0
+    limit -= start
+    while end < limit and ha1[len(a) - 1 - end] == ha2[len(b) - 1 - end]:
+        end += 1
+
+    # lines the other file does not have, or that are among runs of those, are changed without being diffed
+    lines1 = discard_lines(ha1, ha2, start, len(a) - end, changed1)
+    lines2 = discard_lines(ha2, ha1, start, len(b) - end, changed2)
+    diff_lines(
+        [ha1[i] for i in lines1], lines1, changed1,
+        [ha2[i] for i in lines2], lines2, changed2,
+    )
+    return sum(changed2), sum(changed1)
+
+
+def discard_lines(ha, other, first, last, changed):
+    """
+    Pick out the lines of one file worth diffing against another, as xdiff's xdl_cleanup_records() does, marking the rest changed.
+    A line the other file does not have is changed.  So is one the other file has many of, when it is among lines that are mostly changed or also common.
+    @param ha: the classes of the lines of the file
+    @param other: the classes of the lines of the other file
+    @param first: the index of the first line that may have changed
+    @param last: the index after the last line that may have changed
+    @param changed: whether each line of the file is changed, which is changed in place
+    @returns: a list of the indexes of the lines worth diffing
+    """
+    matches = {}  # class -> the number of lines of the other file of that class
+    for h in other:
+        matches[h] = matches.get(h, 0) + 1
+    many = min(bogosqrt(len(ha)), MAX_EQUAL_LIMIT)
+    # 0 for lines without a match, 2 for lines with many, 1 for the rest
+    kinds = [0] * len(ha)
+    for i in range(first, last):
+        count = matches.get(ha[i], 0)
+        kinds[i] = 0 if count == 0 else 2 if count >= many else 1
+    kept = []
+    for i in range(first, last):
+        if kinds[i] == 1 or (kinds[i] == 2 and not among_changed(kinds, i, first, last - 1)):
+            kept.append(i)
+        else:
+            changed[i] = True
+    return kept
+
+
+def among_changed(kinds, i, first, last):
+    """
+    Tell whether a line with many matches is among a run of lines that are mostly without any, as xdiff's xdl_clean_mmatch() does.
+    @param kinds: the kind of each line, as worked out by discard_lines()
+    @param i: the index of the line, which has many matches
+    @param first: the index of the first line that may have changed
+    @param last: the index of the last line that may have changed
+    @returns: True if the line is better left out of the diff
+    """
+    first = max(first, i - SIMILAR_SCAN_WINDOW)
+    last = min(last, i + SIMILAR_SCAN_WINDOW)
+    unmatched_before, many_before = 0, 1
+    r = 1
+    while i - r >= first:
+        if kinds[i - r] == 0:
+            unmatched_before += 1
+        elif kinds[i - r] == 2:
+            many_before += 1
+        else:
+            break
+        r += 1
+    if unmatched_before == 0:
+        return False  # only lines with many matches come before it
+    unmatched_after, many_after = 0, 1
+    r = 1
+    while i + r <= last:
+        if kinds[i + r] == 0:
+            unmatched_after += 1
+        elif kinds[i + r] == 2:
+            many_after += 1
+        else:
+            break
+        r += 1
+    if unmatched_after == 0:
+        return False
+    unmatched = unmatched_before + unmatched_after
+    many = many_before + many_after
+    return many * KEEP_MANY_RUN < many + unmatched
+
+
+def diff_lines(ha1, lines1, changed1, ha2, lines2, changed2):
+    """
+    Diff the lines of two files worth diffing, as xdiff's xdl_recs_cmp() does, marking those inserted and deleted changed.
+    The files are split where a path of the edit crosses the middle, and each half diffed in turn, giving up on the shortest edit once it gets too costly.
+    @param ha1, ha2: the classes of the lines of each file worth diffing
+    @param lines1, lines2: the index in the whole file of each of those lines
+    @param changed1, changed2: whether each line of each whole file is changed, which are changed in place
+    """
+    n1, n2 = len(ha1), len(ha2)
+    diagonals = n1 + n2 + 3
+    offset = n2 + 1  # the index in the lists below of diagonal 0
+    forward = [0] * diagonals  # the furthest line of the old file reached on each diagonal, searching forward
+    backward = [0] * diagonals  # and searching backward
+    max_cost = max(bogosqrt(diagonals), MAX_COST_MIN)
+    boxes = [(0, n1, 0, n2, False)]
+    while boxes:
+        off1, lim1, off2, lim2, need_min = boxes.pop()
+        # shrink the box by the lines common to its start or end
+        while off1 < lim1 and off2 < lim2 and ha1[off1] == ha2[off2]:
+            off1 += 1
+            off2 += 1
+        while off1 < lim1 and off2 < lim2 and ha1[lim1 - 1] == ha2[lim2 - 1]:
+            lim1 -= 1
+            lim2 -= 1
+        if off1 == lim1:
+            for i in range(off2, lim2):
+                changed2[lines2[i]] = True
+        elif off2 == lim2:
+            for i in range(off1, lim1):
+                changed1[lines1[i]] = True
+        else:
+            i1, i2, min_lo, min_hi = split(
+                ha1, off1, lim1, ha2, off2, lim2, forward, backward, offset, need_min, max_cost
+            )
+            boxes.append((i1, lim1, i2, lim2, min_hi))
+            boxes.append((off1, i1, off2, i2, min_lo))
+
+
+def split(ha1, off1, lim1, ha2, off2, lim2, forward, backward, offset, need_min, max_cost):
+    """
+    Find where to split a box of lines of two files to diff each half in turn, as xdiff's xdl_split() does.
+    @param ha1, ha2: the classes of the lines of each file
+    @param off1, lim1, off2, lim2: the lines of each file in the box, from off up to but not including lim
+    @param forward, backward: lists in which to keep the furthest line of the old file reached on each diagonal, searching forward and backward
+    @param offset: the index in those lists of diagonal 0
+    @param need_min: whether the shortest edit must be found, however costly
+    @param max_cost: how many lines inserted and deleted to search the shortest edit for before giving up on it
+    @returns: a tuple of the line of each file to split at, and whether the shortest edit must be found in the box before and after the split
+    """
+    dmin, dmax = off1 - lim2, lim1 - off2
+    fmid, bmid = off1 - off2, lim1 - lim2
+    odd = (fmid - bmid) & 1
+    fmin = fmax = fmid
+    bmin = bmax = bmid
+    forward[offset + fmid] = off1
+    backward[offset + bmid] = lim1
+    cost = 0
+    while True:
+        cost += 1
+        got_snake = False
+
+        # extend the diagonals searched forward by one either way, within the box
+        if fmin > dmin:
+            fmin -= 1
+            forward[offset + fmin - 1] = -1
+        else:
+            fmin += 1
+        if fmax < dmax:
+            fmax += 1
+            forward[offset + fmax + 1] = -1
+        else:
+            fmax -= 1
+        for d in range(fmax, fmin - 1, -2):
+            if forward[offset + d - 1] >= forward[offset + d + 1]:
+                i1 = forward[offset + d - 1] + 1
+            else:
+                i1 = forward[offset + d + 1]
+            previous = i1
+            i2 = i1 - d
+            while i1 < lim1 and i2 < lim2 and ha1[i1] == ha2[i2]:
+                i1 += 1
+                i2 += 1
+            if i1 - previous > SNAKE_COUNT:
+                got_snake = True
+            forward[offset + d] = i1
+            if odd and bmin <= d <= bmax and backward[offset + d] <= i1:
+                return i1, i2, True, True
+
+        # and those searched backward
+        if bmin > dmin:
+            bmin -= 1
+            backward[offset + bmin - 1] = LINE_MAX
+        else:
+            bmin += 1
+        if bmax < dmax:
+            bmax += 1
+            backward[offset + bmax + 1] = LINE_MAX
+        else:
+            bmax -= 1
+        for d in range(bmax, bmin - 1, -2):
+            if backward[offset + d - 1] < backward[offset + d + 1]:
+                i1 = backward[offset + d - 1]
+            else:
+                i1 = backward[offset + d + 1] - 1
+            previous = i1
+            i2 = i1 - d
+            while i1 > off1 and i2 > off2 and ha1[i1 - 1] == ha2[i2 - 1]:
+                i1 -= 1
+                i2 -= 1
+            if previous - i1 > SNAKE_COUNT:
+                got_snake = True
+            backward[offset + d] = i1
+            if not odd and fmin <= d <= fmax and i1 <= forward[offset + d]:
+                return i1, i2, True, True
+
+        if need_min:
+            continue
+
+        # once costly, split at a long enough run of common lines that has come far enough, if any
+        if got_snake and cost > HEURISTIC_MIN_COST:
+            best = 0
+            for d in range(fmax, fmin - 1, -2):
+                i1 = forward[offset + d]
+                i2 = i1 - d
+                v = (i1 - off1) + (i2 - off2) - abs(d - fmid)
+                if (
+                    v > HEURISTIC_FACTOR * cost
+                    and v > best
+                    and off1 + SNAKE_COUNT <= i1 < lim1
+                    and off2 + SNAKE_COUNT <= i2 < lim2
+                    and all(ha1[i1 - k] == ha2[i2 - k] for k in range(1, SNAKE_COUNT + 1))
+                ):
+                    best, split1, split2 = v, i1, i2
+            if best > 0:
+                return split1, split2, True, False
+            for d in range(bmax, bmin - 1, -2):
+                i1 = backward[offset + d]
+                i2 = i1 - d
+                v = (lim1 - i1) + (lim2 - i2) - abs(d - bmid)
+                if (
+                    v > HEURISTIC_FACTOR * cost
+                    and v > best
+                    and off1 < i1 <= lim1 - SNAKE_COUNT
+                    and off2 < i2 <= lim2 - SNAKE_COUNT
+                    and all(ha1[i1 + k] == ha2[i2 + k] for k in range(SNAKE_COUNT))
+                ):
+                    best, split1, split2 = v, i1, i2
+            if best > 0:
+                return split1, split2, False, True
+
+        # too costly: split wherever either search has come furthest
+        if cost >= max_cost:
+            fbest = fbest1 = -1
+            for d in range(fmax, fmin - 1, -2):
+                i1 = min(forward[offset + d], lim1)
+                i2 = i1 - d
+                if lim2 < i2:
+                    i1, i2 = lim2 + d, lim2
+                if fbest < i1 + i2:
+                    fbest, fbest1 = i1 + i2, i1
+            bbest = bbest1 = LINE_MAX
+            for d in range(bmax, bmin - 1, -2):
+                i1 = max(off1, backward[offset + d])
+                i2 = i1 - d
+                if i2 < off2:
+                    i1, i2 = off2 + d, off2
+                if i1 + i2 < bbest:
+                    bbest, bbest1 = i1 + i2, i1
+            if (lim1 + lim2) - bbest < fbest - (off1 + off2):
+                return fbest1, fbest - fbest1, True, False
+            return bbest1, bbest - bbest1, False, True
+
+
+def bogosqrt(n):
+    """
+    Approximate a square root with shifts, as xdiff does, rounding up to a power of two.
+    """
+    root = 1
+    while n > 0:
+        n >>= 2
+        root <<= 1
+    return root
+
+
+def span_hashes(data):
+    """
+    Hash a file in spans, each a line or 64 bytes, whichever is shorter, just as git's rename detection does.
+    @param data: the contents of the file
+    @returns: a dictionary of each span hash to the number of bytes of the file in spans with that hash
+    """
+    ignore_cr = not is_binary(data)  # carriage returns of text files' line breaks are ignored
+    hashes = {}
+    accum1 = accum2 = 0
+    n = 0
+    size = len(data)
+    for i in range(size):
+        c = data[i]
+        if ignore_cr and c == 13 and i + 1 < size and data[i + 1] == 10:
+            continue
+        old_1 = accum1
+        accum1 = ((accum1 << 7) ^ (accum2 >> 25)) & 0xFFFFFFFF
+        accum2 = ((accum2 << 7) ^ (old_1 >> 25)) & 0xFFFFFFFF
+        accum1 = (accum1 + c) & 0xFFFFFFFF
+        n += 1
+        if n < 64 and c != 10:
+            continue
+        hashval = ((accum1 + accum2 * 0x61) & 0xFFFFFFFF) % HASHBASE
+        hashes[hashval] = hashes.get(hashval, 0) + n
+        n = 0
+        accum1 = accum2 = 0
+    # like git, any last span without a line break is left out
+    return hashes
+
+
+def similarity(old, new, old_hashes=None, new_hashes=None):
+    """
+    Score how similar two files are, as git's rename detection does, i.e. by how much of the larger is copied from the other.
+    @param old: the contents of the file deleted
+    @param new: the contents of the file added
+    @param old_hashes, new_hashes: the span_hashes() of each, if already worked out
+    @returns: a score out of MAX_SCORE
+    """
+    max_size = max(len(old), len(new))
+    base_size = min(len(old), len(new))
+    # files too different in size to possibly be similar enough are not compared
+    if max_size * (MAX_SCORE - MINIMUM_SCORE) < (max_size - base_size) * MAX_SCORE:
+        return 0
+    if not new:
+        return 0
+    if old_hashes is None:
+        old_hashes = span_hashes(old)
+    if new_hashes is None:
+        new_hashes = span_hashes(new)
+    copied = sum(
+        min(count, old_hashes[hashval])
+        for hashval, count in new_hashes.items()
+        if hashval in old_hashes
+    )
+    return copied * MAX_SCORE // max_size
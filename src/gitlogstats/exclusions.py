@@ -0,0 +1,119 @@
+"""
+Matching of file paths against the exclusions, just as git matches them against the :(exclude,glob)**/<exclusion> pathspecs gitlogstats passes it.
+"""
+
+import functools
+import re
+
+
+class ExclusionMatcher:
+    def __init__(self, exclusions):
+        """
+        Compile the exclusions into a single pattern.
+        @param exclusions: a list of files to exclude, wild cards accepted, e.g. ['foo.csv', '*.zip', '*.jpg']
+        """
+        self.exclusions = list(exclusions)
+        self.matches = {}  # path -> whether it is excluded, so each distinct path is only matched once
+        self.pattern = None
+        if self.exclusions:
+            self.pattern = re.compile(
+                "|".join(f"(?:{glob_to_regex('**/' + x)})" for x in self.exclusions),
+                re.DOTALL,
+            )
+
+    def __call__(self, path):
+        """
+        Check whether a file is excluded.
+        @param path: the path of the file, relative to the top of the repository, with / separators
+        @returns: True if any exclusion matches the whole path.  like git, matching a directory the file is in is not enough.
+        """
+        excluded = self.matches.get(path)
+        if excluded is None:
+            excluded = self.pattern is not None and self.pattern.fullmatch(path) is not None
+            self.matches[path] = excluded
+        return excluded
+
+
+@functools.lru_cache(maxsize=16)
+def exclusion_matcher(exclusions):
+    """
+    Return the matcher of a list of exclusions, shared by every repository parsed with them, so each distinct path is only matched once per run.
+    @param exclusions: a tuple of files to exclude, wild cards accepted
+    @returns: an ExclusionMatcher
+    """
+    return ExclusionMatcher(exclusions)
+
+
+def glob_to_regex(pattern):
+    """
+    Translate a glob into a regular expression, with the meanings git's glob pathspecs give wild cards.
+    * and ? do not match a /, a leading **/ matches any number of directories, including none, and a trailing /** matches everything inside a directory.
+    @param pattern: the glob
+    @returns: a regular expression that matches the same paths
+    """
+    regex = []
+    i = 0
+    n = len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith("**/", i) and (i == 0 or pattern[i - 1] == "/"):
+            regex.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == n:
+            regex.append("/.*")
+            i += 3
+        elif c == "*":
+            while i < n and pattern[i] == "*":
+                i += 1
+            regex.append("[^/]*")
+        elif c == "?":
+            regex.append("[^/]")
+            i += 1
+        elif c == "[":
+            end, character_class = translate_class(pattern, i)
+            if character_class is None:
+                regex.append(re.escape(c))  # an unclosed bracket matches itself
+                i += 1
+            else:
+                regex.append(character_class)
+                i = end
+        elif c == "\\" and i + 1 < n:
+            regex.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            regex.append(re.escape(c))
+            i += 1
+    return "".join(regex)
+
+
+def translate_class(pattern, start):
+    """
+    Translate a bracket expression of a glob, e.g. [a-z] or [!0-9], into a character class.
+    @param pattern: the glob
+    @param start: the index of the opening bracket
+    @returns: a tuple of the index just past the closing bracket and the character class, or (start, None) if the bracket is never closed
+    """
+    i = start + 1
+    negated = i < len(pattern) and pattern[i] in "!^"
+    if negated:
+        i += 1
+    members = []
+    first = True
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "]" and not first:
+            # like * and ?, a class never matches a /
+            if negated:
+                return i + 1, "[^/" + "".join(members) + "]"
+            return i + 1, "(?!/)[" + "".join(members) + "]"
+        if c == "\\" and i + 1 < len(pattern):
+            members.append(re.escape(pattern[i + 1]))
+            i += 2
+        elif c == "-" and members and i + 1 < len(pattern) and pattern[i + 1] != "]":
+            members.append("-")
+            i += 1
+        else:
+            members.append(re.escape(c))
+            i += 1
+        first = False
+    return start, None
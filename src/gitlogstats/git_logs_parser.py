@@ -1,15 +1,50 @@
 #!/usr/bin/env python3
 
+import contextlib
+import copy
+import io
 import os
 
 # import sys
 import subprocess
+import tempfile
 
 # import argparse
 import datetime
 import shlex
-import re
-import json
+from bisect import bisect_right
+
+from .branches import branch_indexes, match_branches, reachability
+from .buckets import bucket_ranges
+from .cache import ResultCache
+from .churn import Churn
+from .columns import CommitColumns
+from .exclusions import exclusion_matcher
+from .log_stream import (
+    author_pattern,
+    iter_commit_files,
+    iter_commits,
+    iter_numstat_commits,
+    iter_records,
+    simplify_history,
+)
+from .objects import ObjectStoreError
+from .writers import iter_formatted
+
+# the header line git prints for each commit when walking the logs in a single pass: "commit <hash>\t<commit timestamp>\t<author email>\t<author name>"
+SINGLE_PASS_FORMAT = "commit %H%x09%ct%x09%aE%x09%aN"
+
+# the header line git prints for each commit when the exclusions are matched in python, which also gives the tree and parents, so history can be simplified just as git would
+NUMSTAT_FORMAT = "commit %H%x09%ct%x09%T%x09%P%x09%aE%x09%aN"
+
+# environment variables that point git at a repository other than the directory it runs in, e.g. as set inside git hooks
+REPOSITORY_ENV_VARS = [
+    "GIT_DIR",
+    "GIT_WORK_TREE",
+    "GIT_INDEX_FILE",
+    "GIT_OBJECT_DIRECTORY",
+    "GIT_COMMON_DIR",
+]
 
 
 class GitLogsParser:
@@ -23,16 +58,38 @@ class GitLogsParser:
         repofile=None,
         verbose=False,
         clean=False,
+        single_pass=False,
+        branch=None,
+        cache=None,
+        store=None,
+        backend="git",
+        profiler=None,
+        match_exclusions="git",
+        branches=None,
+        bucket=None,
+        aliases=None,
+        refresh_store=True,
     ):
         """
         Initialize the git logs parser for a given repository
-        @param repo: the path to the repository of interest.
+        @param repo: the path to the repository of interest.  git is run in this directory; the current working directory is never changed.
         @param start: the start date of interest, in standard US format, e.g. 01/01/2021. defaults to exactly 1 year ago.
         @param end: the end date of interest, in standard US format, e.g. 12/31/2021.  defaults to today's date.
         @param username: an optional username of interest.  if not present, we report all contributing users
         @param exclusions: a list of files to exclude from analysis.  wild cards accepted, e.g. ['foo.csv', '*.zip', '*.jpg']
         @param verbose: whether to output debugging info.  defaults to False.
         @param clean: remove contributors without any contribuition.  defaults to False.
+        @param single_pass: collect the stats of all contributors from a single walk of the git logs, rather than one walk per contributor.  defaults to False.
+        @param branch: the name of the branch checked out in the repository, if not the default branch.  used to tell cached results apart.
+        @param cache: an optional ResultCache in which to look up and store results.  defaults to None, i.e. no caching.
+        @param store: an optional CommitStore of this repository's commit stats.  when given, only commits made since the store was last brought up to date are read from the git logs, and the stats are summed from the store.  defaults to None.
+        @param backend: how to read the history, one of BACKENDS.  "python" reads git's files without spawning any git process, falling back to git whenever it can not.  defaults to "git".
+        @param profiler: an optional Profiler to measure the time spent in each phase of parsing, and the git processes run.  defaults to None.
+        @param match_exclusions: where to match file paths against the exclusions, one of EXCLUSION_MATCHERS.  "python" walks the logs once with git log --numstat, without any exclusion pathspecs, and leaves out the excluded files itself, summing every contributor's stats from that one walk.  defaults to "git".
+        @param branches: an optional list of branches to parse instead of the one checked out, glob patterns accepted, e.g. ['main', 'develop', 'release/*'].  the branches are read without being checked out, the logs are walked once for all of them, and stats are reported per branch and contributor.  git is run to read them, whatever the backend.  defaults to None.
+        @param bucket: an optional size of bucket of time to split the stats into, one of BUCKETS, e.g. "week".  the logs are walked once, and stats are reported per bucket and contributor, with the start and end dates of each bucket.  can not be combined with branches.  defaults to None.
+        @param aliases: an optional Aliases, mapping the names and emails contributors have committed under, after any .mailmap, to one canonical id each.  the logs are then walked once, as in single-pass mode, each distinct author is resolved once, and the username is matched against canonical ids exactly, rather than as a pattern.  defaults to None.
+        @param refresh_store: whether to bring the commit store up to date with any new commits before reading it.  turned off by whatever keeps the store up to date itself, e.g. the server, so no git process is run to answer a query.  defaults to True.
         """
 
         self.repository = repo
@@ -43,53 +100,243 @@ class GitLogsParser:
         self.exclusions = exclusions if exclusions is not None else []
         self.verbose = verbose
         self.clean = clean
+        self.single_pass = single_pass
+        self.branch = branch
+        self.cache = cache
+        self.cache_hit = False  # whether the last results were those of an earlier run, found in the cache
+        self.store = store
+        self.profiler = profiler
+        self.match_exclusions = match_exclusions
+        self.branches = list(branches) if branches else None
+        self.tips = None  # the branches matched, and the commits at their tips, once looked up
+        self.bucket = bucket
+        self.aliases = aliases
+        self.refresh_store = refresh_store
+        self.matched = None  # the date range, commits, and commits by author of the logs walked when matching the exclusions in python
+        self.requested_backend = backend
+        self.backend = None  # the in-process backend, if any... git is run whenever there is none
+        if backend == "python":
+            from .backends import PythonBackend  # only loaded when asked for
 
-        # go into the selected repository directory, if any
-        if self.repository:
-            self.verboseprint(f"Switching to: {self.repository}...")
-            os.chdir(self.repository)
+            try:
+                self.backend = PythonBackend(repo, self.exclusions)
+            except (ObjectStoreError, OSError) as e:
+                self.verboseprint(f"Reading {repo} with git instead: {e}")
 
-    def get_contributors(self):
+    def get_contributors(self, all_time=False):
         """
         Return a list of contributors to this repository.
-        @returns: a list of all contributors' git usernames
+        By default, only those with commits to the included files within the date range are listed, so nobody else's logs need to be walked.
+        @param all_time: list everyone who has ever committed to the repository instead.  defaults to False.
+        @returns: a list of contributors' git usernames, those with the most commits first unless all_time is set
         """
-        contributors = set()  # a set that will include all contributors
-
-        # use git logs to get all contributor usernames
-
-        # split up the command so the subprocess module can run it
-        cmd = "git log --format='%aN'".split(" ")
-        with subprocess.Popen(
-            cmd, stdout=subprocess.PIPE, bufsize=1, universal_newlines=True
-        ) as p:
-            for line in p.stdout:
-                line = line.strip().strip("'")  # remove line break and single quotes
-                contributors.add(line)  # add to set
+        git_start_date, git_end_date = self.get_git_dates()
+        with self.phase("contributors"):
+            if all_time:
+                contributors = self.from_backend(lambda backend: backend.all_contributors())
+            else:
+                contributors = self.from_backend(
+                    lambda backend: backend.contributors(
+                        git_start_date.timestamp(), git_end_date.timestamp()
+                    )
+                )
+            if contributors is None:
+                contributors = self.git_contributors(all_time, git_start_date, git_end_date)
 
-        contributors = list(contributors)  # list version
         contributors_string = ", ".join(contributors)  # string version
         self.verboseprint(f"Contributors: {contributors_string}...")
         return contributors
 
-    def parse(self):
+    def git_contributors(self, all_time, git_start_date, git_end_date):
         """
-        Parse the git logs and extract a breakdown of the contributions of each contributing user.
-        @returns: contribution stats of all users, as a dictionary with usernames as the keys
+        Run git to list the contributors to this repository.
+        @param all_time: list everyone who has ever committed to the repository, rather than those with commits to the included files within the date range
+        @param git_start_date: the date after which commits are included, as a datetime
+        @param git_end_date: the date before which commits are included, as a datetime
+        @returns: a list of contributors' git usernames
         """
+        if not all_time and self.match_exclusions == "python":
+            return self.matched_contributors(git_start_date, git_end_date)
+
+        contributors = {}  # a dict, used as an ordered set, that will include all contributors
+
+        # use git logs to get the contributor usernames
+        if all_time:
+            # split up the command so the subprocess module can run it
+            cmd = "git log --format='%aN'".split(" ")
+        else:
+            # git shortlog outputs a line per author, e.g. "    12\talice", rather than one per commit
+            cmd = [
+                "git",
+                "shortlog",
+                "-s",
+                "-n",
+                f"--after={git_start_date}",
+                f"--before={git_end_date}",
+                "HEAD",
+            ] + self.pathspecs()
+        for line in self.git_lines(cmd):
+            line = line.rsplit("\t", 1)[-1]  # remove any commit count
+            line = line.strip().strip("'")  # remove line break and single quotes
+            contributors[line] = True  # add to set
+
+        return list(contributors)  # list version
 
-        # git requires start & end dates to be 1 day before and after the target range
+    def get_git_dates(self):
+        """
+        Return the date range to pass to git's --after and --before filters.
+        git requires start & end dates to be 1 day before and after the target range.
+        @returns: a tuple of the start and end datetimes
+        """
         git_start_date = datetime.datetime.strptime(
             self.start, "%m/%d/%Y"
         ) - datetime.timedelta(days=1)
         git_end_date = datetime.datetime.strptime(
             self.end, "%m/%d/%Y"
         ) + datetime.timedelta(days=1)
+        return git_start_date, git_end_date
+
+    def parse(self):
+        """
+        Parse the git logs and extract a breakdown of the contributions of each contributing user.
+        @returns: contribution stats of all users, as a list of dictionaries, one per user
+        """
+        return list(self.iter_parse())
+
+    def iter_parse(self):
+        """
+        Parse the git logs just like parse(), but yield the stats of each user as soon as they are known.
+        When walking the logs once per contributor, the first user's stats are yielded before the next user's logs are read, and the remaining logs are never read if the caller stops early.
+        Results are only cached once every user's stats have been yielded.
+        @returns: a generator of contribution stats, one dictionary per user
+        """
+        # reuse the results of an earlier run with the same settings, if nothing has been committed since
+        if self.cache is not None:
+            with self.phase("cache"):
+                cache_key = self.cache_key()
+                cached = self.cache.get(cache_key)
+            if cached is not None:
+                self.verboseprint(f"Using cached results for {self.repository}...")
+                self.cache_hit = True
+                yield from cached
+                return
+
+        git_start_date, git_end_date = self.get_git_dates()
+
+        def walk():
+            if self.branches:
+                return self.parse_branches(git_start_date, git_end_date)
+            if self.bucket:
+                return self.parse_buckets(git_start_date, git_end_date)
+            if self.store is not None:
+                return self.parse_from_store(git_start_date, git_end_date)
+            if self.single_pass or self.aliases is not None:
+                # identities can only be resolved once each commit's author is known
+                return self.parse_single_pass(git_start_date, git_end_date)
+            return self.parse_per_contributor(git_start_date, git_end_date)
+
+        entries = self.profiled("log", walk)
+
+        stats = []
+        for entry in entries:
+            # removing merges since they are not reliably mentioned in the stats
+            # if(self.clean and (entry['merges'] == 0 and entry['commits'] == 0 and entry['insertions'] == 0 and entry['deletions'] == 0 and entry['files'] == 0)):
+            if self.clean and self.is_blank(entry):
+                continue
+            stats.append(entry)
+            yield entry
+        if self.cache is not None:
+            self.cache.put(cache_key, stats)
+
+    @staticmethod
+    def is_blank(entry):
+        """
+        Tell whether a stats entry is of a contributor without any contribution, to be removed when cleaning.
+        @param entry: the stats entry
+        @returns: True if all its counts are zero
+        """
+        return (
+            entry["commits"] == 0
+            and entry["insertions"] == 0
+            and entry["deletions"] == 0
+            and entry["files"] == 0
+        )
+
+    def parse_queries(self, queries):
+        """
+        Answer many queries for the stats of a user, or of every contributor, within a date range, from a single scan of the history.
+        The commits of every query's date range are read once, from the commit store if there is one, or else from one walk of the git logs, and indexed by author and date.
+        Each query is then answered by binary search, however many commits it covers.  The parser's own username, start and end dates are not used.
+        @param queries: an iterable of (username, start, end) tuples, with username None for every contributor, and the dates in standard US format, e.g. ("alice", "01/01/2024", "01/14/2024")
+        @returns: a list of the results of each query, in the order given, each a list of stats entries, just as parse() would return for that user and date range, except that contributors are listed in the order they were first read
+        """
+        parsers = [self.for_query(username, start, end) for username, start, end in queries]
+        if not parsers:
+            return []
+        dates = [parser.get_git_dates() for parser in parsers]
+
+        with self.phase("log"):
+            if self.store is not None:
+                self.load_store()
+                commits = self.store.commits
+            else:
+                # one walk, of every commit by anyone from the earliest start date to the latest end date
+                everyone = self.for_query(None, self.start, self.end)
+                commits = CommitColumns(
+                    everyone.walk_commits(min(start for start, end in dates), max(end for start, end in dates))
+                )
+            index = commits.index()
+
+        contributors = None  # everyone who has ever committed, when reporting those without commits too
+        results = []
+        for parser, (git_start_date, git_end_date) in zip(parsers, dates):
+            if not parser.username and not self.clean and contributors is None:
+                names = self.store.authors() if self.store is not None else parser.get_contributors(all_time=True)
+                contributors = self.identities(names)
+            totals = index.totals_by_author(*parser.store_filters(git_start_date, git_end_date, commits))
+            entries = parser.sum_totals(totals, [] if parser.username or self.clean else contributors)
+            results.append([entry for entry in entries if not (self.clean and self.is_blank(entry))])
+        return results
+
+    def for_query(self, username, start, end):
+        """
+        Make a parser of the same repository, with the same settings, commit store and aliases, for another user and date range.
+        @param username: the git username of interest, or None for every contributor
+        @param start: the start date, in standard US format
+        @param end: the end date, in standard US format
+        @returns: a GitLogsParser
+        """
+        parser = copy.copy(self)
+        parser.username = username
+        parser.start = start
+        parser.end = end
+        return parser
+
+    def iter_commits(self):
+        """
+        Yield the stats of each individual commit in the date range, by the selected user if any, as it is read from the git logs.
+        Commits are attributed to the exact author name git reports, just as in single-pass mode.
+        @returns: a generator of Commit tuples, newest first
+        """
+        git_start_date, git_end_date = self.get_git_dates()
+        if self.store is not None:
+            yield from self.profiled(
+                "log", lambda: self.stored_commits(git_start_date, git_end_date)
+            )
+        else:
+            yield from self.profiled(
+                "log", lambda: self.walk_commits(git_start_date, git_end_date)
+            )
 
-        # get stats for each contributor
-        stats = []  # will contain contribution stats for each contributor
+    def parse_per_contributor(self, git_start_date, git_end_date):
+        """
+        Walk the git logs once for each contributor, using git's --author filter.
+        @param git_start_date: the date after which commits are included, as a datetime
+        @param git_end_date: the date before which commits are included, as a datetime
+        @returns: a generator of stats entries, one per contributor, each yielded once that contributor's logs have been read
+        """
 
-        # if no contributor specified, get a list of all of them
+        # if no contributor specified, get a list of all of them with commits in the date range
         contributors = [self.username]  # liit to the specified username, if any
         if not self.username:
             contributors = list(
@@ -97,6 +344,45 @@ class GitLogsParser:
             )  # the full list of contributors
 
         for contributor in contributors:
+            # set up stats for this contributor in dictionary form
+            entry = self.new_entry(contributor)
+            # read the number of files changed, lines inserted, lines deleted of each commit, then sum them all at once
+            commits = CommitColumns(self.contributor_commits(contributor, git_start_date, git_end_date))
+            self.add_totals(entry, commits.totals())
+            # hand this user's stats over before reading the next user's logs
+            yield entry
+            # self.verboseprint('Entry: ', entry) # only printed when in verbose mode
+
+        # everyone else is known to have no commits in the date range without walking their logs
+        if not self.username and not self.clean:
+            for contributor in self.get_contributors(all_time=True):
+                if contributor not in contributors:
+                    yield self.new_entry(contributor)
+
+    def contributor_commits(self, contributor, git_start_date, git_end_date):
+        """
+        Read the commits in the date range whose author matches a contributor's name, just like git's --author filter.
+        @param contributor: the contributor's name
+        @param git_start_date: the date after which commits are included, as a datetime
+        @param git_end_date: the date before which commits are included, as a datetime
+        @returns: an iterable of Commit tuples
+        """
+        commits = self.from_backend(
+            lambda backend: backend.commits(
+                git_start_date.timestamp(), git_end_date.timestamp(), author=contributor
+            )
+        )
+        if commits is None and self.match_exclusions == "python":
+            # only each distinct author, rather than each commit, need be matched against the contributor's name
+            pattern = author_pattern(contributor)
+            authors = self.matched_authors(git_start_date, git_end_date)
+            commits = [
+                commit
+                for (name, email), commits in authors.items()
+                if pattern.search(f"{name} <{email}>")
+                for commit in commits
+            ]
+        if commits is None:
             exclusions = "-- . " + " ".join(
                 [f'":(exclude,glob)**/{x}"' for x in self.exclusions]
             )  # put the exclusions in the format git logs uses
@@ -105,85 +391,653 @@ class GitLogsParser:
             self.verboseprint(f"Running command: {cmd}")
             # self.verboseprint(f'With exclusions: {exclusions}')
             cmd = shlex.split(cmd)  # split command by spaces, except where in quotes
-            result = subprocess.run(
-                cmd, capture_output=True, check=True
-            )  # run the command
-            logs = result.stdout.decode("utf-8")  # capture the output
-            # set up stats for this contributor in dictionary form
-            entry = {
-                "username": contributor,  # redundant, but useful
-                "repository": self.repo_name_from_url(self.repository),
+            # read the number of files changed, lines inserted, lines deleted of each commit as git outputs it
+            commits = iter_commits(self.git_lines(cmd))
+        return commits
+
+    def parse_single_pass(self, git_start_date, git_end_date):
+        """
+        Walk the git logs only once, summing up the stats of every contributor along the way.
+        Commits are attributed to the exact author name git reports, rather than to every contributor whose name matches git's --author pattern.
+        @param git_start_date: the date after which commits are included, as a datetime
+        @param git_end_date: the date before which commits are included, as a datetime
+        @returns: a list of stats entries, one per contributor
+        """
+        commits = self.walk_commits(git_start_date, git_end_date)
+
+        # contributors without commits in the date range are only reported when not cleaning them out anyway
+        contributors = []
+        if not self.username and not self.clean:
+            contributors = self.identities(self.get_contributors(all_time=True))
+        return self.sum_commits(commits, contributors)
+
+    def parse_from_store(self, git_start_date, git_end_date):
+        """
+        Bring the commit store up to date with any new commits, then sum up the stats of the commits it holds in the date range.
+        @param git_start_date: the date after which commits are included, as a datetime
+        @param git_end_date: the date before which commits are included, as a datetime
+        @returns: a list of stats entries, one per contributor
+        """
+        self.load_store()
+
+        # the store holds the whole history, so knows every contributor
+        contributors = []
+        if not self.username and not self.clean:
+            contributors = self.identities(self.store.authors())
+        totals = self.store.commits.totals_by_author(*self.store_filters(git_start_date, git_end_date))
+        return self.sum_totals(totals, contributors)
+
+    def parse_branches(self, git_start_date, git_end_date):
+        """
+        Walk the git logs of every branch of interest at once, summing up the stats of every contributor to each branch along the way.
+        Each commit is read only once, however many of the branches it is on, and is attributed to each of those branches.
+        Commits are attributed to the exact author name git reports, just as in single-pass mode.
+        @param git_start_date: the date after which commits are included, as a datetime
+        @param git_end_date: the date before which commits are included, as a datetime
+        @returns: a list of stats entries, one per branch and contributor, grouped by branch
+        """
+        tips = self.branch_tips()
+        if not tips:
+            return []
+        shas = [sha for branch, sha in tips]
+
+        # work out which branches each commit is on, from a walk without any diffs.
+        # history is simplified just as git log simplifies it, so a merge git only follows one parent of only passes its branches on to that parent
+        cmd = [
+            "git",
+            "rev-list",
+            "--topo-order",
+            "--sparse",
+            "--parents",
+            f"--since={git_start_date}",
+        ] + shas + self.pathspecs()
+        self.verboseprint(f"Running command: {' '.join(cmd)}")
+        masks = reachability(self.git_lines(cmd), shas)
+
+        # set up an entry for each contributor of interest on each branch
+        stats = [{} for branch in tips]  # one dict of contributor name -> stats entry per branch
+        contributors = []
+        if self.username:
+            contributors = [self.username]
+        elif not self.clean:
+            contributors = self.identities(self.get_contributors(all_time=True))
+        for (branch, sha), entries in zip(tips, stats):
+            for contributor in contributors:
+                entries[contributor] = self.new_entry(contributor, branch)
+
+        filters = [f"--after={git_start_date}", f"--before={git_end_date}"]
+        if self.author_filter():
+            filters.append(f"--author={self.username}")
+        cmd = self.log_command(*filters, *shas)
+        self.verboseprint(f"Running command: {' '.join(cmd)}")
+        for commit in self.resolved_commits(iter_commits(self.git_lines(cmd))):
+            author = self.username or self.identity(commit.author, commit.email)
+            for i in branch_indexes(masks.get(commit.sha, 0)):
+                entries = stats[i]
+                if author not in entries:
+                    entries[author] = self.new_entry(author, tips[i][0])
+                entry = entries[author]
+                entry["commits"] += 1
+                entry["files"] += commit.files
+                entry["insertions"] += commit.insertions
+                entry["deletions"] += commit.deletions
+        return [entry for entries in stats for entry in entries.values()]
+
+    def parse_buckets(self, git_start_date, git_end_date):
+        """
+        Walk the git logs once, summing up the stats of every contributor in each bucket of time along the way.
+        Commits are put in buckets all at once, by their commit timestamps, and attributed to the exact author name git reports, just as in single-pass mode.
+        @param git_start_date: the date after which commits are included, as a datetime
+        @param git_end_date: the date before which commits are included, as a datetime
+        @returns: a list of stats entries, one per bucket and contributor with commits in it, oldest bucket first
+        """
+        ranges, boundaries = self.bucket_windows(git_start_date)
+        if self.store is not None:
+            self.load_store()
+            totals = self.store.commits.totals_by_window(
+                boundaries, *self.store_filters(git_start_date, git_end_date)
+            )
+        else:
+            commits = CommitColumns(self.walk_commits(git_start_date, git_end_date))
+            totals = commits.totals_by_window(boundaries)
+
+        stats = {}  # (bucket, contributor name) -> stats entry
+        # sorted by bucket only, so contributors stay in the order of their first commit within each
+        for ((name, email), window), counts in sorted(totals.items(), key=lambda item: item[0][1]):
+            author = self.username or self.identity(name, email)
+            if (window, author) not in stats:
+                entry = self.new_entry(author)
+                first, last = ranges[window]
+                entry["start_date"] = first.strftime("%m/%d/%Y")
+                entry["end_date"] = last.strftime("%m/%d/%Y")
+                stats[(window, author)] = entry
+            self.add_totals(stats[(window, author)], counts)
+        return list(stats.values())
+
+    def bucket_windows(self, git_start_date):
+        """
+        Split the date range into buckets of time.
+        @param git_start_date: the date after which commits are included, as a datetime
+        @returns: a tuple of a list of the (first date, last date) of each bucket, and a list of the timestamps each bucket starts at.  the first bucket also holds any commits git's --after lets in from before the start date.
+        """
+        ranges = bucket_ranges(
+            datetime.datetime.strptime(self.start, "%m/%d/%Y").date(),
+            datetime.datetime.strptime(self.end, "%m/%d/%Y").date(),
+            self.bucket,
+        )
+        boundaries = [git_start_date.timestamp()] + [
+            datetime.datetime.combine(first, datetime.time()).timestamp()
+            for first, last in ranges[1:]
+        ]
+        return ranges, boundaries
+
+    def parse_churn(self, top=10):
+        """
+        Walk the git logs once with git log --numstat, finding the files and directories each contributor churned the most, i.e. inserted and deleted the most lines of, in each bucket of time if splitting the stats into buckets.
+        Only a few times as many files and directories as are reported are counted at once for each contributor, so memory stays bounded however many paths the repository has.  The counts of a path are exact unless the contributor churned more than that many paths, in which case those of paths counted only part of the time are too low.
+        Commits are attributed to the exact author name git reports, just as in single-pass mode.  Renamed files are attributed to their new paths, and merges are left out.  git is run to read the logs, whatever the backend, and the commit store is not used.
+        @param top: the most files, and the most directories, to report per contributor and bucket.  defaults to 10.
+        @returns: a list of churn entries, one per contributor, bucket, kind of path and path, with the most churned paths of each first, each a dictionary like {"username", "repository", "start_date", "end_date", "kind", "path", "commits", "insertions", "deletions"}
+        """
+        git_start_date, git_end_date = self.get_git_dates()
+        ranges, boundaries = None, None
+        if self.bucket:
+            ranges, boundaries = self.bucket_windows(git_start_date)
+        filters = [f"--after={git_start_date}", f"--before={git_end_date}"]
+        if self.author_filter():
+            filters.append(f"--author={self.username}")
+        cmd = ["git", "log", "--numstat", "-z", f"--format={SINGLE_PASS_FORMAT}"] + filters + self.pathspecs()
+        self.verboseprint(f"Running command: {' '.join(cmd)}")
+
+        churn = Churn(top)
+        with self.phase("log"):
+            for commit in self.resolved_commits(iter_commit_files(iter_records(self.git_lines(cmd)))):
+                window = 0
+                if boundaries is not None:
+                    window = bisect_right(boundaries, commit.timestamp) - 1
+                    if window < 0:
+                        continue
+                author = self.username or self.identity(commit.author, commit.email)
+                churn.add((window, author), commit.changes)
+
+        entries = []
+        # sorted by bucket only, so contributors stay in the order of their first commit within each
+        for (window, author), kind, paths in sorted(churn.items(), key=lambda item: item[0][0]):
+            start, end = self.start, self.end
+            if ranges is not None:
+                start, end = (day.strftime("%m/%d/%Y") for day in ranges[window])
+            for path, commits, insertions, deletions in paths:
+                entries.append(
+                    {
+                        "username": author,
+                        "repository": self.repo_name_from_url(self.repository),
+                        "start_date": start,
+                        "end_date": end,
+                        "kind": kind,
+                        "path": path,
+                        "commits": commits,
+                        "insertions": insertions,
+                        "deletions": deletions,
+                    }
+                )
+        return entries
+
+    def branch_tips(self):
+        """
+        Look up the branches of interest, and the commits at their tips.
+        A branch is read from the origin remote's copy of it, which every fetch brings up to date, when there is one, or else from the local branch.
+        @returns: a list of (branch name, commit hash) tuples
+        """
+        if self.tips is None:
+            cmd = [
+                "git",
+                "for-each-ref",
+                "--format=%(refname)%09%(objectname)",
+                "refs/remotes/origin",
+                "refs/heads",
+            ]
+            refs = [line.rstrip("\n").split("\t") for line in self.git_lines(cmd) if line.strip()]
+            self.tips = match_branches(refs, self.branches)
+            self.verboseprint(f"Branches: {', '.join(branch for branch, sha in self.tips)}")
+        return self.tips
+
+    def walk_commits(self, git_start_date, git_end_date):
+        """
+        Walk the git logs once, yielding each commit in the date range, by the selected user if any.
+        @param git_start_date: the date after which commits are included, as a datetime
+        @param git_end_date: the date before which commits are included, as a datetime
+        @returns: an iterable of Commit tuples
+        """
+        commits = self.from_backend(
+            lambda backend: backend.commits(
+                git_start_date.timestamp(), git_end_date.timestamp(), author=self.author_filter()
+            )
+        )
+        if commits is not None:
+            return self.resolved_commits(commits)
+        if self.match_exclusions == "python":
+            commits = self.matched_commits(git_start_date, git_end_date)
+            if self.author_filter():
+                commits = self.matching_authors(commits, author_pattern(self.username))
+            return self.resolved_commits(commits)
+        filters = [f"--after={git_start_date}", f"--before={git_end_date}"]
+        if self.author_filter():
+            filters.append(f"--author={self.username}")
+        cmd = self.log_command(*filters)
+        self.verboseprint(f"Running command: {' '.join(cmd)}")
+        return self.resolved_commits(iter_commits(self.git_lines(cmd)))
+
+    def author_filter(self):
+        """
+        Return the username to give git's --author filter, or its equivalents, when walking the logs.
+        @returns: the username, or None if every author's commits must be read, e.g. since the username is matched against canonical ids instead
+        """
+        return self.username if self.aliases is None else None
+
+    def identity(self, name, email):
+        """
+        Find the canonical id of an author, if resolving identities.
+        @param name: the name the author committed under
+        @param email: the email address the author committed under
+        @returns: the canonical id, or the name itself if not resolving identities
+        """
+        if self.aliases is None:
+            return name
+        return self.aliases.resolve(name, email)
+
+    def identities(self, names):
+        """
+        Find the distinct canonical ids of a list of contributors' names, if resolving identities.
+        @param names: a list of names
+        @returns: a list of the canonical ids, in the order of the names
+        """
+        return list(dict.fromkeys(self.identity(name, None) for name in names))
+
+    def resolved_commits(self, commits):
+        """
+        Pick out the commits by the selected user, if any, by matching their canonical ids exactly, when resolving identities.
+        @param commits: an iterable of Commit tuples
+        @returns: an iterable of the commits by the user, or all the commits when not resolving identities, or when no user is selected
+        """
+        if self.aliases is None or not self.username:
+            return commits
+        username = self.identity(self.username, None)
+        return (commit for commit in commits if self.identity(commit.author, commit.email) == username)
+
+    def matched_commits(self, git_start_date, git_end_date):
+        """
+        Walk the git logs once with git log --numstat, without any pathspecs, and leave out the excluded files in python instead.
+        The whole history since the start date is walked, as git log -m walks it, then simplified just as git would have simplified it had it been given the exclusions, so the same commits are kept.
+        The commits are kept, so the stats of every contributor, and the contributors themselves, are read from the same walk.
+        @param git_start_date: the date after which commits are included, as a datetime
+        @param git_end_date: the date before which commits are included, as a datetime
+        @returns: a list of Commit tuples, newest first
+        """
+        if self.matched is None or self.matched[0] != (git_start_date, git_end_date):
+            # merges are diffed against each parent, to tell which, if any, git would have followed alone.
+            # commits after the end date are walked too, since their merges decide which earlier commits git would have walked.
+            # no pathspec is given, since git would then leave out commits without any changes, which the walk must still go through
+            cmd = [
+                "git",
+                "log",
+                "-m",
+                "--numstat",
+                "-z",
+                f"--format={NUMSTAT_FORMAT}",
+                f"--after={git_start_date}",
+            ]
+            self.verboseprint(f"Running command: {' '.join(cmd)}")
+            walked = iter_numstat_commits(
+                iter_records(self.git_lines(cmd)),
+                exclusion_matcher(tuple(self.exclusions)),
+                recount=self.recount,
+            )
+            commits = simplify_history(walked, before=git_end_date.timestamp())
+            self.matched = ((git_start_date, git_end_date), commits, None)
+        return self.matched[1]
+
+    def matched_authors(self, git_start_date, git_end_date):
+        """
+        Group the commits walked when matching the exclusions in python by author.
+        @param git_start_date: the date after which commits are included, as a datetime
+        @param git_end_date: the date before which commits are included, as a datetime
+        @returns: a dictionary of lists of Commit tuples, by (author name, author email)
+        """
+        commits = self.matched_commits(git_start_date, git_end_date)
+        if self.matched[2] is None:
+            authors = {}
+            for commit in commits:
+                authors.setdefault((commit.author, commit.email), []).append(commit)
+            self.matched = self.matched[:2] + (authors,)
+        return self.matched[2]
+
+    def matched_contributors(self, git_start_date, git_end_date):
+        """
+        List the contributors with commits to the included files within the date range, just as git shortlog -s -n would, from the commits walked when matching the exclusions in python.
+        @param git_start_date: the date after which commits are included, as a datetime
+        @param git_end_date: the date before which commits are included, as a datetime
+        @returns: a list of contributors' git usernames, those with the most commits first
+        """
+        counts = {}  # contributor name -> number of commits
+        for (name, email), commits in self.matched_authors(git_start_date, git_end_date).items():
+            counts[name] = counts.get(name, 0) + len(commits)
+        # like git shortlog -n, ties are sorted by name
+        return sorted(counts, key=lambda author: (-counts[author], author.encode("utf-8")))
+
+    @staticmethod
+    def matching_authors(commits, pattern):
+        """
+        Filter commits by author, just as git's --author filter does.
+        @param commits: an iterable of Commit tuples
+        @param pattern: the compiled pattern of the username, from author_pattern()
+        @returns: a list of the commits whose "<author name> <<author email>>" the pattern matches, in the same order
+        """
+        matches = {}  # author -> whether the pattern matches, so each distinct author is only searched once
+        matching = []
+        for commit in commits:
+            author = (commit.author, commit.email)
+            if author not in matches:
+                matches[author] = pattern.search(f"{commit.author} <{commit.email}>") is not None
+            if matches[author]:
+                matching.append(commit)
+        return matching
+
+    def recount(self, sha):
+        """
+        Count the files changed, lines inserted and lines deleted by a single commit, with git applying the exclusions.
+        @param sha: the hash of the commit
+        @returns: a tuple of the number of files changed, insertions and deletions
+        """
+        cmd = ["git", "show", "--shortstat", "--format=commit %H", sha] + self.pathspecs()
+        for commit in iter_commits(self.git_lines(cmd)):
+            return commit.files, commit.insertions, commit.deletions
+        return 0, 0, 0
+
+    def stored_commits(self, git_start_date, git_end_date):
+        """
+        Bring the commit store up to date with any new commits, then yield those in the date range, by the selected user if any.
+        Commits are filtered by their commit date and by the username pattern just as git's --after, --before and --author filters do.
+        @param git_start_date: the date after which commits are included, as a datetime
+        @param git_end_date: the date before which commits are included, as a datetime
+        @returns: a generator of Commit tuples
+        """
+        self.load_store()
+        return self.store.commits.select(*self.store_filters(git_start_date, git_end_date))
+
+    def store_filters(self, git_start_date, git_end_date, commits=None):
+        """
+        Work out which of the commits in the commit store are in the date range, by the selected user if any.
+        @param git_start_date: the date after which commits are included, as a datetime
+        @param git_end_date: the date before which commits are included, as a datetime
+        @param commits: the CommitColumns to filter, if not those of the commit store
+        @returns: a tuple of the earliest and latest commit timestamps to include, and the set of the store's authors to include, or None for all of them
+        """
+        if commits is None:
+            commits = self.store.commits
+        authors = None
+        if self.username and self.aliases is not None:
+            username = self.identity(self.username, None)
+            authors = commits.matching_authors(
+                lambda name, email: self.identity(name, email) == username
+            )
+        elif self.username:
+            # only each distinct author, rather than each commit, need be matched against the username
+            pattern = author_pattern(self.username)
+            authors = commits.matching_authors(
+                lambda name, email: pattern.search(f"{name} <{email}>") is not None
+            )
+        return git_start_date.timestamp(), git_end_date.timestamp(), authors
+
+    def load_store(self):
+        """
+        Load the commit store, bringing it up to date with any new commits first, unless told not to.
+        """
+        if self.refresh_store:
+            self.update_store()
+        else:
+            self.store.load()
+
+    def update_store(self):
+        """
+        Read the stats of the commits made since the commit store was last brought up to date, and add them to it.
+        The whole history is read again if the store was built with different exclusions, or history has been rewritten since.
+        """
+        # the server and runs of the command line with -i may share the store, so only one brings it up to date at once
+        with self.store.locked():
+            self.store.load()
+            head = self.get_head()
+            if self.store.head == head and self.store.exclusions == self.exclusions:
+                return  # nothing new
+            rev_range = head
+            if self.store.head is not None and self.store.exclusions == self.exclusions:
+                try:
+                    # the last commit seen must still be in the history for only newer commits to be needed
+                    list(
+                        self.git_lines(
+                            ["git", "merge-base", "--is-ancestor", self.store.head, head]
+                        )
+                    )
+                    rev_range = f"{self.store.head}..{head}"
+                except subprocess.CalledProcessError:
+                    pass
+            if rev_range == head:
+                self.store.clear()
+            cmd = self.log_command(rev_range)
+            self.verboseprint(f"Running command: {' '.join(cmd)}")
+            self.store.append(iter_commits(self.git_lines(cmd)), head, self.exclusions)
+
+    def log_command(self, *args):
+        """
+        Build the git log command that walks the logs in a single pass.
+        @param args: extra arguments to git log, e.g. a revision range or date filters
+        @returns: the command, as a list of arguments, ending with the pathspecs of the files to include
+        """
+        return (
+            ["git", "log", "--shortstat", f"--format={SINGLE_PASS_FORMAT}"]
+            + list(args)
+            + self.pathspecs()
+        )
+
+    def pathspecs(self):
+        """
+        Build the git pathspecs that limit the logs to the files of interest.
+        @returns: a list of arguments, starting with the "--" separator, that include everything but the excluded files
+        """
+        return ["--", "."] + [f":(exclude,glob)**/{x}" for x in self.exclusions]
+
+    def sum_commits(self, commits, contributors):
+        """
+        Sum up the stats of each commit's author, or of the username of interest when there is one.
+        @param commits: an iterable of Commit tuples
+        @param contributors: the names of contributors to report even if they have no commits
+        @returns: a list of stats entries, one per contributor
+        """
+        return self.sum_totals(CommitColumns(commits).totals_by_author(), contributors)
+
+    def sum_totals(self, totals, contributors):
+        """
+        Turn the stats summed up by author into stats entries, attributing them to the username of interest when there is one.
+        @param totals: a dictionary of (commits, files, insertions, deletions) tuples by (author name, author email), e.g. from CommitColumns.totals_by_author()
+        @param contributors: the names of contributors to report even if they have no commits
+        @returns: a list of stats entries, one per contributor
+        """
+        # set up an entry for each contributor of interest
+        stats = {}  # contributor name -> stats entry
+        if self.username:
+            stats[self.username] = self.new_entry(self.username)
+        for contributor in contributors:
+            stats[contributor] = self.new_entry(contributor)
+
+        for (name, email), counts in totals.items():
+            # attribute each author's commits to them, or to the username of interest
+            author = self.username or self.identity(name, email)
+            if author not in stats:
+                stats[author] = self.new_entry(author)
+            self.add_totals(stats[author], counts)
+        return list(stats.values())
+
+    @staticmethod
+    def add_totals(entry, totals):
+        """
+        Add summed up stats to a stats entry.
+        @param entry: the stats entry, which is changed in place
+        @param totals: a tuple of the number of commits, files changed, insertions and deletions
+        """
+        commits, files, insertions, deletions = totals
+        entry["commits"] += commits
+        entry["files"] += files
+        entry["insertions"] += insertions
+        entry["deletions"] += deletions
+
+    def get_head(self):
+        """
+        Return the hash of the commit currently checked out in this repository.
+        @returns: the full commit hash of HEAD
+        """
+        head = self.from_backend(lambda backend: backend.head())
+        if head is not None:
+            return head
+        cmd = ["git", "rev-parse", "HEAD"]
+        return "".join(self.git_lines(cmd)).strip()
+
+    def cache_key(self):
+        """
+        Build the key under which this parser's results are cached.
+        @returns: a key that changes whenever the repository's HEAD commit or any setting that affects the results changes
+        """
+        fields = dict(
+            repository=os.path.abspath(self.repository) if self.repository else None,
+            head=self.get_head(),
+            branch=self.branch,
+            start=self.start,
+            end=self.end,
+            username=self.username,
+            exclusions=sorted(self.exclusions),
+            clean=self.clean,
+            single_pass=self.single_pass,
+        )
+        if self.branches:
+            fields["branches"] = self.branch_tips()  # the results change whenever any branch does
+        if self.bucket:
+            fields["bucket"] = self.bucket
+        if self.aliases is not None:
+            fields["aliases"] = self.aliases.to_dict()
+        if self.match_exclusions != "git":
+            fields["match_exclusions"] = self.match_exclusions
+        if self.store is not None:
+            fields["store"] = True  # commits in the store are credited to their exact author, not matched with git's --author
+        if self.requested_backend != "git":
+            fields["backend"] = self.requested_backend  # so the results of either backend are never served in place of the other's
+        return ResultCache.key(**fields)
+
+    def from_backend(self, read):
+        """
+        Read something with the in-process backend, if there is one.  If it fails, git is run from then on.
+        @param read: a function that is passed the backend, and returns what it read
+        @returns: what was read, or None if git must be run to read it instead
+        """
+        if self.backend is None:
+            return None
+        try:
+            return read(self.backend)
+        except (ObjectStoreError, OSError) as e:
+            self.verboseprint(f"Reading {self.repository} with git instead: {e}")
+            self.backend = None
+            return None
+
+    def phase(self, name):
+        """
+        Measure a phase of parsing with the profiler, if there is one.
+        @param name: the name of the phase, one of PHASES
+        @returns: a context manager that measures the code run within it
+        """
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.phase(self.repo_name_from_url(self.repository), name)
+
+    def profiled(self, name, make):
+        """
+        Measure the time taken to make an iterable, and to get each of its items, as a phase of parsing, if there is a profiler.
+        @param name: the name of the phase, one of PHASES
+        @param make: a function, without arguments, that returns the iterable
+        @returns: an iterable of the same items
+        """
+        if self.profiler is None:
+            return make()
+        return self.profiler.iterate(self.repo_name_from_url(self.repository), name, make)
+
+    def git_lines(self, cmd):
+        """
+        Run a git command in the repository directory, yielding its output one line at a time as git produces it.
+        The process's working directory is left alone, so several parsers can run side by side.
+        @param cmd: the command to run, as a list of arguments
+        @returns: a generator of the lines of output
+        """
+        # when profiling, git's output is read as bytes, so they can be counted, then decoded just as subprocess would
+        profiling = self.profiler is not None
+        text = {"universal_newlines": True, "encoding": "utf-8", "errors": "replace"}
+        # git's errors and warnings go to a file, not a pipe that is only read once stdout ends, which git could fill and block on
+        with tempfile.TemporaryFile() as errors, subprocess.Popen(
+            cmd,
+            cwd=self.repository,
+            env=self.git_environment(),
+            stdout=subprocess.PIPE,
+            stderr=errors,
+            **({} if profiling else text),
+        ) as p:
+            lines = p.stdout
+            if profiling:
+                name = self.repo_name_from_url(self.repository)
+                self.profiler.count(name, subprocesses=1)
+                lines = io.TextIOWrapper(
+                    self.profiler.reader(p.stdout, name), encoding="utf-8", errors="replace"
+                )
+            finished = False
+            try:
+                yield from lines
+                finished = True
+            finally:
+                if not finished:
+                    p.kill()  # the caller stopped reading early
+            if p.wait() != 0:
+                errors.seek(0)
+                stderr = errors.read().decode("utf-8", errors="replace")
+                raise subprocess.CalledProcessError(p.returncode, cmd, stderr=stderr)
+
+    def new_entry(self, contributor, branch=None):
+        """
+        Set up a blank stats entry for a contributor to this repository.
+        @param contributor: the git username of the contributor
+        @param branch: the branch the stats are of, if parsing several branches.  defaults to None.
+        @returns: a dictionary with zero counts for the contributor
+        """
+        entry = {
+            "username": contributor,  # redundant, but useful
+            "repository": self.repo_name_from_url(self.repository),
+        }
+        if branch is not None:
+            entry["branch"] = branch
+        entry.update(
+            {
                 "start_date": self.start,
                 "end_date": self.end,
-                # 'merges': len(re.findall('Merge', logs)), # number of times we find a merge message... git logs do not reliably show these
-                "commits": len(
-                    re.findall("commit [a-z0-9]+\n", logs)
-                ),  # number of times we find a commit message
+                "commits": 0,
                 "insertions": 0,
                 "deletions": 0,
                 "files": 0,
             }
-            # find all number of files changed, lines inserted, lines deleted:
-            pattern = re.compile(
-                r"commit ([a-zA-Z0-9]+).*\nAuthor:\s(.*)\s<((.*))>.*\nDate:\s(.*)\n\n(.*)\n\n(.*?(\d+) file[s]? changed)?(.*?(\d+) insertion[s]?)?(.*?(\d+) deletion[s]?)?"
-            )
-            for match in re.finditer(pattern, logs):
-                # print(str(match.groups()))
-                entry["files"] += int(match.group(8)) if match.group(8) else 0
-                entry["insertions"] += int(match.group(10)) if match.group(10) else 0
-                entry["deletions"] += int(match.group(12)) if match.group(12) else 0
-            # add this user's stats to the list
-            # removing merges since they are not reliably mentioned in the stats
-            # if(self.clean and (entry['merges'] == 0 and entry['commits'] == 0 and entry['insertions'] == 0 and entry['deletions'] == 0 and entry['files'] == 0)):
-            if self.clean and (
-                entry["commits"] == 0
-                and entry["insertions"] == 0
-                and entry["deletions"] == 0
-                and entry["files"] == 0
-            ):
-                pass
-            else:
-                stats.append(entry)
-            # self.verboseprint('Entry: ', entry) # only printed when in verbose mode
-        return stats
+        )
+        return entry
 
     def format_results(self, results, output_format):
         """
         Format the parsed data in the selected format.
         @param results: A list of dictionaries, with each representing a contributor to the repository.
-        @param output_format: The desired output format, e.g. 'csv', 'json', or 'markdown'
+        @param output_format: The desired output format, e.g. 'csv', 'json', 'ndjson' or 'markdown'
         """
         self.verboseprint(f"Outputting results in {output_format.upper()} format:...")
-        output = ""
-        # output in the selected format
-        if output_format == "csv":
-            if len(results) > 0:
-                fieldnames = results[
-                    0
-                ].keys()  # get the field names from the first dictionary in the list
-                output += ",".join(list(fieldnames)) + "\n"
-            for entry in results:
-                str_values = [str(val) for val in list(entry.values())]
-                output += ",".join(str_values) + "\n"
-
-        elif output_format == "json":
-            output = json.dumps(results)
-
-        elif output_format == "markdown":
-            if len(results) > 0:
-                fieldnames = results[
-                    0
-                ].keys()  # get the field names from the first dictionary in the list
-                output += "| " + " | ".join(list(fieldnames)) + " |\n"  # headings
-                output += (
-                    "| " + " | ".join([":----" for key in results[0].keys()]) + " |\n"
-                )  # heading separator lines
-            for entry in results:
-                # each row of values
-                str_values = [str(val) for val in list(entry.values())]
-                output += "| " + " | ".join(str_values) + " |\n"
-
-        return output
+        # join the pieces once, rather than growing one string row by row
+        return "".join(iter_formatted(results, output_format))
 
     def get_repository_urls(self):
         """
@@ -208,6 +1062,17 @@ class GitLogsParser:
             v = lambda *args: None
         v(*args)
 
+    @staticmethod
+    def git_environment():
+        """
+        Returns the environment to run git in, so that the working directory git is given alone decides which repository it reads.
+        @returns: a copy of this process's environment variables, without any that point git at a particular repository
+        """
+        env = dict(os.environ)
+        for var in REPOSITORY_ENV_VARS:
+            env.pop(var, None)
+        return env
+
     @staticmethod
     def repo_name_from_url(repo_url):
         """
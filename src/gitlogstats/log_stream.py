@@ -0,0 +1,271 @@
+"""
+Streaming readers for the output of git log --shortstat, and of git log --numstat -z.
+"""
+
+import re
+from collections import namedtuple
+
+# the stats of a single commit, as read from the git logs.  the timestamp is the commit date, in seconds since the epoch, when known
+Commit = namedtuple(
+    "Commit",
+    ["sha", "author", "email", "files", "insertions", "deletions", "timestamp"],
+    defaults=[None],
+)
+
+# the changes a commit made to each file, as read from the git logs: a list of (path, insertions, deletions) tuples, with no lines counted for binary files
+CommitFiles = namedtuple("CommitFiles", ["sha", "author", "email", "timestamp", "changes"])
+
+# a commit as read from the output of git log -m --numstat -z: its stats, with the excluded files left out, its tree and parents' hashes, and whether each diff of it git logged changed an included file
+WalkedCommit = namedtuple("WalkedCommit", ["commit", "tree", "parents", "diffs"])
+
+# the summary line git prints for each commit with --shortstat, e.g. " 3 files changed, 45 insertions(+), 12 deletions(-)"
+SHORTSTAT_PATTERN = re.compile(
+    r" (\d+) files? changed(?:, (\d+) insertions?\(\+\))?(?:, (\d+) deletions?\(-\))?"
+)
+
+# the author line of git's default log format, e.g. "Author: alice <alice@example.com>"
+AUTHOR_PATTERN = re.compile(r"Author:\s+(.*?)\s*<(.*)>")
+
+# the characters that are special in python's regular expressions, but only special in git's basic ones when escaped
+BASIC_REGEX_CHARACTERS = "+?(){}|"
+
+
+def author_pattern(username):
+    """
+    Compile a username into a pattern that matches a commit's "<author name> <<author email>>" the way git's --author filter does.
+    git reads the username as a basic regular expression, in which + ? ( ) { } and | only have their special meanings when escaped with a backslash.
+    @param username: the username, e.g. "alice" or "Bob (Work)"
+    @returns: a compiled regular expression, to search the author with
+    """
+    regex = []
+    i = 0
+    while i < len(username):
+        c = username[i]
+        if c == "\\" and i + 1 < len(username):
+            following = username[i + 1]
+            regex.append(following if following in BASIC_REGEX_CHARACTERS else c + following)
+            i += 2
+            continue
+        regex.append("\\" + c if c in BASIC_REGEX_CHARACTERS else c)
+        i += 1
+    try:
+        return re.compile("".join(regex))
+    except re.error:
+        return re.compile(re.escape(username))
+
+
+def iter_commits(lines):
+    """
+    Read the commits out of git log --shortstat output one line at a time, so the full output never has to be held in memory.
+    Understands both git's default log format and the single-pass header format, "commit <hash>\t<commit timestamp>\t<author email>\t<author name>".
+    @param lines: an iterable of lines of git log output, e.g. the stdout of a git subprocess
+    @returns: a generator of Commit tuples, in the order git logged them
+    """
+    commit = None  # the fields of the commit currently being read, in Commit order
+    for line in lines:
+        if line.startswith("commit "):
+            # the start of the next commit... the previous one is complete
+            if commit is not None:
+                yield Commit(*commit)
+            fields = line[7:].rstrip("\r\n").split("\t", 3)
+            sha = fields[0].split(" ")[0]  # drop any ref decorations
+            commit = [sha, None, None, 0, 0, 0, None]
+            if len(fields) == 4:
+                commit[6], commit[2], commit[1] = int(fields[1]), fields[2], fields[3]
+        elif commit is None:
+            continue  # nothing of interest before the first commit
+        elif line.startswith("Author:"):
+            match = AUTHOR_PATTERN.match(line)
+            if match:
+                commit[1], commit[2] = match.group(1), match.group(2)
+        else:
+            # message lines are indented by four spaces, so cannot be mistaken for the stats
+            match = SHORTSTAT_PATTERN.match(line)
+            if match:
+                commit[3] += int(match.group(1))
+                commit[4] += int(match.group(2) or 0)
+                commit[5] += int(match.group(3) or 0)
+    if commit is not None:
+        yield Commit(*commit)
+
+
+def iter_records(lines):
+    """
+    Split output in which records end with a NUL, e.g. that of git log -z, into records, reading it one line at a time.
+    @param lines: an iterable of lines of output
+    @returns: a generator of records, without their NULs
+    """
+    pending = ""
+    for line in lines:
+        records = (pending + line).split("\0")
+        pending = records.pop()  # the start of a record whose end has not been read yet
+        yield from records
+    if pending:
+        yield pending
+
+
+def iter_numstat_commits(records, excluded, recount=None):
+    """
+    Read every commit out of the output of git log -m --numstat -z, with headers of the form "commit <hash>\t<commit timestamp>\t<tree hash>\t<parent hashes>\t<author email>\t<author name>", leaving out the files that are excluded.
+    git logs a merge once for its diff against each of its parents in turn, leaving out the diffs against any parents it is identical to.  Merges are given no stats, as git log shows none for them.
+    Which of the commits git would have shown, had it been given the exclusions as pathspecs, is worked out from them by simplify_history().
+    @param records: an iterable of the NUL-separated records of the output, e.g. from iter_records()
+    @param excluded: a function that tells whether a path is excluded, e.g. an ExclusionMatcher
+    @param recount: a function that counts the (files, insertions, deletions) of a commit, given its hash, with the exclusions applied by git.  it is needed for commits that git paired an excluded and an included file in as a rename, since git would not have paired them with the excluded file left out.  if None, such renames are counted as changes to the included file.
+    @returns: a generator of WalkedCommit tuples, in the order git logged them
+    """
+    walked = None  # the commit currently being read, as a WalkedCommit whose commit is a list of fields in Commit order
+    mixed = False  # whether an excluded file was paired with an included one as a rename
+    rename = None  # the stats of a rename whose paths are still to be read
+    old = None  # the old path of that rename, once read
+
+    def finish():
+        commit, diffs = walked.commit, walked.diffs
+        if len(walked.parents) > 1:
+            commit[3:6] = [0, 0, 0]  # merges show no stats
+            # a merge identical to every parent is still logged once, without any diff
+            diffs = [diff for diff in diffs if diff is not None]
+        else:
+            if mixed and recount is not None:
+                commit[3], commit[4], commit[5] = recount(commit[0])
+                diffs[0] = commit[3] > 0
+            diffs = [bool(diffs[0])]
+        return walked._replace(commit=Commit(*commit), diffs=diffs)
+
+    def changed(included):
+        # the diff being read changed some file, and maybe an included one
+        if included:
+            walked.diffs[-1] = True
+        elif walked.diffs[-1] is None:
+            walked.diffs[-1] = False
+
+    for record in records:
+        record = record.lstrip("\n")
+        if rename is not None:
+            if old is None:
+                old = record  # the new path is next
+                continue
+            (insertions, deletions), old_excluded, new_excluded = rename, excluded(old), excluded(record)
+            rename = old = None
+            if old_excluded != new_excluded:
+                mixed = True
+            elif old_excluded:
+                changed(False)
+                continue
+            count(walked.commit, insertions, deletions)
+            changed(True)
+        elif record.startswith("commit "):
+            sha, timestamp, tree, parents, email, author = record[7:].split("\t", 5)
+            if walked is not None and sha == walked.commit[0]:
+                walked.diffs.append(None)  # a merge, logged again with its diff against its next parent
+                continue
+            if walked is not None:
+                yield finish()
+            # whether each diff changed an included file, or None while it has changed nothing
+            walked = WalkedCommit([sha, author, email, 0, 0, 0, int(timestamp)], tree, parents.split(), [None])
+            mixed = False
+        elif walked is not None and record:
+            insertions, deletions, path = record.split("\t", 2)
+            if not path:
+                rename = (insertions, deletions)  # a rename, whose old and new paths follow
+            elif excluded(path):
+                changed(False)
+            else:
+                count(walked.commit, insertions, deletions)
+                changed(True)
+    if walked is not None:
+        yield finish()
+
+
+def simplify_history(walked, before=None):
+    """
+    Pick out the commits git log would show, had it been given the exclusions as pathspecs, from a walk of the whole history, e.g. that of git log -m, which does not simplify it.
+    Just as git simplifies history by default, commits that changed no included file are left out, and only the first parent of a merge that it is the same as in every included file is followed, so the merge and the histories of its other parents are left out.
+    @param walked: an iterable of WalkedCommit tuples, newest first, starting with the commit the walk started from, e.g. from iter_numstat_commits().  the walk goes no further back than the commits it lists.
+    @param before: the latest commit timestamp to show, or None for no limit.  commits made after it are still followed, since their merges can leave out the histories of the commits before it.
+    @returns: a list of Commit tuples, in the order they were walked
+    """
+    walked = list(walked)
+    commits = {w.commit.sha: w for w in walked}
+    shown = set()
+    pending = [walked[0].commit.sha] if walked else []
+    reached = set(pending)
+    while pending:
+        w = commits[pending.pop()]
+        parents, treesame = followed_parents(w, commits)
+        if not treesame and (before is None or w.commit.timestamp <= before):
+            shown.add(w.commit.sha)
+        for parent in parents:
+            if parent in commits and parent not in reached:
+                reached.add(parent)
+                pending.append(parent)
+    return [w.commit for w in walked if w.commit.sha in shown]
+
+
+def followed_parents(walked, commits):
+    """
+    Work out which parents of a commit git follows when simplifying history, and whether the commit changed any included file.
+    @param walked: the WalkedCommit
+    @param commits: a dictionary of every WalkedCommit of the walk, by hash
+    @returns: a tuple of the list of parents to follow, and whether the commit is the same as the first of them in every included file
+    """
+    parents = walked.parents
+    if len(parents) < 2:
+        return parents, not walked.diffs[0]
+    # git logs no diff against the parents the merge is identical to, so the diffs logged are against the others, in order
+    identical = [parent in commits and commits[parent].tree == walked.tree for parent in parents]
+    missing = len(parents) - len(walked.diffs) - sum(identical)
+    for i, parent in enumerate(parents):
+        # parents that were not walked, since made before the start date, are only known to be identical by elimination
+        if missing > 0 and parent not in commits:
+            identical[i] = True
+            missing -= 1
+    diffs = iter(walked.diffs)
+    for parent, same in zip(parents, identical):
+        if same or not next(diffs, True):
+            return [parent], True
+    return parents, False
+
+
+def iter_commit_files(records):
+    """
+    Read the changes each commit made to each file out of the output of git log --numstat -z, with the single-pass header format, "commit <hash>\t<commit timestamp>\t<author email>\t<author name>".
+    Renamed files are attributed to their new paths.  Merges, which git shows no stats for without -m, are left out.
+    @param records: an iterable of the NUL-separated records of the output, e.g. from iter_records()
+    @returns: a generator of CommitFiles tuples, in the order git logged them
+    """
+    commit = None  # the commit currently being read
+    rename = None  # the stats of a rename whose paths are still to be read
+    old = None  # the old path of that rename, once read
+    for record in records:
+        record = record.lstrip("\n")
+        if rename is not None:
+            if old is None:
+                old = record  # the new path is next
+                continue
+            commit.changes.append((record,) + rename)
+            rename = old = None
+        elif record.startswith("commit "):
+            if commit is not None and commit.changes:
+                yield commit
+            sha, timestamp, email, author = record[7:].split("\t", 3)
+            commit = CommitFiles(sha, author, email, int(timestamp), [])
+        elif commit is not None and record:
+            insertions, deletions, path = record.split("\t", 2)
+            lines = (0, 0) if insertions == "-" else (int(insertions), int(deletions))
+            if not path:
+                rename = lines  # a rename, whose old and new paths follow
+            else:
+                commit.changes.append((path,) + lines)
+    if commit is not None and commit.changes:
+        yield commit
+
+
+def count(commit, insertions, deletions):
+    """
+    Add a file changed to the stats of a commit being read.  binary files are changed without any lines being counted.
+    """
+    commit[3] += 1
+    if insertions != "-":
+        commit[4] += int(insertions)
+        commit[5] += int(deletions)
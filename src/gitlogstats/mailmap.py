@@ -0,0 +1,94 @@
+"""
+A reader of git's .mailmap files, which map the names and email addresses authors have committed under to their proper ones.
+"""
+
+
+class Mailmap:
+    def __init__(self):
+        """
+        Initialize an empty mailmap, which maps nobody.
+        """
+        # lowercased email -> [proper name, proper email, {lowercased name -> (proper name, proper email)}]
+        self.entries = {}
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Build a mailmap from the contents of a .mailmap file.
+        @param text: the contents of the file
+        @returns: a Mailmap
+        """
+        mailmap = cls()
+        for line in text.splitlines():
+            mailmap.add_line(line)
+        return mailmap
+
+    def add_line(self, line):
+        """
+        Add the mapping on one line of a .mailmap file, in any of the forms git accepts, e.g. "Proper Name <proper@email> Commit Name <commit@email>".
+        @param line: the line
+        """
+        if line.startswith("#"):
+            return
+        name1, email1, rest = parse_name_and_email(line)
+        if not email1:
+            return  # only the second email may be empty
+        name2, email2, _ = parse_name_and_email(rest)
+        self.add(name1, email1, name2, email2)
+
+    def add(self, proper_name, proper_email, commit_name, commit_email):
+        """
+        Add a mapping, just like git's add_mapping().
+        @param proper_name: the name to map to, or None to keep the name
+        @param proper_email: the email to map to, or None to keep the email
+        @param commit_name: the name to map from, or None for any name
+        @param commit_email: the email to map from.  if None, the proper email is the one to map from, and the email is kept.
+        """
+        if commit_email is None:
+            commit_email, proper_email = proper_email, None
+        entry = self.entries.setdefault(commit_email.lower(), [None, None, {}])
+        if commit_name is None:
+            if proper_name:
+                entry[0] = proper_name
+            if proper_email:
+                entry[1] = proper_email
+        else:
+            entry[2][commit_name.lower()] = (proper_name, proper_email)
+
+    def map(self, name, email):
+        """
+        Map an author to their proper name and email address.
+        @param name: the name the author committed under
+        @param email: the email address the author committed under
+        @returns: a tuple of the proper name and email address, which are the same as those given if nothing maps them
+        """
+        entry = self.entries.get(email.lower())
+        if entry is None:
+            return name, email
+        proper_name, proper_email = entry[0], entry[1]
+        if entry[2]:
+            # the entry maps particular names, and otherwise falls back to mapping the email alone
+            mapped = entry[2].get(name.lower())
+            if mapped is not None:
+                proper_name, proper_email = mapped
+        return proper_name or name, proper_email or email
+
+    def __bool__(self):
+        return bool(self.entries)
+
+
+def parse_name_and_email(text):
+    """
+    Read a name followed by an email address in angle brackets, either of which may be missing.
+    @param text: the text to read
+    @returns: a tuple of the name, the email address and the rest of the text.  the name and email are None if missing.
+    """
+    left = text.find("<")
+    if left < 0:
+        return None, None, ""
+    right = text.find(">", left + 1)
+    if right < 0:
+        return None, None, ""
+    name = text[:left].strip() or None
+    email = text[left + 1 : right]
+    return name, email, text[right + 1 :]
@@ -0,0 +1,460 @@
+"""
+A reader of a git repository's object database, i.e. its loose objects and packfiles, and of its refs, that needs no git process.
+"""
+
+import binascii
+import collections
+import glob
+import mmap
+import os
+import struct
+import zlib
+
+# the numeric object types used in packfiles
+PACK_TYPES = {1: b"commit", 2: b"tree", 3: b"blob", 4: b"tag"}
+OFS_DELTA = 6
+REF_DELTA = 7
+
+
+class ObjectStoreError(Exception):
+    """
+    The repository can not be read without git, e.g. because it uses a format this reader does not support.
+    """
+
+
+class MissingObject(ObjectStoreError):
+    """
+    An object is not in the repository, e.g. a blob a partial clone has not fetched yet.
+    """
+
+
+class ObjectStore:
+    def __init__(self, repo, cache_size=64 * 1024 * 1024):
+        """
+        Open the object database of a repository.
+        @param repo: the path to the repository, either its working tree or a bare repository
+        @param cache_size: the most bytes of packed objects to keep inflated, so long chains of deltas are not inflated over and over.  defaults to 64MB.
+        """
+        self.git_dir, self.common_dir = find_git_dir(repo)
+        check_config(os.path.join(self.common_dir, "config"))
+        objects_dir = os.path.join(self.common_dir, "objects")
+        self.object_dirs = [objects_dir] + alternates(objects_dir)
+        self.packs = []
+        for object_dir in self.object_dirs:
+            for idx_path in sorted(glob.glob(os.path.join(object_dir, "pack", "pack-*.idx"))):
+                self.packs.append(Pack(idx_path[: -len(".idx")], self))
+        self.cache = collections.OrderedDict()  # (pack, offset) -> (type, data), least recently used first
+        self.cache_bytes = 0
+        self.cache_size = cache_size
+        self.packed_refs = None  # loaded on first use
+
+    def read(self, sha):
+        """
+        Read an object.
+        @param sha: the object's hash, as 20 raw bytes
+        @returns: a tuple of the object's type, e.g. b"commit", and its contents
+        """
+        for pack in self.packs:
+            offset = pack.find(sha)
+            if offset is not None:
+                return pack.read_at(offset)
+        hex_sha = binascii.hexlify(sha).decode("ascii")
+        for object_dir in self.object_dirs:
+            path = os.path.join(object_dir, hex_sha[:2], hex_sha[2:])
+            try:
+                with open(path, "rb") as f:
+                    raw = zlib.decompress(f.read())
+            except FileNotFoundError:
+                continue
+            header, _, data = raw.partition(b"\0")
+            object_type, _, size = header.partition(b" ")
+            if int(size) != len(data):
+                raise ObjectStoreError(f"corrupt loose object {hex_sha}")
+            return object_type, data
+        raise MissingObject(f"object {hex_sha} is missing")
+
+    def read_typed(self, sha, expected_type):
+        """
+        Read an object that must be of a particular type.
+        @param sha: the object's hash, as 20 raw bytes
+        @param expected_type: the type the object must have, e.g. b"tree"
+        @returns: the object's contents
+        """
+        object_type, data = self.read(sha)
+        if object_type != expected_type:
+            raise ObjectStoreError(
+                f"{binascii.hexlify(sha).decode('ascii')} is a {object_type.decode()}, not a {expected_type.decode()}"
+            )
+        return data
+
+    def cached(self, key):
+        """
+        Look up an inflated packed object, marking it as recently used.
+        @param key: a tuple of the pack and the object's offset within it
+        @returns: the object's type and contents, or None if not cached
+        """
+        value = self.cache.get(key)
+        if value is not None:
+            self.cache.move_to_end(key)
+        return value
+
+    def remember(self, key, value):
+        """
+        Keep an inflated packed object, evicting the least recently used ones once the cache is full.
+        @param key: a tuple of the pack and the object's offset within it
+        @param value: the object's type and contents
+        """
+        self.cache[key] = value
+        self.cache_bytes += len(value[1])
+        while self.cache_bytes > self.cache_size and len(self.cache) > 1:
+            _, (_, data) = self.cache.popitem(last=False)
+            self.cache_bytes -= len(data)
+
+    def resolve(self, ref="HEAD"):
+        """
+        Work out the commit a ref points at, following symbolic refs such as HEAD.
+        @param ref: the name of the ref, e.g. "HEAD" or "refs/heads/main"
+        @returns: the commit's hash, as 20 raw bytes
+        """
+        for _ in range(10):  # git gives up on symbolic refs nested deeper than this, too
+            value = self.read_ref(ref)
+            if value is None:
+                raise ObjectStoreError(f"unknown ref {ref}")
+            if not value.startswith("ref: "):
+                return binascii.unhexlify(value)
+            ref = value[len("ref: ") :]
+        raise ObjectStoreError(f"symbolic ref {ref} nested too deeply")
+
+    def read_ref(self, ref):
+        """
+        Read the value of a single ref, without following it if it is symbolic.
+        @param ref: the name of the ref
+        @returns: a hash in hexadecimal, "ref: " followed by the name of another ref, or None if there is no such ref
+        """
+        # HEAD and other pseudo-refs belong to the worktree, everything under refs/ is shared by all worktrees
+        ref_dir = self.common_dir if ref.startswith("refs/") else self.git_dir
+        try:
+            with open(os.path.join(ref_dir, ref), "r", encoding="utf8") as f:
+                return f.read().strip()
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            pass
+        return self.read_packed_refs().get(ref)
+
+    def read_packed_refs(self):
+        """
+        Read the refs packed into a single file by git pack-refs.
+        @returns: a dictionary of ref names to hashes in hexadecimal
+        """
+        if self.packed_refs is None:
+            self.packed_refs = {}
+            try:
+                with open(os.path.join(self.common_dir, "packed-refs"), "r", encoding="utf8") as f:
+                    for line in f:
+                        if line.startswith(("#", "^")):
+                            continue  # the file's traits, or the commit a tag above peels to
+                        sha, _, name = line.strip().partition(" ")
+                        self.packed_refs[name] = sha
+            except FileNotFoundError:
+                pass
+        return self.packed_refs
+
+    def has_replacements(self):
+        """
+        Check whether git replace has swapped any objects for others, which this reader does not honor.
+        @returns: True if the repository has any replace refs
+        """
+        replace_dir = os.path.join(self.common_dir, "refs", "replace")
+        if os.path.isdir(replace_dir) and any(files for _, _, files in os.walk(replace_dir)):
+            return True
+        return any(name.startswith("refs/replace/") for name in self.read_packed_refs())
+
+    def shallow_commits(self):
+        """
+        Read the commits whose parents a shallow clone does not have.
+        @returns: a set of hashes, as 20 raw bytes
+        """
+        try:
+            with open(os.path.join(self.common_dir, "shallow"), "r", encoding="utf8") as f:
+                return {binascii.unhexlify(line.strip()) for line in f if line.strip()}
+        except FileNotFoundError:
+            return set()
+
+
+class Pack:
+    def __init__(self, base_path, store):
+        """
+        Open a packfile and its index, mapping both into memory.
+        @param base_path: the path to the pack, without the .idx or .pack extension
+        @param store: the ObjectStore the pack belongs to, in which the bases of REF_DELTA objects are looked up
+        """
+        self.store = store
+        with open(base_path + ".idx", "rb") as f:
+            self.idx = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        with open(base_path + ".pack", "rb") as f:
+            self.pack = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.pack[:4] != b"PACK" or struct.unpack_from(">I", self.pack, 4)[0] not in (2, 3):
+            raise ObjectStoreError(f"unsupported packfile {base_path}.pack")
+
+        if self.idx[:4] == b"\377tOc":
+            if struct.unpack_from(">I", self.idx, 4)[0] != 2:
+                raise ObjectStoreError(f"unsupported pack index {base_path}.idx")
+            self.version = 2
+            self.fanout = struct.unpack_from(">256I", self.idx, 8)
+            self.count = self.fanout[255]
+            self.names_offset = 8 + 256 * 4
+            self.name_size = 20  # the names are followed by their CRCs, then their offsets
+            self.offsets_offset = self.names_offset + self.count * (20 + 4)
+            self.large_offsets_offset = self.offsets_offset + self.count * 4
+        else:
+            # version 1 indexes have no header, and each name is preceded by its offset
+            self.version = 1
+            self.fanout = struct.unpack_from(">256I", self.idx, 0)
+            self.count = self.fanout[255]
+            self.names_offset = 256 * 4 + 4
+            self.name_size = 24
+
+    def name(self, i):
+        """
+        @returns: the hash of the i-th object in the index, as 20 raw bytes
+        """
+        start = self.names_offset + i * self.name_size
+        return self.idx[start : start + 20]
+
+    def find(self, sha):
+        """
+        Look up an object in the pack's index.
+        @param sha: the object's hash, as 20 raw bytes
+        @returns: the object's offset within the pack, or None if the pack does not hold it
+        """
+        first = sha[0]
+        lo = self.fanout[first - 1] if first > 0 else 0
+        hi = self.fanout[first]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            name = self.name(mid)
+            if name < sha:
+                lo = mid + 1
+            elif name > sha:
+                hi = mid
+            else:
+                return self.offset(mid)
+        return None
+
+    def offset(self, i):
+        """
+        @returns: the offset within the pack of the i-th object in the index
+        """
+        if self.version == 1:
+            return struct.unpack_from(">I", self.idx, self.names_offset + i * 24 - 4)[0]
+        offset = struct.unpack_from(">I", self.idx, self.offsets_offset + i * 4)[0]
+        if offset & 0x80000000:
+            # packs over 2GB keep their larger offsets in a separate table
+            large = self.large_offsets_offset + (offset & 0x7FFFFFFF) * 8
+            offset = struct.unpack_from(">Q", self.idx, large)[0]
+        return offset
+
+    def read_at(self, offset):
+        """
+        Read the object at an offset within the pack, applying any chain of deltas it is stored as.
+        @param offset: the offset of the object's header within the pack
+        @returns: a tuple of the object's type, e.g. b"commit", and its contents
+        """
+        deltas = []  # the deltas to apply, innermost first
+        while True:
+            cached = self.store.cached((self, offset))
+            if cached is not None:
+                object_type, data = cached
+                break
+            packed_type, size, pos = self.entry_header(offset)
+            if packed_type == OFS_DELTA:
+                base_offset, pos = self.delta_base_offset(pos)
+                deltas.append((offset, pos, size))
+                offset = offset - base_offset
+            elif packed_type == REF_DELTA:
+                base_sha = self.pack[pos : pos + 20]
+                deltas.append((offset, pos + 20, size))
+                object_type, data = self.store.read(base_sha)
+                break
+            elif packed_type in PACK_TYPES:
+                object_type, data = PACK_TYPES[packed_type], self.inflate(pos, size)
+                self.store.remember((self, offset), (object_type, data))
+                break
+            else:
+                raise ObjectStoreError(f"unknown packed object type {packed_type}")
+
+        # apply the deltas from the base outwards, keeping each result for other deltas of the same base
+        for delta_offset, pos, size in reversed(deltas):
+            data = apply_delta(data, self.inflate(pos, size))
+            self.store.remember((self, delta_offset), (object_type, data))
+        return object_type, data
+
+    def entry_header(self, offset):
+        """
+        Read the header of a packed object, i.e. its type and inflated size.
+        @param offset: the offset of the header within the pack
+        @returns: a tuple of the type, the size and the offset just past the header
+        """
+        byte = self.pack[offset]
+        packed_type = (byte >> 4) & 7
+        size = byte & 15
+        shift = 4
+        while byte & 0x80:
+            offset += 1
+            byte = self.pack[offset]
+            size |= (byte & 0x7F) << shift
+            shift += 7
+        return packed_type, size, offset + 1
+
+    def delta_base_offset(self, pos):
+        """
+        Read how far before an OFS_DELTA object its base is, in git's offset encoding.
+        @param pos: the offset just past the object's header
+        @returns: a tuple of the distance back to the base and the offset just past the encoded distance
+        """
+        byte = self.pack[pos]
+        distance = byte & 0x7F
+        while byte & 0x80:
+            pos += 1
+            byte = self.pack[pos]
+            distance = ((distance + 1) << 7) | (byte & 0x7F)
+        return distance, pos + 1
+
+    def inflate(self, pos, size):
+        """
+        Inflate zlib-compressed data that starts at an offset within the pack, reading only as much as is needed.
+        @param pos: the offset at which the compressed data starts
+        @param size: the size of the data once inflated
+        @returns: the inflated data
+        """
+        inflater = zlib.decompressobj()
+        pieces = []
+        chunk = size + 64  # well-compressed data ends well within this
+        while not inflater.eof:
+            if pos >= len(self.pack):
+                raise ObjectStoreError("truncated packfile")
+            pieces.append(inflater.decompress(self.pack[pos : pos + chunk]))
+            pos += chunk
+            chunk = 65536
+        data = b"".join(pieces)
+        if len(data) != size:
+            raise ObjectStoreError("corrupt packed object")
+        return data
+
+
+def apply_delta(base, delta):
+    """
+    Rebuild an object from its base and a delta, as stored in packfiles.
+    @param base: the contents of the base object
+    @param delta: the delta, i.e. the sizes of the base and result, followed by instructions to copy from the base or insert new data
+    @returns: the contents of the rebuilt object
+    """
+    pos = 0
+    sizes = []
+    for _ in range(2):
+        size = shift = 0
+        while True:
+            byte = delta[pos]
+            pos += 1
+            size |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                break
+        sizes.append(size)
+    base_size, result_size = sizes
+    if base_size != len(base):
+        raise ObjectStoreError("delta does not match its base")
+
+    result = bytearray()
+    end = len(delta)
+    while pos < end:
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            # copy a run of the base, whose offset and size are given by the bytes the low bits flag
+            copy_offset = copy_size = 0
+            for i in range(4):
+                if op & (1 << i):
+                    copy_offset |= delta[pos] << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if op & (0x10 << i):
+                    copy_size |= delta[pos] << (8 * i)
+                    pos += 1
+            if copy_size == 0:
+                copy_size = 0x10000
+            result += base[copy_offset : copy_offset + copy_size]
+        elif op:
+            # insert the next op bytes of the delta
+            result += delta[pos : pos + op]
+            pos += op
+        else:
+            raise ObjectStoreError("corrupt delta")
+    if len(result) != result_size:
+        raise ObjectStoreError("corrupt delta")
+    return bytes(result)
+
+
+def find_git_dir(repo):
+    """
+    Find the git directory of a repository, i.e. where its HEAD lives, and the common directory its objects and refs are kept in.
+    @param repo: the path to the repository's working tree, or to a bare repository
+    @returns: a tuple of the git directory and the common directory, which differ only for linked worktrees
+    """
+    git_dir = os.path.join(repo, ".git")
+    if os.path.isfile(git_dir):
+        # a linked worktree or submodule, whose .git file points at the real git directory
+        with open(git_dir, "r", encoding="utf8") as f:
+            line = f.read().strip()
+        if not line.startswith("gitdir: "):
+            raise ObjectStoreError(f"unrecognized .git file in {repo}")
+        git_dir = os.path.join(repo, line[len("gitdir: ") :])
+    elif not os.path.isdir(git_dir):
+        git_dir = repo  # a bare repository
+    if not os.path.isfile(os.path.join(git_dir, "HEAD")):
+        raise ObjectStoreError(f"{repo} is not a git repository")
+
+    common_dir = git_dir
+    try:
+        with open(os.path.join(git_dir, "commondir"), "r", encoding="utf8") as f:
+            common_dir = os.path.join(git_dir, f.read().strip())
+    except FileNotFoundError:
+        pass
+    return os.path.normpath(git_dir), os.path.normpath(common_dir)
+
+
+def check_config(path):
+    """
+    Make sure a repository does not use an extension this reader does not support, e.g. SHA-256 hashes, the reftable ref format or partial clones.
+    @param path: the path to the repository's config file
+    """
+    try:
+        with open(path, "r", encoding="utf8", errors="replace") as f:
+            lines = f.read().lower().splitlines()
+    except FileNotFoundError:
+        return
+    for line in lines:
+        key, _, value = line.partition("=")
+        key, value = key.strip(), value.strip()
+        if (key, value) in (("objectformat", "sha256"), ("refstorage", "reftable")):
+            raise ObjectStoreError(f"unsupported repository extension {key} = {value}")
+        if key == "partialclone":
+            # only git can fetch the objects a partial clone left out
+            raise ObjectStoreError("partial clones are not supported")
+
+
+def alternates(objects_dir):
+    """
+    Read the other object directories a repository borrows objects from, e.g. after git clone --shared.
+    @param objects_dir: the repository's own objects directory
+    @returns: a list of paths to the other object directories
+    """
+    try:
+        with open(os.path.join(objects_dir, "info", "alternates"), "r", encoding="utf8") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return []
+    return [
+        os.path.normpath(os.path.join(objects_dir, line))
+        for line in lines
+        if line and not line.startswith("#")
+    ]
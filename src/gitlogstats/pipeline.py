@@ -0,0 +1,41 @@
+"""
+A pipeline that fetches repositories concurrently, handing each to a parser as soon as it has been fetched.
+"""
+
+import asyncio
+import concurrent.futures
+
+
+def run_pipeline(repository_urls, fetch, parse, emit, connections=1, jobs=1):
+    """
+    Fetch and parse a list of repositories, overlapping the network waits of fetching with the work of parsing.
+    @param repository_urls: the URLs of the repositories to process
+    @param fetch: a coroutine function that brings a repository up to date, given its URL, and returns the path to its local copy
+    @param parse: a function that parses a repository, given its URL and local path, and returns the results.  it is run on a worker thread.
+    @param emit: a function that is called with the results of each repository, in the same order as the URLs, as soon as they and all earlier results are ready
+    @param connections: the most repositories to fetch at the same time.  defaults to 1.
+    @param jobs: the most repositories to parse at the same time.  defaults to 1.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        asyncio.run(
+            _pipeline(repository_urls, fetch, parse, emit, connections, executor)
+        )
+
+
+async def _pipeline(repository_urls, fetch, parse, emit, connections, executor):
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(connections)
+
+    async def process(repo_url):
+        async with limit:
+            repo_dir = await fetch(repo_url)
+        # the connection is free for the next fetch while this repository is parsed
+        return await loop.run_in_executor(executor, parse, repo_url, repo_dir)
+
+    tasks = [asyncio.ensure_future(process(repo_url)) for repo_url in repository_urls]
+    try:
+        for task in tasks:
+            emit(await task)
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,287 @@
+"""
+Instrumentation that measures where the time of a run goes, i.e. the wall and CPU time of each phase of processing each repository, how many git processes were run, how much output was read from them, and the peak memory used.
+"""
+
+import contextlib
+import io
+import os
+import sys
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# the phases of processing a repository, in the order they happen
+PHASES = ["fetch", "optimize", "cache", "contributors", "log", "git", "format"]
+
+# what each phase measures, as described in the summary
+PHASE_DESCRIPTIONS = {
+    "fetch": "cloning or pulling",
+    "optimize": "writing the commit-graph and multi-pack-index",
+    "cache": "looking up cached results",
+    "contributors": "listing contributors",
+    "log": "walking the logs and parsing git's output",
+    "git": "waiting for git's output",
+    "format": "formatting the results",
+}
+
+
+class Profiler:
+    def __init__(self, cprofile=False):
+        """
+        Start measuring a run.
+        Phases may be nested, e.g. waiting for git's output while walking the logs, in which case the time of the inner phase is not also counted as the outer's.
+        @param cprofile: whether to also collect cProfile statistics of the code run by cprofiled().  defaults to False.
+        """
+        self.lock = threading.Lock()
+        self.local = threading.local()  # each thread's stack of the phases it is in
+        self.repositories = {}  # repository name -> {phase -> stats}
+        self.started_wall = time.perf_counter()
+        self.started_times = os.times()
+        self.cprofile = cprofile
+        self.cprofile_stats = None  # the cProfile statistics collected so far, as a pstats.Stats
+        self.cprofile_lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, repository, name):
+        """
+        Measure the wall and CPU time of a phase of processing a repository, less that of any phase nested within it.
+        CPU time is that of the current thread, so phases running side by side on several threads are measured apart.
+        @param repository: the name of the repository
+        @param name: the name of the phase, one of PHASES
+        """
+        stack = self.stack()
+        # the repository, the phase, the wall and CPU time it started at, and the wall and CPU time of the phases nested within it
+        frame = [repository, name, time.perf_counter(), time.thread_time(), 0.0, 0.0]
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - frame[2]
+            cpu = time.thread_time() - frame[3]
+            # a generator may be closed long after the phases it was in... take out just its own frame
+            index = stack.index(frame)
+            del stack[index]
+            if index > 0:
+                stack[index - 1][4] += wall
+                stack[index - 1][5] += cpu
+            self.record(repository, name, wall - frame[4], cpu - frame[5])
+
+    def iterate(self, repository, name, make):
+        """
+        Measure the time taken to make an iterable and to get each of its items as a phase, but not the time the caller spends on each item.
+        @param repository: the name of the repository
+        @param name: the name of the phase, one of PHASES
+        @param make: a function, without arguments, that returns the iterable
+        @returns: a generator of the items of the iterable
+        """
+        with self.phase(repository, name):
+            iterator = iter(make())
+        while True:
+            with self.phase(repository, name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def record(self, repository, name, wall, cpu=0.0):
+        """
+        Add to the time measured for a phase of processing a repository.
+        @param repository: the name of the repository
+        @param name: the name of the phase, one of PHASES
+        @param wall: the wall time to add, in seconds
+        @param cpu: the CPU time to add, in seconds.  defaults to 0.
+        """
+        with self.lock:
+            stats = self.stats(repository, name)
+            stats["wall"] += wall
+            stats["cpu"] += cpu
+
+    def count(self, repository, name=None, subprocesses=0, bytes_read=0):
+        """
+        Count the git processes run, and the bytes of output read from them, in a phase of processing a repository.
+        @param repository: the name of the repository
+        @param name: the name of the phase.  defaults to the phase the current thread is in.
+        @param subprocesses: the number of processes to add
+        @param bytes_read: the number of bytes to add
+        """
+        if name is None:
+            name = self.current_phase()
+        with self.lock:
+            stats = self.stats(repository, name)
+            stats["subprocesses"] += subprocesses
+            stats["bytes_read"] += bytes_read
+
+    def reader(self, stream, repository):
+        """
+        Wrap the output pipe of a git process, so the bytes read from it are counted, and the time spent waiting on it is measured as the "git" phase.
+        @param stream: the binary output pipe of the process
+        @param repository: the name of the repository
+        @returns: a buffered binary stream of the same output
+        """
+        return io.BufferedReader(CountingReader(stream, self, repository, self.current_phase()))
+
+    @contextlib.contextmanager
+    def cprofiled(self):
+        """
+        Collect cProfile statistics of the code run within this context, if asked to when created.
+        Only one thread can be profiled at a time, so threads wait for one another's turn.
+        """
+        if not self.cprofile:
+            yield
+            return
+        import cProfile
+        import pstats
+
+        with self.cprofile_lock:
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+                if self.cprofile_stats is None:
+                    self.cprofile_stats = pstats.Stats(profile)
+                else:
+                    self.cprofile_stats.add(profile)
+
+    def dump_cprofile(self, path):
+        """
+        Write the cProfile statistics collected, which can be read with python -m pstats.
+        @param path: the path to the file to write
+        """
+        if self.cprofile_stats is not None:
+            self.cprofile_stats.dump_stats(path)
+
+    def stack(self):
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def current_phase(self):
+        stack = self.stack()
+        return stack[-1][1] if stack else "other"
+
+    def stats(self, repository, name):
+        phases = self.repositories.setdefault(repository, {})
+        if name not in phases:
+            phases[name] = {"wall": 0.0, "cpu": 0.0, "subprocesses": 0, "bytes_read": 0}
+        return phases[name]
+
+    def to_dict(self):
+        """
+        Summarize the measurements in a form that can be written as JSON.
+        @returns: a dictionary of the totals of the run, of each phase, and of each phase of each repository
+        """
+        times = os.times()
+        with self.lock:
+            repositories = {
+                repository: {name: dict(stats) for name, stats in phases.items()}
+                for repository, phases in self.repositories.items()
+            }
+        phases = {}
+        for repository_phases in repositories.values():
+            for name, stats in repository_phases.items():
+                totals = phases.setdefault(name, dict.fromkeys(stats, 0))
+                for key, value in stats.items():
+                    totals[key] += value
+        return {
+            "wall": time.perf_counter() - self.started_wall,
+            "cpu": (times.user + times.system)
+            - (self.started_times.user + self.started_times.system),
+            "git_cpu": (times.children_user + times.children_system)
+            - (self.started_times.children_user + self.started_times.children_system),
+            "peak_rss": peak_rss(),
+            "git_peak_rss": peak_rss(children=True),
+            "phases": dict(sorted(phases.items(), key=phase_order)),
+            "repositories": {
+                repository: dict(sorted(repository_phases.items(), key=phase_order))
+                for repository, repository_phases in repositories.items()
+            },
+        }
+
+    def summary(self):
+        """
+        Describe the measurements as a table, for people to read.
+        @returns: the table, as a string
+        """
+        report = self.to_dict()
+        lines = [
+            f"{'phase':<14}{'wall s':>10}{'cpu s':>10}{'git runs':>10}{'bytes read':>14}",
+        ]
+
+        def row(label, stats, note=""):
+            lines.append(
+                f"{label:<14}{stats['wall']:>10.3f}{stats['cpu']:>10.3f}{stats['subprocesses']:>10}{stats['bytes_read']:>14}  {note}".rstrip()
+            )
+
+        for name, stats in report["phases"].items():
+            row(name, stats, PHASE_DESCRIPTIONS.get(name, ""))
+        lines.append("")
+        lines.append(f"{'repository':<30}{'wall s':>10}{'cpu s':>10}{'git runs':>10}{'bytes read':>14}")
+        for repository, phases in report["repositories"].items():
+            totals = {key: sum(stats[key] for stats in phases.values()) for key in ["wall", "cpu", "subprocesses", "bytes_read"]}
+            lines.append(
+                f"{repository[:29]:<30}{totals['wall']:>10.3f}{totals['cpu']:>10.3f}{totals['subprocesses']:>10}{totals['bytes_read']:>14}"
+            )
+        lines.append("")
+        lines.append(
+            f"total: {report['wall']:.3f}s wall, {report['cpu']:.3f}s cpu, {report['git_cpu']:.3f}s cpu in git"
+        )
+        if report["peak_rss"] is not None:
+            lines.append(
+                f"peak memory: {report['peak_rss'] / 2 ** 20:.1f} MB, {report['git_peak_rss'] / 2 ** 20:.1f} MB in git"
+            )
+        return "\n".join(lines) + "\n"
+
+
+class CountingReader(io.RawIOBase):
+    def __init__(self, stream, profiler, repository, phase):
+        """
+        A raw stream that reads from a pipe, counting the bytes read and measuring the time spent waiting for them.
+        @param stream: the binary pipe to read from
+        @param profiler: the Profiler to report to
+        @param repository: the name of the repository
+        @param phase: the phase to count the bytes read as part of
+        """
+        self.stream = getattr(stream, "raw", stream)  # read straight from the pipe, so reads return as soon as any output is ready
+        self.profiler = profiler
+        self.repository = repository
+        self.phase = phase
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        with self.profiler.phase(self.repository, "git"):
+            n = self.stream.readinto(buffer)
+        if n:
+            self.profiler.count(self.repository, self.phase, bytes_read=n)
+        return n
+
+    def close(self):
+        self.stream.close()
+        super().close()
+
+
+def peak_rss(children=False):
+    """
+    Return the peak resident memory used so far.
+    @param children: whether to return that of the largest child process that has finished, e.g. git, rather than of this process
+    @returns: the peak, in bytes, or None where it can not be measured
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    if sys.platform == "darwin":
+        return usage.ru_maxrss  # already in bytes
+    return usage.ru_maxrss * 1024
+
+
+def phase_order(item):
+    name = item[0]
+    return PHASES.index(name) if name in PHASES else len(PHASES)
@@ -0,0 +1,228 @@
+"""
+Cloning and updating the local copies of the repositories to analyze.
+"""
+
+import datetime
+import json
+import os
+import subprocess
+import threading
+import time
+
+# the parser, and asyncio, are only imported where they are used
+
+# the refspec that brings a bare clone's branches up to date with the remote's, as git pull does for a full clone
+BARE_REFSPEC = "+refs/heads/*:refs/heads/*"
+
+# the git commands that make reading a repository's history faster, by name.
+# a commit-graph with generation numbers and changed-path filters speeds up walks limited by date and by files,
+# and a multi-pack-index lets objects be looked up once rather than in each of the packs fetches leave behind.
+OPTIMIZE_STEPS = {
+    "commit_graph": ["git", "commit-graph", "write", "--reachable", "--changed-paths"],
+    "multi_pack_index": ["git", "multi-pack-index", "write"],
+}
+
+# timings of several repositories may be recorded at the same time
+_timings_lock = threading.Lock()
+
+
+def update_repository(
+    repo_url,
+    repos_dir,
+    branch=None,
+    clone_mode="full",
+    since=None,
+    optimize=False,
+    timings=None,
+    profiler=None,
+):
+    """
+    Clone a repository into the directory of repositories, or pull its latest changes if an earlier run already cloned it.
+    Every git command is given its working directory explicitly, so several repositories can be updated side by side.
+    @param repo_url: the URL of the repository of interest
+    @param repos_dir: the directory in which all cloned repositories are kept
+    @param branch: the branch to checkout, if not the default branch
+    @param clone_mode: how to clone the repository, one of CLONE_MODES.  an existing clone keeps the mode it was cloned with.  defaults to "full".
+    @param since: the start date of interest, in standard US format, e.g. 01/01/2021.  required by the "shallow-since" mode.
+    @param optimize: whether to write or refresh the repository's commit-graph and multi-pack-index once it is up to date.  defaults to False.
+    @param timings: a dictionary in which to record how many seconds each step of optimizing took, by the names in OPTIMIZE_STEPS
+    @param profiler: an optional Profiler to measure the time spent fetching and optimizing, and the git processes run
+    @returns: the path to the local copy of the repository
+    """
+    from .git_logs_parser import GitLogsParser
+
+    env = GitLogsParser.git_environment()
+    started = time.perf_counter()
+    for cmd, cwd in update_steps(repo_url, repos_dir, branch, clone_mode, since):
+        subprocess.run(cmd, cwd=cwd, env=env, capture_output=True, check=True)
+        profile_step(profiler, repo_url, "fetch", started)
+        started = time.perf_counter()
+    repo_dir = local_path(repo_url, repos_dir)
+    if optimize:
+        for name, cmd in OPTIMIZE_STEPS.items():
+            started = time.perf_counter()
+            subprocess.run(cmd, cwd=repo_dir, env=env, capture_output=True, check=True)
+            if timings is not None:
+                timings[name] = time.perf_counter() - started
+            profile_step(profiler, repo_url, "optimize", started)
+    return repo_dir
+
+
+async def update_repository_async(
+    repo_url,
+    repos_dir,
+    branch=None,
+    clone_mode="full",
+    since=None,
+    optimize=False,
+    timings=None,
+    profiler=None,
+):
+    """
+    Clone or pull a repository just like update_repository(), but without blocking the event loop while git waits on the network.
+    @returns: the path to the local copy of the repository
+    """
+    from .git_logs_parser import GitLogsParser
+
+    env = GitLogsParser.git_environment()
+    started = time.perf_counter()
+    for cmd, cwd in update_steps(repo_url, repos_dir, branch, clone_mode, since):
+        await _run_async(cmd, cwd, env)
+        profile_step(profiler, repo_url, "fetch", started)
+        started = time.perf_counter()
+    repo_dir = local_path(repo_url, repos_dir)
+    if optimize:
+        for name, cmd in OPTIMIZE_STEPS.items():
+            started = time.perf_counter()
+            await _run_async(cmd, repo_dir, env)
+            if timings is not None:
+                timings[name] = time.perf_counter() - started
+            profile_step(profiler, repo_url, "optimize", started)
+    return repo_dir
+
+
+async def _run_async(cmd, cwd, env):
+    import asyncio
+
+    p = await asyncio.create_subprocess_exec(
+        *cmd,
+        cwd=cwd,
+        env=env,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await p.communicate()
+    if p.returncode != 0:
+        raise subprocess.CalledProcessError(p.returncode, cmd, stdout, stderr)
+
+
+def profile_step(profiler, repo_url, phase, started):
+    """
+    Count a git command run to fetch or optimize a repository, and the time it took, with the profiler, if there is one.
+    Commands are run one after another, so the wall time is what it took, even while other repositories are fetched side by side.
+    @param profiler: the Profiler, or None
+    @param repo_url: the URL of the repository
+    @param phase: the name of the phase, e.g. "fetch"
+    @param started: the time.perf_counter() at which the command started
+    """
+    if profiler is not None:
+        from .git_logs_parser import GitLogsParser
+
+        name = GitLogsParser.repo_name_from_url(repo_url)
+        profiler.record(name, phase, time.perf_counter() - started)
+        profiler.count(name, phase, subprocesses=1)
+
+
+def record_timings(path, repo_url, timings, **details):
+    """
+    Append the timings of a repository to a log, as one JSON object per line, so the effect of optimizing repositories can be compared across runs.
+    @param path: the path to the log file
+    @param repo_url: the URL of the repository timed
+    @param timings: a dictionary of the seconds each step took, by name
+    @param details: any other fields to record, e.g. whether the repository was optimized
+    """
+    record = {
+        "repository": repo_url,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        **details,
+    }
+    record.update({name: round(seconds, 6) for name, seconds in timings.items()})
+    with _timings_lock:
+        with open(path, "a", encoding="utf8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+def has_commit_graph(repo_dir):
+    """
+    Check whether a repository has a commit-graph, i.e. was optimized by this run or an earlier one.
+    @param repo_dir: the path to the repository, a working tree or a bare clone
+    @returns: True if the repository has a commit-graph, whole or split
+    """
+    git_dir = os.path.join(repo_dir, ".git")
+    info_dir = os.path.join(git_dir if os.path.isdir(git_dir) else repo_dir, "objects", "info")
+    return os.path.exists(os.path.join(info_dir, "commit-graph")) or os.path.exists(
+        os.path.join(info_dir, "commit-graphs", "commit-graph-chain")
+    )
+
+
+def local_path(repo_url, repos_dir):
+    """
+    Returns the path to the local copy of a repository.
+    @param repo_url: the URL of the repository of interest
+    @param repos_dir: the directory in which all cloned repositories are kept
+    @returns: the path of the repository's directory within repos_dir
+    """
+    from .git_logs_parser import GitLogsParser
+
+    return os.path.join(
+        repos_dir, GitLogsParser.repo_name_from_url(repo_url)
+    )  # extract the humanish repo name from the URL
+
+
+def update_steps(repo_url, repos_dir, branch=None, clone_mode="full", since=None):
+    """
+    Work out the git commands that clone or update a repository.  Each command must have been run before the next is generated, since which commands come next depends on what the earlier ones did.
+    @param repo_url, repos_dir, branch, clone_mode, since: as for update_repository()
+    @returns: a generator of (command, working directory) tuples
+    """
+    repo_dir = local_path(repo_url, repos_dir)
+
+    # history before the day preceding the start date is not needed, just like with git log --after
+    shallow_since = None
+    if since:
+        shallow_since = datetime.datetime.strptime(
+            since, "%m/%d/%Y"
+        ) - datetime.timedelta(days=1)
+        shallow_since = shallow_since.strftime("%Y-%m-%d")
+
+    # clone or pull the repo into the repo_dir
+    if not os.path.exists(repo_dir):
+        # has not yet been cloned... do a clone
+        cmd = ["git", "clone"]
+        if clone_mode != "full":
+            cmd.append("--bare")
+        if clone_mode == "blobless":
+            cmd.append("--filter=blob:none")
+        if clone_mode == "shallow-since":
+            cmd.append(f"--shallow-since={shallow_since}")
+        yield cmd + [repo_url, repo_dir], None  # clone the code from github
+    elif os.path.exists(os.path.join(repo_dir, ".git")):
+        # has previously been cloned with a working tree... do a pull
+        yield ["git", "pull"], repo_dir
+    else:
+        # has previously been cloned without a working tree... fetch the branches
+        cmd = ["git", "fetch", "--prune"]
+        if shallow_since and os.path.exists(os.path.join(repo_dir, "shallow")):
+            cmd.append(f"--shallow-since={shallow_since}")
+        yield cmd + ["origin", BARE_REFSPEC], repo_dir
+
+    if os.path.exists(os.path.join(repo_dir, "shallow")):
+        # the oldest commits of a shallow clone look like they added every file... fetch their parents, so their stats are right
+        yield ["git", "fetch", "--deepen=1", "origin", BARE_REFSPEC], repo_dir
+
+    if branch:
+        if os.path.exists(os.path.join(repo_dir, ".git")):
+            yield ["git", "checkout", branch], repo_dir
+        else:
+            # without a working tree, just point HEAD, which the git logs are read from, at the branch
+            yield ["git", "symbolic-ref", "HEAD", f"refs/heads/{branch}"], repo_dir
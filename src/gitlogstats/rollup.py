@@ -0,0 +1,71 @@
+"""
+Rolling up the results of many repositories as they are parsed, e.g. into each contributor's totals across every repository, without keeping every repository's results in memory.
+"""
+
+from .constants import ROLLUPS
+
+# the fields of a row of results that are summed when rolling up, if it has them.  rows of churn have no count of files
+COUNTS = ["commits", "insertions", "deletions", "files"]
+
+# the field each rollup sums over, and the field that counts how many of them had any commits
+ROLLED_UP = {
+    "repo": ("username", "contributors"),
+    "user": ("repository", "repositories"),
+}
+
+
+class Rollup:
+    def __init__(self, by="user+repo"):
+        """
+        Initialize a rollup of the results of many repositories.
+        Only one row per contributor, or per repository, is kept in memory, however many repositories are added.
+        @param by: how to roll the results up, one of ROLLUPS.  defaults to "user+repo", i.e. the rows are left as they are.
+        """
+        if by not in ROLLUPS:
+            raise ValueError(f"unknown rollup {by}, choose from {', '.join(ROLLUPS)}")
+        self.by = by
+        self.totals = {}  # the fields of a rolled-up row, other than its counts -> the row
+
+    def add(self, rows):
+        """
+        Add the results of a repository.
+        @param rows: a list of stats entries of one repository, e.g. from GitLogsParser.parse()
+        @returns: a list of the rows that are final already, and can be written out at once.  a repository's rows are, when rolling up by repository, while contributors' totals are only final once every repository has been added.
+        """
+        if self.by == "user+repo":
+            return list(rows)
+        if self.by == "repo":
+            return list(self.merge(rows, {}).values())
+        self.merge(rows, self.totals)
+        return []
+
+    def finish(self):
+        """
+        Finish rolling up, once every repository has been added.
+        @returns: a list of the rows not returned by add() yet, in the order they were first seen
+        """
+        rows = list(self.totals.values())
+        self.totals = {}
+        return rows
+
+    def merge(self, rows, totals):
+        """
+        Sum rows into rolled-up rows.
+        @param rows: an iterable of stats entries
+        @param totals: a dictionary of rolled-up rows, by their fields other than their counts, which is changed in place
+        @returns: the dictionary of rolled-up rows
+        """
+        dropped, counted = ROLLED_UP[self.by]
+        for row in rows:
+            fields = tuple((key, value) for key, value in row.items() if key != dropped and key not in COUNTS)
+            total = totals.get(fields)
+            if total is None:
+                total = totals[fields] = dict(fields)
+                total[counted] = 0
+                total.update((key, 0) for key in COUNTS if key in row)
+            if row["commits"]:
+                total[counted] += 1
+            for key in COUNTS:
+                if key in row:
+                    total[key] += row[key]
+        return totals
@@ -0,0 +1,381 @@
+"""
+A long-running server that keeps repositories cloned, and the stats of their commits in memory, so queries for stats are answered over HTTP in milliseconds, without running git.
+
+Run it with, e.g.:
+    gitlogstats serve -rf repos.txt --port 8765
+then query it with, e.g.:
+    curl "http://localhost:8765/stats?repo=se-welcome&user=alice&start=01/01/2024&end=06/30/2024&format=csv"
+
+Endpoints:
+    GET /stats      the stats of the repositories, with the query parameters repo (repeatable, defaults to every repository), user, start, end, format, bucket and rollup, which mean the same as the command-line options
+    GET /repos      the repositories served, as JSON
+    POST /refresh   fetch the repositories, or those given by the repo query parameter, and read their new commits, in the background
+"""
+
+import argparse
+import datetime
+import json
+import os
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .aliases import Aliases
+from .commit_store import CommitStore
+from .constants import BUCKETS, CLONE_MODES, DEFAULT_EXCLUSIONS, OUTPUT_FORMATS, ROLLUPS
+from .git_logs_parser import GitLogsParser
+from .repositories import update_repository
+from .rollup import Rollup
+from .writers import iter_formatted
+
+# the content type of the results in each output format
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "markdown": "text/markdown; charset=utf-8",
+}
+
+
+class WarmRepository:
+    def __init__(self, repo_url, repos_dir, exclusions, clone_mode="full", aliases=None, verbose=False):
+        """
+        Initialize a repository whose commits are kept in memory between queries.
+        @param repo_url: the URL of the repository
+        @param repos_dir: the directory in which all cloned repositories are kept
+        @param exclusions: a list of files to exclude from analysis.  wild cards accepted.
+        @param clone_mode: how to clone the repository, if not cloned already, one of CLONE_MODES.  defaults to "full".
+        @param aliases: an optional Aliases to resolve contributors' identities with
+        @param verbose: whether to output debugging info.  defaults to False.
+        """
+        self.repo_url = repo_url
+        self.repos_dir = repos_dir
+        self.exclusions = exclusions
+        self.clone_mode = clone_mode
+        self.aliases = aliases
+        self.verbose = verbose
+        self.name = GitLogsParser.repo_name_from_url(repo_url)
+        self.repo_dir = None  # the path to the local copy, once fetched
+        # the same store the -i flag keeps, so the server and the command line share it, taking turns to bring it up to date
+        self.store = CommitStore(
+            os.path.join(repos_dir, ".gitlogstats-commits", self.name + ".jsonl")
+        )
+        self.lock = threading.Lock()  # held while the store is read or brought up to date
+        self.refresh_lock = threading.Lock()  # held while fetching, so refreshes do not overlap
+        self.refreshed = None  # when the repository was last brought up to date, in seconds since the epoch
+        self.error = None  # why the last refresh failed, if it did
+
+    def refresh(self):
+        """
+        Fetch the repository, then read any commits made since it was last fetched into memory.
+        Queries are only held up while the new commits are read, not while fetching.
+        @returns: True if the repository was brought up to date, or False if that failed, in which case the error is kept
+        """
+        with self.refresh_lock:
+            try:
+                repo_dir = update_repository(self.repo_url, self.repos_dir, clone_mode=self.clone_mode)
+                with self.lock:
+                    self.repo_dir = repo_dir
+                    self.parser("01/01/1970", "01/01/1970").update_store()
+            except Exception as e:  # a repository that can not be fetched must not bring the server down
+                self.error = str(e)
+                return False
+            self.refreshed = time.time()
+            self.error = None
+            return True
+
+    def query(self, start, end, username=None, bucket=None):
+        """
+        Compute the stats of the repository from the commits in memory, just as GitLogsParser.parse() would, without running git.
+        @param start: the start date, in mm/dd/yyyy format
+        @param end: the end date, in mm/dd/yyyy format
+        @param username: the git username to report, or None for all contributors
+        @param bucket: an optional size of bucket of time to split the stats into, one of BUCKETS
+        @returns: a list of stats entries
+        """
+        with self.lock:
+            if self.repo_dir is None:
+                raise LookupError(f"{self.name} has not been fetched yet: {self.error}")
+            return self.parser(start, end, username, bucket).parse()
+
+    def parser(self, start, end, username=None, bucket=None):
+        return GitLogsParser(
+            repo=self.repo_dir,
+            start=start,
+            end=end,
+            username=username,
+            exclusions=self.exclusions,
+            verbose=self.verbose,
+            clean=True,
+            store=self.store,
+            bucket=bucket,
+            aliases=self.aliases,
+            refresh_store=False,
+        )
+
+    def describe(self):
+        """
+        Describe the state of the repository.
+        @returns: a dictionary that can be written as JSON
+        """
+        return {
+            "name": self.name,
+            "url": self.repo_url,
+            "head": self.store.head,
+            "commits": len(self.store.commits),
+            "refreshed": self.refreshed,
+            "error": self.error,
+        }
+
+
+class StatsServer(ThreadingHTTPServer):
+    daemon_threads = True  # requests still being answered do not keep the process alive
+
+    def __init__(self, address, repositories, verbose=False):
+        """
+        Initialize a server of the stats of warm repositories.  Nothing is served until serve_forever() is called.
+        @param address: a (host, port) tuple to listen on.  port 0 picks any free port.
+        @param repositories: a list of WarmRepository
+        @param verbose: whether to log every request.  defaults to False.
+        """
+        super().__init__(address, StatsRequestHandler)
+        self.repositories = repositories
+        self.verbose = verbose
+        self.stopped = threading.Event()
+
+    def find(self, names):
+        """
+        Find the repositories with the given names or URLs.
+        @param names: a list of repository names or URLs.  if empty, every repository is returned.
+        @returns: a list of WarmRepository, in the order given
+        """
+        if not names:
+            return list(self.repositories)
+        found = []
+        for name in names:
+            matches = [r for r in self.repositories if name in (r.name, r.repo_url)]
+            if not matches:
+                raise KeyError(name)
+            found.extend(matches)
+        return found
+
+    def refresh(self, repositories=None):
+        """
+        Bring repositories up to date, one at a time.
+        @param repositories: a list of WarmRepository.  defaults to every repository.
+        """
+        for repository in repositories or self.repositories:
+            if not repository.refresh():
+                sys.stderr.write(f"Could not refresh {repository.name}: {repository.error}\n")
+
+    def refresh_later(self, repositories=None):
+        """
+        Bring repositories up to date in the background, e.g. when told there are new commits.
+        @param repositories: a list of WarmRepository.  defaults to every repository.
+        @returns: the thread doing the work
+        """
+        thread = threading.Thread(target=self.refresh, args=(repositories,), daemon=True)
+        thread.start()
+        return thread
+
+    def schedule(self, interval):
+        """
+        Bring every repository up to date every so often, in the background, until the server is shut down.
+        @param interval: the seconds to wait between refreshes
+        @returns: the thread doing the work
+        """
+
+        def refresh_periodically():
+            while not self.stopped.wait(interval):
+                self.refresh()
+
+        thread = threading.Thread(target=refresh_periodically, daemon=True)
+        thread.start()
+        return thread
+
+    def server_close(self):
+        self.stopped.set()
+        super().server_close()
+
+
+class StatsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = urllib.parse.parse_qs(url.query)
+        if url.path == "/stats":
+            self.send_stats(params)
+        elif url.path == "/repos":
+            self.send_body(
+                json.dumps([r.describe() for r in self.server.repositories]),
+                CONTENT_TYPES["json"],
+            )
+        else:
+            self.send_error(404, f"unknown endpoint {url.path}")
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = urllib.parse.parse_qs(url.query)
+        if url.path != "/refresh":
+            self.send_error(404, f"unknown endpoint {url.path}")
+            return
+        try:
+            repositories = self.server.find(params.get("repo", []))
+        except KeyError as e:
+            self.send_error(404, f"unknown repository {e.args[0]}")
+            return
+        self.server.refresh_later(repositories)
+        self.send_body(json.dumps({"refreshing": [r.name for r in repositories]}), CONTENT_TYPES["json"], status=202)
+
+    def send_stats(self, params):
+        """
+        Answer a query for stats, in the format asked for.
+        @param params: the query parameters, as parsed by urllib.parse.parse_qs()
+        """
+        start, end = default_dates()
+        start = first(params, "start", start)
+        end = first(params, "end", end)
+        output_format = first(params, "format", "json")
+        bucket = first(params, "bucket", None)
+        rollup = first(params, "rollup", "user+repo")
+        if output_format not in OUTPUT_FORMATS:
+            self.send_error(400, f"unknown format {output_format}, choose from {', '.join(OUTPUT_FORMATS)}")
+            return
+        if bucket is not None and bucket not in BUCKETS:
+            self.send_error(400, f"unknown bucket {bucket}, choose from {', '.join(BUCKETS)}")
+            return
+        if rollup not in ROLLUPS:
+            self.send_error(400, f"unknown rollup {rollup}, choose from {', '.join(ROLLUPS)}")
+            return
+        rollup = Rollup(rollup)
+        try:
+            repositories = self.server.find(params.get("repo", []))
+        except KeyError as e:
+            self.send_error(404, f"unknown repository {e.args[0]}")
+            return
+        results = []
+        try:
+            for repository in repositories:
+                results.extend(rollup.add(repository.query(start, end, first(params, "user", None), bucket)))
+        except ValueError as e:
+            self.send_error(400, f"bad date: {e}")
+            return
+        except LookupError as e:
+            self.send_error(503, str(e))
+            return
+        results.extend(rollup.finish())
+        self.send_body("".join(iter_formatted(results, output_format)), CONTENT_TYPES[output_format])
+
+    def send_body(self, body, content_type, status=200):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def first(params, name, default):
+    """
+    Return the first value of a query parameter.
+    @param params: the query parameters, as parsed by urllib.parse.parse_qs()
+    @param name: the name of the parameter
+    @param default: the value to return if the parameter is missing or empty
+    @returns: the value
+    """
+    values = params.get(name)
+    return values[0] if values and values[0] else default
+
+
+def default_dates():
+    """
+    Return the default date range, from a year ago until today, just like the command line's.
+    @returns: a tuple of the start and end dates, in mm/dd/yyyy format
+    """
+    today = datetime.date.today()
+    return (today - datetime.timedelta(days=365)).strftime("%m/%d/%Y"), today.strftime("%m/%d/%Y")
+
+
+def main(argv=None):
+    """
+    Serve the stats of repositories with command-line arguments, until interrupted.
+    @param argv: the command-line arguments, after "serve".  defaults to those of the process.
+    """
+    parser = argparse.ArgumentParser(prog="gitlogstats serve")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument(
+        "-r",
+        "--repository",
+        help="the public URL of the repository whose stats to serve",
+    )
+    group.add_argument(
+        "-rf",
+        "--repofile",
+        help="the path to simple text file with a list of repository URLs whose stats to serve",
+    )
+    parser.add_argument(
+        "-x",
+        "--exclusions",
+        help='A comma-separated string of files to exclude, e.g. --excusions "foo.zip, *.jpg, *.json" ',
+        default=",".join(DEFAULT_EXCLUSIONS),
+    )
+    parser.add_argument(
+        "--aliases",
+        help="The path to a file mapping the names and emails contributors have committed under to one id each",
+        default=None,
+    )
+    parser.add_argument(
+        "--clone-mode",
+        help="How to clone repositories not cloned already",
+        default="full",
+        choices=CLONE_MODES,
+    )
+    parser.add_argument("--host", help="The address to listen on", default="127.0.0.1")
+    parser.add_argument("--port", help="The port to listen on", type=int, default=8765)
+    parser.add_argument(
+        "--refresh-interval",
+        help="The seconds between fetching every repository and reading its new commits.  0 only refreshes when POSTed to /refresh",
+        type=int,
+        default=900,
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        help="Whether to output debugging info, and log every request",
+        default=False,
+        action="store_true",
+    )
+    args = parser.parse_args(argv)
+
+    repository_urls = [args.repository]
+    if args.repofile:
+        with open(args.repofile, "r", encoding="utf8") as f:
+            repository_urls = [line for line in f.read().strip().split("\n")]
+    aliases = Aliases.read(args.aliases) if args.aliases else None
+    exclusions = re.split(r",\s*", args.exclusions)
+
+    repos_dir = os.path.join(os.getcwd(), "repos")
+    os.makedirs(repos_dir, exist_ok=True)
+    repositories = [
+        WarmRepository(url, repos_dir, exclusions, args.clone_mode, aliases, args.verbose)
+        for url in repository_urls
+    ]
+
+    server = StatsServer((args.host, args.port), repositories, verbose=args.verbose)
+    server.refresh()  # warm every repository up before the first query
+    if args.refresh_interval > 0:
+        server.schedule(args.refresh_interval)
+    host, port = server.server_address[:2]
+    sys.stderr.write(f"Serving the stats of {len(repositories)} repositories at http://{host}:{port}/stats\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
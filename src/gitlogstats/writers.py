@@ -0,0 +1,110 @@
+"""
+Writers that stream rows of results to a file as they are produced, rather than building the whole output in memory first.
+"""
+
+import csv
+import json
+
+
+class ResultWriter:
+    def __init__(self, stream, output_format):
+        """
+        Initialize a writer of rows of results.
+        @param stream: the text file to write to, e.g. sys.stdout
+        @param output_format: the format to write the rows in, one of OUTPUT_FORMATS
+        """
+        self.stream = stream
+        self.output_format = output_format
+        self.fieldnames = None  # taken from the first row written, just like the heading
+        self.rows = 0  # the number of rows written so far
+        self.csv_writer = None
+        if output_format == "csv":
+            self.csv_writer = csv.writer(stream, lineterminator="\n")
+
+    def write(self, rows):
+        """
+        Write rows of results.  May be called any number of times, e.g. once per repository, and all rows end up in one table, or one JSON array.
+        @param rows: an iterable of dictionaries, each with the same keys
+        """
+        for row in rows:
+            if self.fieldnames is None:
+                self.fieldnames = list(row.keys())
+                self.write_heading()
+            self.write_row(row)
+            self.rows += 1
+
+    def write_heading(self):
+        """
+        Write whatever comes before the first row.
+        """
+        if self.output_format == "csv":
+            self.csv_writer.writerow(self.fieldnames)
+        elif self.output_format == "markdown":
+            self.stream.write("| " + " | ".join(self.fieldnames) + " |\n")
+            self.stream.write(
+                "| " + " | ".join(":----" for key in self.fieldnames) + " |\n"
+            )  # heading separator line
+        elif self.output_format == "json":
+            self.stream.write("[")
+
+    def write_row(self, row):
+        """
+        Write one row of results.
+        @param row: a dictionary of values
+        """
+        if self.output_format == "csv":
+            self.csv_writer.writerow(row.values())
+        elif self.output_format == "markdown":
+            self.stream.write(
+                "| " + " | ".join(str(val) for val in row.values()) + " |\n"
+            )
+        elif self.output_format == "json":
+            # separated just like json.dumps() separates the items of a list
+            if self.rows > 0:
+                self.stream.write(", ")
+            self.stream.write(json.dumps(row))
+        elif self.output_format == "ndjson":
+            self.stream.write(json.dumps(row) + "\n")
+
+    def close(self):
+        """
+        Write whatever comes after the last row.  The stream itself is left open.
+        """
+        if self.output_format == "json":
+            self.stream.write("]" if self.rows > 0 else "[]")
+        self.stream.flush()
+
+
+def iter_formatted(rows, output_format):
+    """
+    Format rows of results one piece at a time.
+    @param rows: an iterable of dictionaries, each with the same keys
+    @param output_format: the format to write the rows in, one of OUTPUT_FORMATS
+    @returns: a generator of strings that, joined together, are the formatted results
+    """
+    buffer = _Buffer()
+    writer = ResultWriter(buffer, output_format)
+    for row in rows:
+        writer.write([row])
+        yield from buffer.drain()
+    writer.close()
+    yield from buffer.drain()
+
+
+class _Buffer:
+    """
+    A minimal text file that holds what is written to it until it is drained.
+    """
+
+    def __init__(self):
+        self.pieces = []
+
+    def write(self, text):
+        self.pieces.append(text)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        pieces, self.pieces = self.pieces, []
+        return pieces
@@ -0,0 +1,111 @@
+"""
+Shared fixtures: small real git repositories with a known history.
+"""
+
+import os
+import subprocess
+
+import pytest
+
+# (author, committer date, {path: contents}) for each commit of the sample repository, oldest first
+SAMPLE_HISTORY = [
+    ("alice", "2024-01-10T12:00:00", {"README.md": "hello\n", "app.py": "a = 1\nb = 2\n"}),
+    ("bob", "2024-02-01T09:30:00", {"app.py": "a = 1\nb = 3\nc = 4\n"}),
+    ("alice", "2024-02-15T16:45:00", {"logo.png": "\x89PNG\x00binary", "lib.py": "x\ny\nz\n"}),
+    ("carol", "2024-03-03T08:00:00", {"README.md": "hello\nworld\n", "data.json": "{}\n"}),
+    ("bob", "2024-06-20T20:15:00", {"lib.py": "x\nz\n"}),
+]
+
+
+def git(repo, *args, env=None):
+    """Run a git command in *repo*, returning its output."""
+    return subprocess.run(
+        ["git", *args], cwd=repo, env=env, capture_output=True, check=True, text=True
+    ).stdout
+
+
+def make_git_repo(path, history=SAMPLE_HISTORY):
+    """Create a git repository at *path* with one commit per entry of *history*."""
+    os.makedirs(path, exist_ok=True)
+    git(path, "init", "-q", "-b", "main")
+    for author, date, files in history:
+        for name, contents in files.items():
+            with open(os.path.join(path, name), "w", encoding="utf-8", newline="") as f:
+                f.write(contents)
+        git(path, "add", "-A")
+        env = dict(
+            os.environ,
+            GIT_AUTHOR_NAME=author,
+            GIT_AUTHOR_EMAIL=f"{author}@example.com",
+            GIT_COMMITTER_NAME=author,
+            GIT_COMMITTER_EMAIL=f"{author}@example.com",
+            GIT_AUTHOR_DATE=date,
+            GIT_COMMITTER_DATE=date,
+        )
+        git(path, "commit", "-q", "-m", f"{author} at {date}", env=env)
+    return str(path)
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    """A git repository with the SAMPLE_HISTORY commits."""
+    return make_git_repo(tmp_path / "sample")
+
+
+@pytest.fixture
+def git_repo_factory(tmp_path):
+    """A function that creates git repositories in a temporary directory, given a name and history."""
+
+    def factory(name, history=SAMPLE_HISTORY):
+        return make_git_repo(tmp_path / name, history)
+
+    return factory
+
+
+def commit(repo, author, date, message="change"):
+    """Commit everything in *repo* as *author* at *date*."""
+    git(repo, "add", "-A")
+    env = dict(
+        os.environ,
+        GIT_AUTHOR_NAME=author,
+        GIT_AUTHOR_EMAIL=f"{author}@example.com",
+        GIT_COMMITTER_NAME=author,
+        GIT_COMMITTER_EMAIL=f"{author}@example.com",
+        GIT_AUTHOR_DATE=date,
+        GIT_COMMITTER_DATE=date,
+    )
+    git(repo, "commit", "-q", "--allow-empty", "-m", message, env=env)
+
+
+def write(repo, path, contents):
+    """Write *contents* to *path* in *repo*, creating any directories it is in."""
+    path = os.path.join(repo, path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(contents)
+
+
+@pytest.fixture
+def branchy_repo(git_repo):
+    """The sample repository, with renames, deletions, a merge, a mode change and commits to excluded files only."""
+    numbers = "".join(f"line {i}\n" for i in range(40))
+    git(git_repo, "checkout", "-q", "-b", "feature")
+    write(git_repo, "docs/guide.md", numbers)
+    commit(git_repo, "dave", "2024-03-10T10:00:00")
+    git(git_repo, "mv", "docs/guide.md", "docs/manual.md")
+    write(git_repo, "docs/manual.md", numbers.replace("line 7\n", "line seven\n"))
+    commit(git_repo, "dave", "2024-03-12T10:00:00")
+    git(git_repo, "checkout", "-q", "main")
+    git(git_repo, "mv", "lib.py", "src.py")
+    commit(git_repo, "alice", "2024-03-11T10:00:00")
+    env = dict(os.environ, GIT_AUTHOR_DATE="2024-03-13T10:00:00", GIT_COMMITTER_DATE="2024-03-13T10:00:00")
+    git(git_repo, "-c", "user.name=carol", "-c", "user.email=carol@example.com", "merge", "-q", "--no-ff", "-m", "merge", "feature", env=env)
+    os.chmod(os.path.join(git_repo, "app.py"), 0o755)
+    write(git_repo, "logo.png", "\x89PNG\x00changed")
+    commit(git_repo, "bob", "2024-04-01T10:00:00")
+    write(git_repo, "data.json", "[]\n")
+    commit(git_repo, "eve", "2024-04-02T10:00:00")
+    os.remove(os.path.join(git_repo, "README.md"))
+    write(git_repo, "no-newline.txt", "a\nb")
+    commit(git_repo, "bob", "2024-04-03T10:00:00")
+    return git_repo
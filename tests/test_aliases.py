@@ -0,0 +1,56 @@
+"""
+Unit tests for the alias file reader, which maps the names and emails contributors commit under to canonical ids.
+"""
+
+from gitlogstats.aliases import Aliases
+
+ALIAS_FILE = """
+# students
+Ann Lee: ann, Ann L, ann@example.com, <1234+annlee@users.noreply.github.com>
+Bob: bobby,BOB@Example.com
+
+not an alias line
+: nobody
+"""
+
+
+class TestResolve:
+    def setup_method(self):
+        self.aliases = Aliases.parse(ALIAS_FILE)
+
+    def test_names_mapped_ignoring_case(self):
+        assert self.aliases.resolve("ANN") == "Ann Lee"
+        assert self.aliases.resolve("ann l", "other@example.com") == "Ann Lee"
+
+    def test_emails_mapped_ignoring_case(self):
+        assert self.aliases.resolve("someone", "ANN@example.com") == "Ann Lee"
+        assert self.aliases.resolve("x", "1234+annlee@users.noreply.github.com") == "Ann Lee"
+        assert self.aliases.resolve("x", "bob@example.com") == "Bob"
+
+    def test_email_wins_over_name(self):
+        assert self.aliases.resolve("ann", "bob@example.com") == "Bob"
+
+    def test_canonical_id_maps_to_itself(self):
+        assert self.aliases.resolve("ann lee") == "Ann Lee"
+
+    def test_exact_match_not_substring(self):
+        assert self.aliases.resolve("Anna", "anna@example.com") == "Anna"
+        assert self.aliases.resolve("bobby tables") == "bobby tables"
+
+    def test_unmapped_author_keeps_name(self):
+        assert self.aliases.resolve("carol", "carol@example.com") == "carol"
+
+    def test_later_lines_win(self):
+        aliases = Aliases.parse("A: x\nB: x\n")
+        assert aliases.resolve("x") == "B"
+
+    def test_comments_blank_and_malformed_lines_ignored(self):
+        assert Aliases.parse("# a: b\n\nno colon here\n  : nobody\n").to_dict() == {"names": {}, "emails": {}}
+        assert not Aliases.parse("")
+
+
+class TestRead:
+    def test_reads_file(self, tmp_path):
+        path = tmp_path / "aliases.txt"
+        path.write_text(ALIAS_FILE, encoding="utf8")
+        assert Aliases.read(str(path)).resolve("bobby") == "Bob"
@@ -0,0 +1,140 @@
+"""
+Unit tests for the in-process backend, which must read the same stats from a repository's files as git reports.
+"""
+
+import os
+
+import pytest
+
+from gitlogstats import GitLogsParser
+from gitlogstats.backends import PythonBackend
+from gitlogstats.cache import ResultCache
+from gitlogstats.objects import MissingObject, ObjectStore, ObjectStoreError
+
+from conftest import commit, git, write
+
+SETTINGS = [
+    ("01/01/2024", "12/31/2024", None, []),
+    ("02/01/2024", "03/31/2024", None, ["*.png", "*.json"]),
+    ("01/01/2024", "12/31/2024", "bob", ["lib.py"]),
+    ("01/01/2020", "12/31/2030", None, ["**/docs/*.md"]),
+]
+
+
+def assert_same_as_git(repo):
+    """Check that the python backend reads the same stats as git, in every mode of parsing."""
+    for start, end, username, exclusions in SETTINGS:
+        kwargs = {"repo": repo, "start": start, "end": end, "username": username, "exclusions": exclusions}
+        for single_pass in [False, True]:
+            expected = GitLogsParser(clean=False, single_pass=single_pass, **kwargs).parse()
+            parser = GitLogsParser(clean=False, single_pass=single_pass, backend="python", **kwargs)
+            assert parser.parse() == expected
+            assert parser.backend is not None  # no fallback to git
+
+        git_parser = GitLogsParser(**kwargs)
+        python_parser = GitLogsParser(backend="python", **kwargs)
+        assert list(python_parser.iter_commits()) == list(git_parser.iter_commits())
+        assert python_parser.get_contributors() == git_parser.get_contributors()
+        assert python_parser.get_contributors(all_time=True) == git_parser.get_contributors(all_time=True)
+        assert python_parser.get_head() == git_parser.get_head()
+
+
+class TestSameAsGit:
+    def test_loose_objects(self, git_repo):
+        assert_same_as_git(git_repo)
+
+    def test_merges_renames_and_modes(self, branchy_repo):
+        assert_same_as_git(branchy_repo)
+
+    def test_packfiles_and_commit_graph(self, branchy_repo):
+        git(branchy_repo, "gc", "-q")
+        git(branchy_repo, "commit-graph", "write", "--reachable")
+        assert_same_as_git(branchy_repo)
+
+    def test_split_commit_graph(self, branchy_repo):
+        git(branchy_repo, "commit-graph", "write", "--reachable", "--split")
+        commit(branchy_repo, "dave", "2024-05-01T10:00:00")
+        git(branchy_repo, "commit-graph", "write", "--reachable", "--split=no-merge")
+        commit(branchy_repo, "eve", "2024-05-02T10:00:00")  # newer than the graph
+        assert_same_as_git(branchy_repo)
+
+    def test_bare_clone_with_mailmap(self, branchy_repo, tmp_path):
+        write(branchy_repo, ".mailmap", "Robert <bob@example.com>\nAlice A <alice@example.com> alice <alice@example.com>\n")
+        commit(branchy_repo, "alice", "2024-05-01T10:00:00")
+        bare = str(tmp_path / "bare")
+        git(str(tmp_path), "clone", "-q", "--bare", branchy_repo, bare)
+        assert "Robert" in GitLogsParser(repo=bare, start="01/01/2024", end="12/31/2024", username=None).get_contributors()
+        assert_same_as_git(bare)
+
+    def test_shallow_clone(self, branchy_repo, tmp_path):
+        shallow = str(tmp_path / "shallow")
+        git(str(tmp_path), "clone", "-q", "--bare", "--shallow-since=2024-03-11", "file://" + branchy_repo, shallow)
+        assert_same_as_git(shallow)
+
+    def test_octopus_merge_and_clock_skew(self, git_repo_factory):
+        repo = git_repo_factory("octopus", [("alice", "2024-01-10T12:00:00", {"a.txt": "1\n"})])
+        for branch, date in [("one", "2024-01-12T12:00:00"), ("two", "2024-01-08T12:00:00")]:
+            git(repo, "checkout", "-q", "-b", branch, "main")
+            write(repo, f"{branch}.txt", f"{branch}\n")
+            commit(repo, branch, date)
+        git(repo, "checkout", "-q", "main")
+        env = dict(os.environ, GIT_AUTHOR_DATE="2024-01-13T12:00:00", GIT_COMMITTER_DATE="2024-01-13T12:00:00")
+        git(repo, "-c", "user.name=carol", "-c", "user.email=carol@example.com", "merge", "-q", "-m", "octopus", "one", "two", env=env)
+        git(repo, "commit-graph", "write", "--reachable")
+        assert_same_as_git(repo)
+
+    def test_real_history(self):
+        # the line counts of hand-written edits, with their blank lines and braces, are where git's diff is least likely to be the shortest
+        repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        if not os.path.exists(os.path.join(repo, ".git")):
+            pytest.skip("not run from a git checkout")
+        kwargs = {"repo": repo, "start": "01/01/2000", "end": "12/31/2098", "username": None}
+        python_parser = GitLogsParser(backend="python", **kwargs)
+        assert list(python_parser.iter_commits()) == list(GitLogsParser(**kwargs).iter_commits())
+        assert python_parser.backend is not None
+
+    def test_results_cached_apart_from_git(self, git_repo, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache.json"))
+        kwargs = {"repo": git_repo, "start": "01/01/2024", "end": "12/31/2024", "username": None, "cache": cache}
+        GitLogsParser(**kwargs).parse()
+        parser = GitLogsParser(backend="python", **kwargs)
+        assert parser.cache_key() != GitLogsParser(**kwargs).cache_key()
+        parser.parse()
+        assert len(cache.entries) == 2
+
+    def test_partial_clone_read_with_git(self, git_repo):
+        git(git_repo, "config", "extensions.partialClone", "origin")
+        parser = GitLogsParser(repo=git_repo, start="01/01/2024", end="12/31/2024", username=None, backend="python")
+        assert parser.backend is None
+        assert parser.parse() == GitLogsParser(repo=git_repo, start="01/01/2024", end="12/31/2024", username=None).parse()
+
+    def test_missing_object(self, git_repo):
+        blob = git(git_repo, "rev-parse", "HEAD:lib.py").strip()
+        path = os.path.join(git_repo, ".git", "objects", blob[:2], blob[2:])
+        os.rename(path, path + ".moved")
+        try:
+            with pytest.raises(ObjectStoreError):
+                list(PythonBackend(git_repo).commits(0, 2**32))
+        finally:
+            os.rename(path + ".moved", path)
+
+    def test_unreadable_object_read_with_git(self, git_repo, monkeypatch):
+        def missing(self, sha):
+            raise MissingObject(sha)
+
+        parser = GitLogsParser(repo=git_repo, start="01/01/2024", end="12/31/2024", username=None, backend="python")
+        monkeypatch.setattr(ObjectStore, "read", missing)
+        results = parser.parse()
+        assert parser.backend is None
+        assert results == GitLogsParser(repo=git_repo, start="01/01/2024", end="12/31/2024", username=None).parse()
+
+    def test_replaced_objects_not_supported(self, git_repo):
+        head = git(git_repo, "rev-parse", "HEAD").strip()
+        parent = git(git_repo, "rev-parse", "HEAD~1").strip()
+        git(git_repo, "replace", head, parent)
+        with pytest.raises(ObjectStoreError):
+            PythonBackend(git_repo)
+
+    def test_not_a_repository(self, tmp_path):
+        parser = GitLogsParser(repo=str(tmp_path), start="01/01/2024", end="12/31/2024", username=None, backend="python")
+        assert parser.backend is None
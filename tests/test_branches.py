@@ -0,0 +1,76 @@
+"""
+Unit tests for the lookup of branches, and the reachability bitmasks that attribute shared commits to every branch they are on.
+"""
+
+from gitlogstats.branches import branch_indexes, match_branches, reachability
+
+REFS = [
+    ("refs/heads/develop", "d0"),
+    ("refs/heads/main", "m0"),
+    ("refs/heads/release/1.0", "r1"),
+    ("refs/remotes/origin/HEAD", "m1"),
+    ("refs/remotes/origin/main", "m1"),
+    ("refs/remotes/origin/release/2.0", "r2"),
+    ("refs/remotes/upstream/main", "u0"),
+    ("refs/tags/v1.0", "t0"),
+]
+
+
+class TestMatchBranches:
+    def test_names_in_order_of_patterns(self):
+        assert match_branches(REFS, ["main", "develop"]) == [("main", "m1"), ("develop", "d0")]
+
+    def test_remote_branch_preferred_to_local_one(self):
+        assert match_branches(REFS, ["main"]) == [("main", "m1")]
+
+    def test_glob_sorted_by_name(self):
+        assert match_branches(REFS, ["release/*"]) == [("release/1.0", "r1"), ("release/2.0", "r2")]
+
+    def test_each_branch_matched_once(self):
+        assert [name for name, sha in match_branches(REFS, ["main", "*"])] == ["main", "develop", "release/1.0", "release/2.0"]
+
+    def test_other_remotes_tags_and_head_left_out(self):
+        matched = dict(match_branches(REFS, ["*"]))
+        assert "HEAD" not in matched and "v1.0" not in matched
+        assert "u0" not in matched.values() and "t0" not in matched.values()
+
+    def test_nothing_matched(self):
+        assert match_branches(REFS, ["feature/*"]) == []
+
+
+class TestReachability:
+    # a -- b -- c (main)
+    #       \
+    #        d -- e (feature), merged into main by f
+    REV_LIST = ["f c e\n", "e d\n", "c b\n", "d b\n", "b a\n", "a\n"]
+
+    def test_shared_commits_on_both_branches(self):
+        masks = reachability(self.REV_LIST, ["f", "e"])
+        assert masks["f"] == 0b01
+        assert masks["c"] == 0b01
+        assert masks["e"] == masks["d"] == 0b11
+        assert masks["b"] == masks["a"] == 0b11
+
+    def test_branch_tip_within_another_branch(self):
+        masks = reachability(self.REV_LIST, ["f", "c"])
+        assert masks["c"] == masks["a"] == 0b11
+        assert masks["e"] == 0b01
+
+    def test_several_branches_at_one_commit(self):
+        masks = reachability(["a\n"], ["a", "a", "a"])
+        assert masks["a"] == 0b111
+
+    def test_unreached_commits_have_no_branches(self):
+        masks = reachability(["x y\n", "y\n"], ["a"])
+        assert masks.get("x", 0) == 0 and masks.get("y", 0) == 0
+
+
+class TestBranchIndexes:
+    def test_bits_set(self):
+        assert list(branch_indexes(0b101001)) == [0, 3, 5]
+
+    def test_no_bits(self):
+        assert list(branch_indexes(0)) == []
+
+    def test_many_branches(self):
+        assert list(branch_indexes(1 << 100 | 1)) == [0, 100]
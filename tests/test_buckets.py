@@ -0,0 +1,55 @@
+"""
+Unit tests for splitting a date range into days, weeks and months.
+"""
+
+import datetime
+
+import pytest
+
+from gitlogstats.buckets import bucket_ranges, next_bucket
+
+D = datetime.date
+
+
+class TestBucketRanges:
+    def test_days(self):
+        assert bucket_ranges(D(2024, 2, 28), D(2024, 3, 1), "day") == [
+            (D(2024, 2, 28), D(2024, 2, 28)),
+            (D(2024, 2, 29), D(2024, 2, 29)),
+            (D(2024, 3, 1), D(2024, 3, 1)),
+        ]
+
+    def test_weeks_start_on_monday(self):
+        # 01/03/2024 is a Wednesday
+        assert bucket_ranges(D(2024, 1, 3), D(2024, 1, 20), "week") == [
+            (D(2024, 1, 3), D(2024, 1, 7)),
+            (D(2024, 1, 8), D(2024, 1, 14)),
+            (D(2024, 1, 15), D(2024, 1, 20)),
+        ]
+
+    def test_months_across_a_year(self):
+        ranges = bucket_ranges(D(2023, 11, 15), D(2024, 2, 10), "month")
+        assert ranges == [
+            (D(2023, 11, 15), D(2023, 11, 30)),
+            (D(2023, 12, 1), D(2023, 12, 31)),
+            (D(2024, 1, 1), D(2024, 1, 31)),
+            (D(2024, 2, 1), D(2024, 2, 10)),
+        ]
+
+    def test_single_day_range(self):
+        assert bucket_ranges(D(2024, 5, 5), D(2024, 5, 5), "month") == [(D(2024, 5, 5), D(2024, 5, 5))]
+
+    def test_empty_range(self):
+        assert bucket_ranges(D(2024, 5, 5), D(2024, 5, 4), "day") == []
+
+    def test_buckets_cover_every_day_once(self):
+        for bucket in ["day", "week", "month"]:
+            ranges = bucket_ranges(D(2023, 1, 1), D(2024, 12, 31), bucket)
+            days = sum((last - first).days + 1 for first, last in ranges)
+            assert days == (D(2024, 12, 31) - D(2023, 1, 1)).days + 1
+            for (first, last), (following, _) in zip(ranges, ranges[1:]):
+                assert following == last + datetime.timedelta(days=1)
+
+    def test_unknown_bucket(self):
+        with pytest.raises(ValueError):
+            next_bucket(D(2024, 1, 1), "year")
@@ -0,0 +1,144 @@
+"""
+Unit tests for the persistent result cache.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import gitlogstats
+from gitlogstats import GitLogsParser
+from gitlogstats.cache import ResultCache
+
+from conftest import make_git_repo
+
+RESULTS = [{"username": "alice", "commits": 2}]
+
+
+class TestResultCache:
+    def test_miss_returns_none(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache.json"))
+        assert cache.get("nothing") is None
+
+    def test_put_then_get(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache.json"))
+        cache.put("k", RESULTS)
+        assert cache.get("k") == RESULTS
+
+    def test_results_persist_across_instances(self, tmp_path):
+        ResultCache(str(tmp_path / "cache.json")).put("k", RESULTS)
+        assert ResultCache(str(tmp_path / "cache.json")).get("k") == RESULTS
+
+    def test_returned_results_are_copies(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache.json"))
+        cache.put("k", RESULTS)
+        cache.get("k")[0]["commits"] = 99
+        assert cache.get("k") == RESULTS
+
+    def test_expired_results_not_returned(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache.json"), max_age=60)
+        with patch("time.time", return_value=1000):
+            cache.put("k", RESULTS)
+        with patch("time.time", return_value=1061):
+            assert cache.get("k") is None
+
+    def test_expired_results_evicted_from_file(self, tmp_path):
+        path = tmp_path / "cache.json"
+        cache = ResultCache(str(path), max_age=60)
+        with patch("time.time", return_value=1000):
+            cache.put("old", RESULTS)
+        with patch("time.time", return_value=1100):
+            cache.put("new", RESULTS)
+        assert set(json.loads(path.read_text())) == {"new"}
+
+    def test_least_recently_used_evicted_beyond_max_entries(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache.json"), max_entries=2)
+        with patch("time.time", return_value=1000):
+            cache.put("a", RESULTS)
+        with patch("time.time", return_value=1001):
+            cache.put("b", RESULTS)
+        with patch("time.time", return_value=1002):
+            cache.get("a")
+        with patch("time.time", return_value=1003):
+            cache.put("c", RESULTS)
+            assert cache.get("a") == RESULTS
+            assert cache.get("b") is None
+            assert cache.get("c") == RESULTS
+
+    def test_use_saved_across_runs(self, tmp_path):
+        # a nightly run that only uses cached results must still keep them from being evicted by the next run
+        path = str(tmp_path / "cache.json")
+        with patch("time.time", return_value=1000):
+            cache = ResultCache(path, max_entries=2)
+            cache.put("a", RESULTS)
+        with patch("time.time", return_value=1001):
+            cache.put("b", RESULTS)
+        with patch("time.time", return_value=1002):
+            cache = ResultCache(path, max_entries=2)
+            cache.get("a")
+            cache.flush()
+        with patch("time.time", return_value=1003):
+            cache = ResultCache(path, max_entries=2)
+            cache.put("c", RESULTS)
+        assert set(json.loads((tmp_path / "cache.json").read_text())) == {"a", "c"}
+
+    def test_flush_without_use_leaves_file_alone(self, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache.json"))
+        cache.get("k")
+        cache.flush()
+        assert not (tmp_path / "cache.json").exists()
+
+    def test_unreadable_file_treated_as_empty(self, tmp_path):
+        path = tmp_path / "cache.json"
+        path.write_text("{not json")
+        cache = ResultCache(str(path))
+        assert cache.get("k") is None
+        cache.put("k", RESULTS)
+        assert ResultCache(str(path)).get("k") == RESULTS
+
+    def test_key_depends_on_every_field(self):
+        key = ResultCache.key(head="abc", start="01/01/2024")
+        assert key == ResultCache.key(start="01/01/2024", head="abc")
+        assert key != ResultCache.key(head="abd", start="01/01/2024")
+
+
+class TestParserCaching:
+    def make_parser(self, repo, cache, **kwargs):
+        return GitLogsParser(
+            repo=repo, start="01/01/2024", end="12/31/2024", username=None, clean=True, cache=cache, **kwargs
+        )
+
+    def test_second_parse_reuses_results(self, git_repo, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache.json"))
+        expected = self.make_parser(git_repo, cache).parse()
+        with patch.object(GitLogsParser, "parse_per_contributor") as mock_parse:
+            assert self.make_parser(git_repo, cache).parse() == expected
+        mock_parse.assert_not_called()
+
+    def test_new_commit_invalidates_results(self, git_repo_factory, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache.json"))
+        history = [("alice", "2024-01-10T12:00:00", {"a.txt": "1\n"})]
+        repo = git_repo_factory("repo", history)
+        before = self.make_parser(repo, cache).parse()
+        make_git_repo(repo, [("dave", "2024-01-11T12:00:00", {"b.txt": "2\n"})])
+        after = self.make_parser(repo, cache).parse()
+        assert len(after) == len(before) + 1
+
+    def test_different_settings_not_shared(self, git_repo, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache.json"))
+        self.make_parser(git_repo, cache).parse()
+        with patch.object(GitLogsParser, "parse_per_contributor", return_value=[]) as mock_parse:
+            self.make_parser(git_repo, cache, exclusions=["*.py"]).parse()
+        mock_parse.assert_called_once()
+
+    def test_use_saved_by_command_line(self, git_repo, tmp_path):
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(gitlogstats.__file__)))
+        cmd = [sys.executable, "-m", "gitlogstats", "-r", "file://" + git_repo, "-s", "01/01/2024", "-e", "12/31/2024"]
+        subprocess.run(cmd, cwd=tmp_path, env=env, capture_output=True, check=True)
+        path = tmp_path / "repos" / ".gitlogstats-cache.json"
+        (entry,) = json.loads(path.read_text()).values()
+        subprocess.run(cmd, cwd=tmp_path, env=env, capture_output=True, check=True)  # every result found in the cache
+        (used,) = json.loads(path.read_text()).values()
+        assert used["created"] == entry["created"] and used["used"] > entry["used"]
@@ -0,0 +1,85 @@
+"""
+Unit tests for finding the most churned files and directories in bounded memory.
+"""
+
+import random
+
+from gitlogstats.churn import Churn, TopK, parent_directories
+
+
+class TestTopK:
+    def test_exact_while_under_k(self):
+        top = TopK(3)
+        top.add("a.py", 5, 1)
+        top.add("b.py", 1, 0)
+        top.add("a.py", 2, 2)
+        assert top.top() == [("a.py", 2, 7, 3), ("b.py", 1, 1, 0)]
+
+    def test_least_churned_replaced(self):
+        top = TopK(2, counters=2)
+        top.add("a.py", 10, 0)
+        top.add("b.py", 1, 0)
+        top.add("c.py", 3, 0)
+        # c.py takes over b.py's count, so is ranked as if it had churned 1 + 3 lines
+        assert [path for path, commits, insertions, deletions in top.top()] == ["a.py", "c.py"]
+        assert len(top.counters) == 2
+
+    def test_heavy_hitters_found_in_bounded_memory(self):
+        rng = random.Random(3)
+        true = {}
+        top = TopK(5, counters=20)
+        hot = [f"hot{i}.py" for i in range(5)]
+        for i in range(20000):
+            path = rng.choice(hot) if rng.random() < 0.5 else f"cold{rng.randrange(5000)}.py"
+            lines = rng.randrange(1, 20)
+            true[path] = true.get(path, 0) + lines
+            top.add(path, lines, 0)
+        assert len(top.counters) == 20 and len(top.heap) <= 4 * 20 + 64
+        assert set(path for path, *counts in top.top()) == set(hot)
+        for path, commits, insertions, deletions in top.top():
+            assert insertions <= true[path]  # counted since the path was last added, so never too high
+
+    def test_more_paths_counted_than_listed(self):
+        top = TopK(2)
+        for i in range(15):
+            top.add(f"{i}.py", i, 0)
+        assert len(top.counters) == 15
+        assert top.top() == [("14.py", 1, 14, 0), ("13.py", 1, 13, 0)]
+
+    def test_spare_counts_keep_steady_paths(self):
+        # a path churned a little in every commit, among paths churned once each, is only found with spare counts
+        spare, tight = TopK(1), TopK(1, counters=1)
+        for i in range(5):
+            for top in [spare, tight]:
+                top.add("steady.py", 3, 0)
+                top.add(f"passing{i}.py", 5, 0)
+        assert spare.top() == [("steady.py", 5, 15, 0)]
+        assert tight.top()[0][0] == "passing4.py"
+
+    def test_zero_line_changes_counted(self):
+        top = TopK(2)
+        top.add("logo.png", 0, 0)
+        assert top.top() == [("logo.png", 1, 0, 0)]
+
+
+class TestChurn:
+    def test_directories_counted_once_per_commit(self):
+        churn = Churn(top=5)
+        churn.add("alice", [("src/a.py", 2, 0), ("src/b.py", 3, 1), ("README.md", 1, 0)])
+        churn.add("alice", [("src/lib/c.py", 4, 0)])
+        churn.add("bob", [("src/a.py", 1, 1)])
+        # paths churned as much are ranked by path
+        assert churn.items() == [
+            ("alice", "file", [("src/b.py", 1, 3, 1), ("src/lib/c.py", 1, 4, 0), ("src/a.py", 1, 2, 0), ("README.md", 1, 1, 0)]),
+            ("alice", "directory", [("src/", 2, 9, 1), ("src/lib/", 1, 4, 0)]),
+            ("bob", "file", [("src/a.py", 1, 1, 1)]),
+            ("bob", "directory", [("src/", 1, 1, 1)]),
+        ]
+
+
+class TestParentDirectories:
+    def test_outermost_first(self):
+        assert parent_directories("src/app/main.py") == ["src/", "src/app/"]
+
+    def test_root_file(self):
+        assert parent_directories("README.md") == []
@@ -0,0 +1,125 @@
+"""
+Unit tests for the column-oriented commit store, whose sums must be the same with and without numpy.
+"""
+
+import random
+
+import pytest
+
+from gitlogstats import columns
+from gitlogstats.columns import CommitColumns
+from gitlogstats.log_stream import Commit
+
+COMMITS = [
+    Commit("a" * 40, "alice", "alice@example.com", 3, 45, 12, 1000),
+    Commit("b" * 40, "bob", "bob@example.com", 1, 10, 2, 2000),
+    Commit("c" * 40, "alice", "alice@example.com", 2, 5, 0, 3000),
+    Commit("d" * 40, "alice", "alice@work.com", 1, 1, 1, 4000),
+]
+
+
+@pytest.fixture(params=["python", "numpy"])
+def summing(request, monkeypatch):
+    """Sum with numpy, if installed, and without it."""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(columns, "numpy", None)
+    return request.param
+
+
+class TestStorage:
+    def test_commits_read_back(self):
+        assert list(CommitColumns(COMMITS)) == COMMITS
+
+    def test_authors_stored_once(self):
+        store = CommitColumns(COMMITS)
+        assert store.authors == [("alice", "alice@example.com"), ("bob", "bob@example.com"), ("alice", "alice@work.com")]
+        assert list(store.author) == [0, 1, 0, 2]
+
+    def test_missing_fields_read_back(self):
+        commit = Commit("e" * 40, "carol", None, 0, 0, 0)
+        assert CommitColumns([commit])[0] == commit
+
+    def test_odd_hashes_read_back(self):
+        commits = [Commit("abc123", "bob", "b@x.org", 1, 1, 1, 5), Commit("f" * 64, "bob", "b@x.org", 1, 1, 1, 6)]
+        assert list(CommitColumns(commits)) == commits
+
+    def test_indexing(self):
+        store = CommitColumns(COMMITS)
+        assert store[-1] == COMMITS[-1] and len(store) == 4
+        with pytest.raises(IndexError):
+            store[4]
+
+
+class TestSums:
+    def test_totals_by_author(self, summing):
+        assert CommitColumns(COMMITS).totals_by_author() == {
+            ("alice", "alice@example.com"): (2, 5, 50, 12),
+            ("bob", "bob@example.com"): (1, 1, 10, 2),
+            ("alice", "alice@work.com"): (1, 1, 1, 1),
+        }
+
+    def test_date_range_inclusive(self, summing):
+        assert CommitColumns(COMMITS).totals(after=2000, before=3000) == (2, 3, 15, 2)
+
+    def test_authors_selected(self, summing):
+        store = CommitColumns(COMMITS)
+        alices = store.matching_authors(lambda name, email: name == "alice")
+        assert store.totals(authors=alices) == (3, 6, 51, 13)
+        assert [commit.sha[0] for commit in store.select(after=1500, authors=alices)] == ["c", "d"]
+
+    def test_totals_by_window(self, summing):
+        assert CommitColumns(COMMITS).totals_by_window([1500, 3500]) == {
+            (("alice", "alice@example.com"), 0): (1, 2, 5, 0),
+            (("bob", "bob@example.com"), 0): (1, 1, 10, 2),
+            (("alice", "alice@work.com"), 1): (1, 1, 1, 1),
+        }
+
+    def test_no_commits(self, summing):
+        store = CommitColumns()
+        assert store.totals() == (0, 0, 0, 0)
+        assert store.totals_by_author() == {}
+        assert list(store.select()) == []
+
+    def test_same_as_summing_each_commit(self, summing):
+        rng = random.Random(7)
+        commits = [
+            Commit(f"{i:040x}", rng.choice("abcde"), "x@y.z", rng.randrange(5), rng.randrange(100), rng.randrange(100), rng.randrange(10000))
+            for i in range(1000)
+        ]
+        expected = {}
+        for commit in commits:
+            if 2500 <= commit.timestamp <= 7500:
+                counts = expected.setdefault((commit.author, commit.email), [0, 0, 0, 0])
+                for j, count in enumerate([1, commit.files, commit.insertions, commit.deletions]):
+                    counts[j] += count
+        totals = CommitColumns(commits).totals_by_author(after=2500, before=7500)
+        assert {author: list(counts) for author, counts in totals.items()} == expected
+        assert list(totals) == list(expected)  # authors in the order of their first commit in the range
+
+
+class TestTimestampIndex:
+    def test_same_as_summing_the_columns(self, summing):
+        rng = random.Random(11)
+        commits = [
+            Commit(f"{i:040x}", rng.choice("abcde"), "x@y.z", rng.randrange(5), rng.randrange(100), rng.randrange(100), rng.randrange(10000))
+            for i in range(1000)
+        ]
+        store = CommitColumns(commits)
+        index = store.index()
+        for after, before in [(None, None), (2500, 7500), (0, 0), (9999, None), (None, 10)]:
+            assert index.totals_by_author(after, before) == store.totals_by_author(after, before)
+            authors = store.matching_authors(lambda name, email: name in "bd")
+            assert index.totals(after, before, authors) == store.totals(after, before, authors)
+
+    def test_equal_timestamps_at_range_edges(self, summing):
+        index = CommitColumns(COMMITS + [Commit("e" * 40, "bob", "bob@example.com", 1, 1, 1, 2000)]).index()
+        assert index.totals_by_author(after=2000, before=2000) == {("bob", "bob@example.com"): (2, 2, 11, 3)}
+
+    def test_authors_in_order_first_stored(self, summing):
+        index = CommitColumns(COMMITS).index()
+        assert list(index.totals_by_author(after=1500)) == [("alice", "alice@example.com"), ("bob", "bob@example.com"), ("alice", "alice@work.com")]
+
+    def test_no_commits(self, summing):
+        assert CommitColumns().index().totals() == (0, 0, 0, 0)
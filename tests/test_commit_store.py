@@ -0,0 +1,211 @@
+"""
+Unit tests for the per-repository commit store and incremental parsing.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+import gitlogstats
+from gitlogstats import GitLogsParser
+from gitlogstats.cache import ResultCache
+from gitlogstats.commit_store import CommitStore
+from gitlogstats.log_stream import Commit
+
+from conftest import git, make_git_repo
+
+COMMIT_A = Commit("a" * 40, "alice", "alice@example.com", 2, 10, 1, 1704902400)
+COMMIT_B = Commit("b" * 40, "bob", "bob@example.com", 1, 0, 3, 1706780000)
+
+
+# ─── CommitStore ─────────────────────────────────────────────────────────────
+
+class TestCommitStore:
+    def test_empty_when_file_missing(self, tmp_path):
+        store = CommitStore(str(tmp_path / "commits.jsonl"))
+        store.load()
+        assert list(store.commits) == [] and store.head is None
+
+    def test_appended_commits_persist(self, tmp_path):
+        path = str(tmp_path / "sub" / "commits.jsonl")
+        CommitStore(path).append([COMMIT_A], "head1", ["*.png"])
+        CommitStore(path).append([COMMIT_B], "head2", ["*.png"])
+        store = CommitStore(path)
+        store.load()
+        assert list(store.commits) == [COMMIT_A, COMMIT_B]
+        assert store.head == "head2"
+        assert store.exclusions == ["*.png"]
+
+    def test_commits_after_last_checkpoint_ignored(self, tmp_path):
+        path = tmp_path / "commits.jsonl"
+        CommitStore(str(path)).append([COMMIT_A], "head1", [])
+        with open(path, "a", encoding="utf8") as f:
+            f.write(json.dumps(list(COMMIT_B)) + "\n")
+            f.write('["cccc", "carol"')  # interrupted mid-line
+        store = CommitStore(str(path))
+        store.load()
+        assert list(store.commits) == [COMMIT_A]
+        assert store.head == "head1"
+
+    def test_reloaded_after_interrupted_append(self, tmp_path):
+        path = tmp_path / "commits.jsonl"
+        CommitStore(str(path)).append([COMMIT_A], "head1", [])
+        with open(path, "a", encoding="utf8") as f:
+            f.write(json.dumps(list(COMMIT_B)) + "\n")  # no checkpoint followed
+            f.write('["cccc", "carol"')  # and the last line was cut short
+        store = CommitStore(str(path))
+        store.append([COMMIT_B], "head2", [])
+        assert list(store.commits) == [COMMIT_A, COMMIT_B]
+        store = CommitStore(str(path))
+        store.load()
+        assert list(store.commits) == [COMMIT_A, COMMIT_B] and store.head == "head2"
+
+    def test_failed_read_not_stored(self, tmp_path):
+        path = str(tmp_path / "commits.jsonl")
+        store = CommitStore(path)
+        store.append([COMMIT_A], "head1", [])
+
+        def failing():
+            yield COMMIT_B
+            raise RuntimeError("git failed")
+
+        with pytest.raises(RuntimeError):
+            store.append(failing(), "head2", [])
+        store.load()
+        assert list(store.commits) == [COMMIT_A] and store.head == "head1"
+        store.append([COMMIT_B], "head2", [])
+        reloaded = CommitStore(path)
+        reloaded.load()
+        assert list(reloaded.commits) == [COMMIT_A, COMMIT_B]
+
+    def test_lock_held_against_other_processes(self, tmp_path):
+        path = str(tmp_path / "commits.jsonl")
+        script = (
+            "import sys; from gitlogstats.commit_store import CommitStore\n"
+            "with CommitStore(sys.argv[1]).locked(): print('locked')\n"
+        )
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(gitlogstats.__file__)))
+        with CommitStore(path).locked():
+            other = subprocess.Popen([sys.executable, "-c", script, path], env=env, stdout=subprocess.PIPE, text=True)
+            with pytest.raises(subprocess.TimeoutExpired):
+                other.wait(1)
+        assert other.communicate(timeout=30)[0] == "locked\n"
+
+    def test_changes_by_others_read_once_locked(self, tmp_path):
+        path = str(tmp_path / "commits.jsonl")
+        store = CommitStore(path)
+        store.append([COMMIT_A], "head1", [])
+        CommitStore(path).append([COMMIT_B], "head2", [])  # e.g. by another process
+        with store.locked():
+            store.load()
+            assert list(store.commits) == [COMMIT_A, COMMIT_B] and store.head == "head2"
+            store.append([], "head3", [])
+        reloaded = CommitStore(path)
+        reloaded.load()
+        assert list(reloaded.commits) == [COMMIT_A, COMMIT_B] and reloaded.head == "head3"
+
+    def test_clear_removes_file(self, tmp_path):
+        path = tmp_path / "commits.jsonl"
+        store = CommitStore(str(path))
+        store.append([COMMIT_A], "head1", [])
+        store.clear()
+        assert not path.exists()
+        assert list(store.commits) == [] and store.head is None
+
+    def test_authors_in_first_seen_order(self, tmp_path):
+        store = CommitStore(str(tmp_path / "commits.jsonl"))
+        store.append([COMMIT_B, COMMIT_A, COMMIT_B], "head1", [])
+        assert store.authors() == ["bob", "alice"]
+
+
+# ─── Incremental parsing ─────────────────────────────────────────────────────
+
+def make_parser(repo, store, **kwargs):
+    defaults = {"start": "01/01/2024", "end": "12/31/2024", "username": None, "clean": True}
+    defaults.update(kwargs)
+    return GitLogsParser(repo=repo, store=store, **defaults)
+
+
+def by_name(entries):
+    return sorted(entries, key=lambda entry: entry["username"])
+
+
+class TestParseFromStore:
+    def test_same_results_as_single_pass(self, git_repo, tmp_path):
+        for start, end, username, clean in [
+            ("01/01/2024", "12/31/2024", None, True),
+            ("02/01/2024", "03/01/2024", None, True),
+            ("01/01/2024", "12/31/2024", "bob", True),
+            ("03/01/2024", "03/31/2024", None, False),
+        ]:
+            kwargs = {"start": start, "end": end, "username": username, "clean": clean, "exclusions": ["*.png"]}
+            store = CommitStore(str(tmp_path / "commits.jsonl"))
+            expected = GitLogsParser(repo=git_repo, single_pass=True, **kwargs).parse()
+            assert by_name(make_parser(git_repo, store, **kwargs).parse()) == by_name(expected)
+
+    def test_results_cached_apart_from_git_matching(self, git_repo_factory, tmp_path):
+        # git's --author=al also matches alice's commits, but the store credits each commit to its exact author
+        repo = git_repo_factory("repo", [("al", "2024-01-10T12:00:00", {"a.txt": "1\n"}), ("alice", "2024-01-11T12:00:00", {"b.txt": "2\n"})])
+        cache = ResultCache(str(tmp_path / "cache.json"))
+        plain = GitLogsParser(repo=repo, start="01/01/2024", end="12/31/2024", username=None, clean=True, cache=cache).parse()
+        stored = make_parser(repo, CommitStore(str(tmp_path / "commits.jsonl")), cache=cache).parse()
+        assert {e["username"]: e["commits"] for e in plain} == {"al": 2, "alice": 1}
+        assert {e["username"]: e["commits"] for e in stored} == {"al": 1, "alice": 1}
+
+    def test_only_new_commits_read(self, git_repo_factory, tmp_path):
+        repo = git_repo_factory("repo", [("alice", "2024-01-10T12:00:00", {"a.txt": "1\n"})])
+        store = CommitStore(str(tmp_path / "commits.jsonl"))
+        make_parser(repo, store).parse()
+        old_head = store.head
+        make_git_repo(repo, [("bob", "2024-01-11T12:00:00", {"b.txt": "2\n3\n"})])
+
+        commands = []
+        git_lines = GitLogsParser.git_lines
+
+        def spy(parser, cmd):
+            commands.append(cmd)
+            return git_lines(parser, cmd)
+
+        with patch.object(GitLogsParser, "git_lines", spy):
+            results = make_parser(repo, CommitStore(store.path)).parse()
+        assert [e["username"] for e in by_name(results)] == ["alice", "bob"]
+        log_commands = [cmd for cmd in commands if cmd[1] == "log"]
+        assert len(log_commands) == 1
+        assert any(arg.startswith(f"{old_head}..") for arg in log_commands[0])
+
+    def test_unchanged_repository_reads_no_logs(self, git_repo, tmp_path):
+        store = CommitStore(str(tmp_path / "commits.jsonl"))
+        make_parser(git_repo, store).parse()
+        expected = GitLogsParser(
+            repo=git_repo, start="02/01/2024", end="12/31/2024", username=None, clean=True, single_pass=True
+        ).parse()
+        with patch("gitlogstats.git_logs_parser.iter_commits") as mock_iter:
+            results = make_parser(git_repo, CommitStore(store.path), start="02/01/2024").parse()
+        mock_iter.assert_not_called()
+        assert by_name(results) == by_name(expected)
+
+    def test_rewritten_history_rebuilds_store(self, git_repo, tmp_path):
+        store = CommitStore(str(tmp_path / "commits.jsonl"))
+        make_parser(git_repo, store).parse()
+        git(git_repo, "reset", "-q", "--hard", "HEAD~2")
+        make_git_repo(git_repo, [("dave", "2024-07-01T12:00:00", {"d.txt": "d\n"})])
+        results = make_parser(git_repo, CommitStore(store.path)).parse()
+        expected = GitLogsParser(
+            repo=git_repo, start="01/01/2024", end="12/31/2024", username=None, clean=True, single_pass=True
+        ).parse()
+        assert by_name(results) == by_name(expected)
+        assert "carol" not in [e["username"] for e in results]
+
+    def test_changed_exclusions_rebuild_store(self, git_repo, tmp_path):
+        store = CommitStore(str(tmp_path / "commits.jsonl"))
+        make_parser(git_repo, store).parse()
+        results = make_parser(git_repo, CommitStore(store.path), exclusions=["*.py"]).parse()
+        expected = GitLogsParser(
+            repo=git_repo, start="01/01/2024", end="12/31/2024", username=None, clean=True,
+            single_pass=True, exclusions=["*.py"],
+        ).parse()
+        assert by_name(results) == by_name(expected)
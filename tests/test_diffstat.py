@@ -0,0 +1,109 @@
+"""
+Unit tests for counting changed lines and scoring renames without running git, checked against git diff itself.
+"""
+
+import random
+import subprocess
+
+import pytest
+
+from gitlogstats.diffstat import MAX_SCORE, MINIMUM_SCORE, count_changes, is_binary, similarity
+
+
+def git_numstat(tmp_path, old, new):
+    """The lines git diff counts as inserted and deleted between *old* and *new*."""
+    (tmp_path / "old").write_bytes(old)
+    (tmp_path / "new").write_bytes(new)
+    p = subprocess.run(
+        ["git", "diff", "--no-index", "--numstat", "old", "new"],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+    )
+    insertions, deletions, _ = p.stdout.split("\t", 2)
+    return int(insertions), int(deletions)
+
+
+class TestCountChanges:
+    @pytest.mark.parametrize(
+        "old, new, expected",
+        [
+            (b"a\nb\nc\n", b"a\nb\nc\nd\n", (1, 0)),
+            (b"a\nb\nc\n", b"a\nc\n", (0, 1)),
+            (b"a\nb\nc\n", b"a\nB\nc\n", (1, 1)),
+            (b"a\nb", b"a\nb\n", (1, 1)),  # adding the missing line break changes the last line
+            (b"", b"a\nb\n", (2, 0)),
+            (b"a\nb\n", b"", (0, 2)),
+        ],
+    )
+    def test_cases(self, old, new, expected):
+        assert count_changes(old, new) == expected
+
+    def test_same_as_git(self, tmp_path):
+        rng = random.Random(7)
+        words = [b"alpha\n", b"beta\n", b"gamma\n", b"delta\n", b"}\n", b"\n"]
+        for _ in range(30):
+            old = b"".join(rng.choice(words) for _ in range(rng.randrange(40)))
+            new = bytearray()
+            for line in old.splitlines(keepends=True):
+                roll = rng.random()
+                if roll < 0.2:
+                    continue
+                new += rng.choice(words) if roll < 0.4 else line
+            if old == bytes(new):
+                continue
+            assert count_changes(old, bytes(new)) == git_numstat(tmp_path, old, bytes(new))
+
+    def test_common_line_among_changed_lines_not_matched(self, tmp_path):
+        # the blank line the new file has is matched by many of the old one's, and is among lines without any match, so git leaves it out of the diff, and the edit is not the shortest
+        old, new = b"\n\n\n\n", b"a\na\n\nc\nc\n}\na\n}\n"
+        assert count_changes(old, new) == git_numstat(tmp_path, old, new) == (8, 4)
+
+    @pytest.mark.parametrize("lines", [200, 2000])
+    def test_large_rewrites_same_as_git(self, tmp_path, lines):
+        # big enough that git gives up on the shortest edit, and with many blank lines and braces, which are left out of the diff
+        rng = random.Random(lines)
+        common = [b"\n", b"}\n", b"{\n", b"    return x;\n", b"end\n"]
+
+        def some_lines(count):
+            return [rng.choice(common) if rng.random() < 0.5 else b"line %d\n" % rng.randrange(lines) for _ in range(count)]
+
+        for _ in range(10):
+            old = some_lines(lines)
+            new = list(old)
+            for _ in range(rng.randrange(lines // 3)):
+                i = rng.randrange(len(new) + 1)
+                new[i : i + rng.randrange(20)] = some_lines(rng.randrange(20))
+            old, new = b"".join(old), b"".join(new)
+            if old != new:
+                assert count_changes(old, new) == git_numstat(tmp_path, old, new)
+
+
+class TestIsBinary:
+    def test_nul_near_the_start(self):
+        assert is_binary(b"\x89PNG\r\n\x1a\n\x00\x00")
+
+    def test_nul_after_the_first_few_bytes(self):
+        assert not is_binary(b"x" * 8000 + b"\x00")
+
+    def test_text(self):
+        assert not is_binary("naïve text\n".encode("utf-8"))
+
+
+class TestSimilarity:
+    def test_identical(self):
+        data = b"".join(b"line %d\n" % i for i in range(50))
+        assert similarity(data, data) == MAX_SCORE
+
+    def test_small_edit_is_a_rename(self):
+        old = b"".join(b"line %d\n" % i for i in range(50))
+        new = old.replace(b"line 7\n", b"line seven\n")
+        assert similarity(old, new) >= MINIMUM_SCORE
+
+    def test_unrelated_files_are_not(self):
+        old = b"".join(b"line %d\n" % i for i in range(50))
+        new = b"".join(b"other %d\n" % i for i in range(50))
+        assert similarity(old, new) < MINIMUM_SCORE
+
+    def test_very_different_sizes_are_not_compared(self):
+        assert similarity(b"a\n" * 100, b"a\n" * 10) == 0
@@ -0,0 +1,61 @@
+"""
+Unit tests for matching paths against exclusions, checked against the pathspecs git is given for them.
+"""
+
+import os
+
+import pytest
+
+from gitlogstats.exclusions import ExclusionMatcher
+
+from conftest import git, make_git_repo
+
+PATHS = [
+    "foo.csv",
+    "data/foo.csv",
+    "data/deep/bar.csv",
+    "image.jpg",
+    "img/photo.JPG",
+    "docs/readme.md",
+    "docs/guide/intro.md",
+    "a[1].txt",
+    "vendor/lib/x.js",
+    "x1.py",
+    "xy.py",
+]
+
+
+@pytest.mark.parametrize(
+    "exclusions, path, excluded",
+    [
+        (["foo.csv"], "foo.csv", True),
+        (["foo.csv"], "data/foo.csv", True),
+        (["*.csv"], "data/deep/bar.csv", True),
+        (["*.jpg"], "img/photo.JPG", False),
+        (["docs/*.md"], "docs/guide/intro.md", False),
+        (["vendor"], "vendor/lib/x.js", False),  # a directory alone does not exclude the files in it
+        (["vendor/**"], "vendor/lib/x.js", True),
+        (["x[0-9].py"], "x1.py", True),
+        (["x[!0-9].py"], "xy.py", True),
+        (["x[!0-9].py"], "x1.py", False),
+        (["x?.py"], "x1.py", True),
+    ],
+)
+def test_matches(exclusions, path, excluded):
+    assert ExclusionMatcher(exclusions)(path) is excluded
+
+
+def test_nothing_excluded():
+    assert not ExclusionMatcher([])("foo.csv")
+
+
+@pytest.mark.parametrize("exclusions", [["*.csv"], ["docs/*.md", "*.jpg"], ["x[0-9].py"], ["a[1].txt"], ["**/deep/*"], ["vendor/**"]])
+def test_same_as_git(tmp_path, exclusions):
+    repo = str(tmp_path / "repo")
+    for path in PATHS:
+        os.makedirs(os.path.join(repo, os.path.dirname(path)), exist_ok=True)
+    make_git_repo(repo, [("alice", "2024-01-01T12:00:00", {p: "x\n" for p in PATHS})])
+    pathspecs = ["."] + [f":(exclude,glob)**/{x}" for x in exclusions]
+    included = set(git(repo, "ls-files", "--", *pathspecs).split())
+    matcher = ExclusionMatcher(exclusions)
+    assert {p for p in PATHS if not matcher(p)} == included
@@ -3,11 +3,21 @@ Unit tests for GitLogsParser.
 """
 
 import json
+import os
+import subprocess
+import sys
+import threading
 from unittest.mock import MagicMock, mock_open, patch
 
 import pytest
 
 from gitlogstats import GitLogsParser
+from gitlogstats.aliases import Aliases
+from gitlogstats.cache import ResultCache
+from gitlogstats.commit_store import CommitStore
+from gitlogstats.log_stream import iter_commits
+
+from conftest import commit, git, write
 
 # ─── Shared test data ────────────────────────────────────────────────────────
 
@@ -66,11 +76,24 @@ GIT_LOG_INSERTIONS_ONLY = (
 
 GIT_LOG_EMPTY = ""
 
+# git log --shortstat output in single-pass format: alice 2 commits, bob 1 commit
+GIT_LOG_SINGLE_PASS = (
+    "commit abc123def456\t1705320000\talice@example.com\talice\n"
+    "\n"
+    " 3 files changed, 45 insertions(+), 12 deletions(-)\n"
+    "commit bcd234efa567\t1705406400\tbob@example.com\tbob\n"
+    "\n"
+    " 1 file changed, 7 deletions(-)\n"
+    "commit def456abc789\t1705492800\talice@example.com\talice\n"
+    "\n"
+    " 1 file changed, 10 insertions(+), 2 deletions(-)\n"
+)
+
 
 # ─── Helpers ─────────────────────────────────────────────────────────────────
 
 def make_parser(**kwargs):
-    """Return a GitLogsParser with os.chdir patched out."""
+    """Return a GitLogsParser for a fake repository."""
     defaults = {
         "repo": "/fake/repo",
         "start": "01/01/2024",
@@ -79,24 +102,36 @@ def make_parser(**kwargs):
         "exclusions": [],
     }
     defaults.update(kwargs)
-    with patch("os.chdir"):
-        return GitLogsParser(**defaults)
+    return GitLogsParser(**defaults)
 
 
-def popen_mock(lines):
-    """Return a patched subprocess.Popen class that yields *lines* from stdout."""
+def popen_instance(lines):
+    """Return a mock running subprocess that yields *lines* from stdout and exits cleanly."""
     instance = MagicMock()
     instance.stdout = iter(lines)
+    instance.wait.return_value = 0
+    instance.returncode = 0
     instance.__enter__ = MagicMock(return_value=instance)
     instance.__exit__ = MagicMock(return_value=False)
-    return MagicMock(return_value=instance)
+    return instance
+
+
+def popen_mock(lines):
+    """Return a patched subprocess.Popen class that yields *lines* from stdout."""
+    return MagicMock(return_value=popen_instance(lines))
+
 
+def git_mock(log, contributors=()):
+    """
+    Return a patched subprocess.Popen class that outputs *contributors* when
+    asked for the contributor list, and the *log* text for every git log walk.
+    """
+    def fake_popen(cmd, *args, **kwargs):
+        if cmd[1] == "shortlog" or "--format='%aN'" in cmd:
+            return popen_instance(list(contributors))
+        return popen_instance(log.splitlines(keepends=True))
 
-def run_mock(stdout_text):
-    """Return a mock subprocess.run result with UTF-8-encoded *stdout_text*."""
-    result = MagicMock()
-    result.stdout = stdout_text.encode("utf-8")
-    return result
+    return MagicMock(side_effect=fake_popen)
 
 
 # ─── repo_name_from_url ──────────────────────────────────────────────────────
@@ -149,16 +184,17 @@ class TestConstructor:
         assert p.verbose is True
         assert p.clean is True
 
-    def test_chdir_called_with_repo_path(self):
+    def test_working_directory_not_changed(self):
         with patch("os.chdir") as mock_chdir:
             GitLogsParser(repo="/some/path", start="01/01/2024", end="12/31/2024", username=None)
-        mock_chdir.assert_called_once_with("/some/path")
-
-    def test_chdir_not_called_when_repo_is_none(self):
-        with patch("os.chdir") as mock_chdir:
-            GitLogsParser(repo=None, start="01/01/2024", end="12/31/2024", username=None)
         mock_chdir.assert_not_called()
 
+    def test_git_run_in_repo_directory(self):
+        p = make_parser(repo="/some/path", username="alice")
+        with patch("subprocess.Popen", git_mock(GIT_LOG_EMPTY)) as mock_popen:
+            p.parse()
+        assert mock_popen.call_args[1]["cwd"] == "/some/path"
+
     def test_default_values(self):
         with patch("os.chdir"):
             p = GitLogsParser(repo="/p", start="01/01/2024", end="12/31/2024", username=None)
@@ -331,49 +367,138 @@ class TestGetContributors:
             assert isinstance(p.get_contributors(), list)
 
 
+class TestGetContributorsDateRange:
+    def test_shortlog_limited_to_date_range_and_files(self):
+        p = make_parser(start="03/01/2024", end="03/31/2024", exclusions=["*.jpg"])
+        with patch("subprocess.Popen", popen_mock([])) as mock_popen:
+            p.get_contributors()
+        cmd = mock_popen.call_args[0][0]
+        assert cmd[:4] == ["git", "shortlog", "-s", "-n"]
+        assert "--after=2024-02-29 00:00:00" in cmd
+        assert "--before=2024-04-01 00:00:00" in cmd
+        assert cmd[-4:] == ["HEAD", "--", ".", ":(exclude,glob)**/*.jpg"]
+
+    def test_commit_counts_removed_in_order(self):
+        p = make_parser()
+        with patch("subprocess.Popen", popen_mock(["    12\tAlice\n", "     3\tBob Smith\n"])):
+            assert p.get_contributors() == ["Alice", "Bob Smith"]
+
+    def test_all_time_lists_every_author(self):
+        p = make_parser()
+        with patch("subprocess.Popen", popen_mock(["Alice\n"])) as mock_popen:
+            p.get_contributors(all_time=True)
+        assert mock_popen.call_args[0][0] == ["git", "log", "--format='%aN'"]
+
+    def test_only_contributors_in_range_walked(self, git_repo):
+        p = GitLogsParser(repo=git_repo, start="02/01/2024", end="02/29/2024", username=None, clean=True)
+        commands = []
+        git_lines = GitLogsParser.git_lines
+
+        def spy(parser, cmd):
+            commands.append(cmd)
+            return git_lines(parser, cmd)
+
+        with patch.object(GitLogsParser, "git_lines", spy):
+            results = p.parse()
+        assert sorted(e["username"] for e in results) == ["alice", "bob"]
+        assert len([cmd for cmd in commands if cmd[:2] == ["git", "log"]]) == 2
+
+    def test_contributors_out_of_range_kept_without_walk_when_not_clean(self, git_repo):
+        p = GitLogsParser(repo=git_repo, start="06/01/2024", end="06/30/2024", username=None, clean=False)
+        with patch("gitlogstats.git_logs_parser.iter_commits", wraps=iter_commits) as mock_iter:
+            results = {e["username"]: e for e in p.parse()}
+        assert set(results) == {"alice", "bob", "carol"}
+        assert results["bob"]["commits"] == 1
+        assert results["alice"]["commits"] == 0 and results["carol"]["commits"] == 0
+        assert mock_iter.call_count == 1
+
+
+# ─── git_lines ───────────────────────────────────────────────────────────────
+
+class TestGitLines:
+    def test_yields_output_lines(self):
+        p = make_parser()
+        with patch("subprocess.Popen", popen_mock(["a\n", "b\n"])):
+            assert list(p.git_lines(["git", "log"])) == ["a\n", "b\n"]
+
+    def test_failed_command_raises(self):
+        p = make_parser()
+        mock = popen_mock(["a\n"])
+        mock.return_value.wait.return_value = 128
+        mock.return_value.returncode = 128
+        with patch("subprocess.Popen", mock):
+            with pytest.raises(subprocess.CalledProcessError):
+                list(p.git_lines(["git", "log"]))
+
+    def test_process_killed_when_reading_stops_early(self):
+        p = make_parser()
+        mock = popen_mock(["a\n", "b\n"])
+        with patch("subprocess.Popen", mock):
+            lines = p.git_lines(["git", "log"])
+            next(lines)
+            lines.close()
+        mock.return_value.kill.assert_called_once()
+
+    def test_lots_of_errors_do_not_block_the_output(self, git_repo):
+        # more than a pipe holds is written to stderr before anything to stdout
+        p = make_parser(repo=git_repo)
+        cmd = [sys.executable, "-c", "import sys; sys.stderr.write('warning\\n' * 100000); sys.stderr.flush(); print('done')"]
+        lines = []
+        reader = threading.Thread(target=lambda: lines.extend(p.git_lines(cmd)), daemon=True)
+        reader.start()
+        reader.join(30)
+        assert lines == ["done\n"]
+
+    def test_errors_of_failed_command_kept(self, git_repo):
+        p = make_parser(repo=git_repo)
+        with pytest.raises(subprocess.CalledProcessError) as e:
+            list(p.git_lines(["git", "log", "no-such-branch"]))
+        assert "no-such-branch" in e.value.stderr
+
+
 # ─── parse ───────────────────────────────────────────────────────────────────
 
 class TestParse:
     def test_commits_counted(self):
         p = make_parser(username="alice")
-        with patch("subprocess.run", return_value=run_mock(GIT_LOG_TWO_COMMITS)):
+        with patch("subprocess.Popen", git_mock(GIT_LOG_TWO_COMMITS)):
             assert p.parse()[0]["commits"] == 2
 
     def test_insertions_summed(self):
         p = make_parser(username="alice")
-        with patch("subprocess.run", return_value=run_mock(GIT_LOG_TWO_COMMITS)):
+        with patch("subprocess.Popen", git_mock(GIT_LOG_TWO_COMMITS)):
             assert p.parse()[0]["insertions"] == 55  # 45 + 10
 
     def test_deletions_summed(self):
         p = make_parser(username="alice")
-        with patch("subprocess.run", return_value=run_mock(GIT_LOG_TWO_COMMITS)):
+        with patch("subprocess.Popen", git_mock(GIT_LOG_TWO_COMMITS)):
             assert p.parse()[0]["deletions"] == 14  # 12 + 2
 
     def test_files_summed(self):
         p = make_parser(username="alice")
-        with patch("subprocess.run", return_value=run_mock(GIT_LOG_TWO_COMMITS)):
+        with patch("subprocess.Popen", git_mock(GIT_LOG_TWO_COMMITS)):
             assert p.parse()[0]["files"] == 4  # 3 + 1
 
     def test_username_in_result(self):
         p = make_parser(username="alice")
-        with patch("subprocess.run", return_value=run_mock(GIT_LOG_TWO_COMMITS)):
+        with patch("subprocess.Popen", git_mock(GIT_LOG_TWO_COMMITS)):
             assert p.parse()[0]["username"] == "alice"
 
     def test_repository_name_extracted_from_url(self):
         p = make_parser(username="alice", repo="https://github.com/user/myrepo.git")
-        with patch("subprocess.run", return_value=run_mock(GIT_LOG_TWO_COMMITS)):
+        with patch("subprocess.Popen", git_mock(GIT_LOG_TWO_COMMITS)):
             assert p.parse()[0]["repository"] == "myrepo"
 
     def test_dates_preserved_in_result(self):
         p = make_parser(username="alice", start="03/01/2024", end="03/31/2024")
-        with patch("subprocess.run", return_value=run_mock(GIT_LOG_TWO_COMMITS)):
+        with patch("subprocess.Popen", git_mock(GIT_LOG_TWO_COMMITS)):
             entry = p.parse()[0]
         assert entry["start_date"] == "03/01/2024"
         assert entry["end_date"] == "03/31/2024"
 
     def test_empty_log_produces_zero_stats(self):
         p = make_parser(username="alice")
-        with patch("subprocess.run", return_value=run_mock(GIT_LOG_EMPTY)):
+        with patch("subprocess.Popen", git_mock(GIT_LOG_EMPTY)):
             entry = p.parse()[0]
         assert entry["commits"] == 0
         assert entry["insertions"] == 0
@@ -382,7 +507,7 @@ class TestParse:
 
     def test_insertions_only_no_deletions(self):
         p = make_parser(username="alice")
-        with patch("subprocess.run", return_value=run_mock(GIT_LOG_INSERTIONS_ONLY)):
+        with patch("subprocess.Popen", git_mock(GIT_LOG_INSERTIONS_ONLY)):
             entry = p.parse()[0]
         assert entry["insertions"] == 100
         assert entry["deletions"] == 0
@@ -390,24 +515,23 @@ class TestParse:
 
     def test_clean_true_removes_zero_activity_contributor(self):
         p = make_parser(username="alice", clean=True)
-        with patch("subprocess.run", return_value=run_mock(GIT_LOG_EMPTY)):
+        with patch("subprocess.Popen", git_mock(GIT_LOG_EMPTY)):
             assert p.parse() == []
 
     def test_clean_false_keeps_zero_activity_contributor(self):
         p = make_parser(username="alice", clean=False)
-        with patch("subprocess.run", return_value=run_mock(GIT_LOG_EMPTY)):
+        with patch("subprocess.Popen", git_mock(GIT_LOG_EMPTY)):
             assert len(p.parse()) == 1
 
     def test_all_contributors_used_when_no_username(self):
         p = make_parser(username=None)
-        with patch("subprocess.Popen", popen_mock(["alice\n", "bob\n"])), \
-             patch("subprocess.run", return_value=run_mock(GIT_LOG_TWO_COMMITS)):
+        with patch("subprocess.Popen", git_mock(GIT_LOG_TWO_COMMITS, ["alice\n", "bob\n"])):
             results = p.parse()
         assert len(results) == 2
 
     def test_result_contains_expected_keys(self):
         p = make_parser(username="alice")
-        with patch("subprocess.run", return_value=run_mock(GIT_LOG_TWO_COMMITS)):
+        with patch("subprocess.Popen", git_mock(GIT_LOG_TWO_COMMITS)):
             entry = p.parse()[0]
         expected_keys = {"username", "repository", "start_date", "end_date",
                          "commits", "insertions", "deletions", "files"}
@@ -424,7 +548,7 @@ class TestParse:
             " 2 files changed, 20 insertions(+), 5 deletions(-)\n"
         )
         p = make_parser(username="alice")
-        with patch("subprocess.run", return_value=run_mock(log)):
+        with patch("subprocess.Popen", git_mock(log)):
             entry = p.parse()[0]
         assert entry["commits"] == 1
         assert entry["insertions"] == 20
@@ -432,6 +556,557 @@ class TestParse:
         assert entry["files"] == 2
 
 
+# ─── parse – single pass ─────────────────────────────────────────────────────
+
+class TestParseSinglePass:
+    def test_stats_summed_per_author(self):
+        p = make_parser(single_pass=True, clean=True)
+        with patch("subprocess.Popen", git_mock(GIT_LOG_SINGLE_PASS)):
+            results = {entry["username"]: entry for entry in p.parse()}
+        assert results["alice"]["commits"] == 2
+        assert results["alice"]["files"] == 4
+        assert results["alice"]["insertions"] == 55
+        assert results["alice"]["deletions"] == 14
+        assert results["bob"]["commits"] == 1
+        assert results["bob"]["insertions"] == 0
+        assert results["bob"]["deletions"] == 7
+
+    def test_git_log_run_only_once(self):
+        p = make_parser(single_pass=True, clean=True)
+        with patch("subprocess.Popen", git_mock(GIT_LOG_SINGLE_PASS)) as mock_popen:
+            p.parse()
+        assert mock_popen.call_count == 1
+
+    def test_exclusions_passed_as_pathspecs(self):
+        p = make_parser(single_pass=True, exclusions=["*.jpg"])
+        with patch("subprocess.Popen", git_mock(GIT_LOG_EMPTY)) as mock_popen:
+            p.parse()
+        cmd = mock_popen.call_args[0][0]
+        assert cmd[-3:] == ["--", ".", ":(exclude,glob)**/*.jpg"]
+
+    def test_username_attributed_all_matching_commits(self):
+        p = make_parser(single_pass=True, username="alice")
+        with patch("subprocess.Popen", git_mock(GIT_LOG_SINGLE_PASS)) as mock_popen:
+            results = p.parse()
+        assert "--author=alice" in mock_popen.call_args[0][0]
+        assert len(results) == 1
+        assert results[0]["username"] == "alice"
+        assert results[0]["commits"] == 3
+
+    def test_same_entries_as_per_contributor_parse(self):
+        p = make_parser(username="alice")
+        with patch("subprocess.Popen", git_mock(GIT_LOG_TWO_COMMITS)):
+            expected = p.parse()
+        log = (
+            "commit abc123def456\t1705320000\talice@example.com\talice\n"
+            "\n"
+            " 3 files changed, 45 insertions(+), 12 deletions(-)\n"
+            "commit def456abc789\t1705492800\talice@example.com\talice\n"
+            "\n"
+            " 1 file changed, 10 insertions(+), 2 deletions(-)\n"
+        )
+        p = make_parser(single_pass=True, clean=True)
+        with patch("subprocess.Popen", git_mock(log)):
+            results = p.parse()
+        assert results == expected
+
+    def test_clean_false_keeps_zero_activity_contributors(self):
+        p = make_parser(single_pass=True, clean=False)
+        with patch("subprocess.Popen", git_mock(GIT_LOG_SINGLE_PASS, ["alice\n", "bob\n", "carol\n"])):
+            results = {entry["username"]: entry for entry in p.parse()}
+        assert set(results) == {"alice", "bob", "carol"}
+        assert results["carol"]["commits"] == 0
+
+    def test_clean_true_skips_contributor_discovery(self):
+        p = make_parser(single_pass=True, clean=True)
+        with patch("subprocess.Popen", git_mock(GIT_LOG_EMPTY, ["alice\n"])) as mock_popen:
+            assert p.parse() == []
+        assert mock_popen.call_count == 1  # just the git log walk
+
+
+# ─── iter_parse / iter_commits ───────────────────────────────────────────────
+
+class TestIterParse:
+    def test_entry_yielded_before_next_contributor_walked(self, git_repo):
+        p = GitLogsParser(repo=git_repo, start="01/01/2024", end="12/31/2024", username=None, clean=True)
+        commands = []
+        git_lines = GitLogsParser.git_lines
+
+        def spy(parser, cmd):
+            commands.append(cmd)
+            return git_lines(parser, cmd)
+
+        with patch.object(GitLogsParser, "git_lines", spy):
+            entries = p.iter_parse()
+            first = next(entries)
+            walks = [cmd for cmd in commands if cmd[:2] == ["git", "log"]]
+            entries.close()
+        assert first["username"] == "alice" and first["commits"] == 2
+        assert len(walks) == 1
+
+    def test_same_entries_as_parse(self, git_repo):
+        for single_pass in [False, True]:
+            p = GitLogsParser(
+                repo=git_repo, start="01/01/2024", end="12/31/2024", username=None, clean=False, single_pass=single_pass
+            )
+            assert list(p.iter_parse()) == p.parse()
+
+    def test_partial_results_not_cached(self, git_repo, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache.json"))
+        p = GitLogsParser(repo=git_repo, start="01/01/2024", end="12/31/2024", username=None, clean=True, cache=cache)
+        entries = p.iter_parse()
+        next(entries)
+        entries.close()
+        assert cache.get(p.cache_key()) is None
+        results = p.parse()
+        assert cache.get(p.cache_key()) == results
+
+
+class TestIterCommits:
+    def test_commits_in_date_range(self, git_repo):
+        p = GitLogsParser(repo=git_repo, start="02/01/2024", end="03/31/2024", username=None, exclusions=["*.png"])
+        commits = list(p.iter_commits())
+        assert [commit.author for commit in commits] == ["carol", "alice", "bob"]
+        assert commits[1].files == 1 and commits[1].insertions == 3
+        assert all(len(commit.sha) == 40 for commit in commits)
+
+    def test_username_filter(self, git_repo):
+        p = GitLogsParser(repo=git_repo, start="01/01/2024", end="12/31/2024", username="bob")
+        assert [commit.author for commit in p.iter_commits()] == ["bob", "bob"]
+
+    def test_same_commits_from_store(self, git_repo, tmp_path):
+        kwargs = {"repo": git_repo, "start": "02/01/2024", "end": "12/31/2024", "username": None}
+        expected = list(GitLogsParser(**kwargs).iter_commits())
+        store = CommitStore(str(tmp_path / "commits.jsonl"))
+        assert list(GitLogsParser(store=store, **kwargs).iter_commits()) == expected
+
+
+
+# ─── exclusions matched in python ────────────────────────────────────────────
+
+def assert_same_matching(repo, exclusions, start="01/01/2024", end="12/31/2024"):
+    """Check that matching the exclusions in python gives the same results as git's exclude pathspecs."""
+    for username in [None, "bob"]:
+        kwargs = {"repo": repo, "start": start, "end": end, "username": username, "exclusions": exclusions}
+        for single_pass in [False, True]:
+            expected = GitLogsParser(clean=False, single_pass=single_pass, **kwargs).parse()
+            assert GitLogsParser(clean=False, single_pass=single_pass, match_exclusions="python", **kwargs).parse() == expected
+        git_parser = GitLogsParser(**kwargs)
+        python_parser = GitLogsParser(match_exclusions="python", **kwargs)
+        assert sorted(python_parser.iter_commits()) == sorted(git_parser.iter_commits())
+        assert python_parser.get_contributors() == git_parser.get_contributors()
+
+
+class TestMatchExclusionsInPython:
+    def test_same_as_git(self, git_repo):
+        for exclusions in [[], ["*.png", "*.json"], ["lib.py"], ["*.py"]]:
+            assert_same_matching(git_repo, exclusions)
+
+    def test_merges_and_renames_same_as_git(self, branchy_repo):
+        for exclusions in [["*.png", "*.json"], ["**/docs/*.md"], ["src.py"], ["*.md", "lib.py"]]:
+            assert_same_matching(branchy_repo, exclusions)
+
+    def test_rename_from_excluded_file_recounted_by_git(self, git_repo):
+        git(git_repo, "mv", "data.json", "data.txt")
+        commit(git_repo, "dave", "2024-07-01T10:00:00")
+        parser = GitLogsParser(repo=git_repo, start="07/01/2024", end="07/31/2024", username=None, exclusions=["*.json"], match_exclusions="python")
+        with patch.object(parser, "recount", wraps=parser.recount) as recount:
+            commits = list(parser.iter_commits())
+        assert recount.call_count == 1
+        assert [(c.author, c.files, c.insertions) for c in commits] == [("dave", 1, 1)]
+        assert_same_matching(git_repo, ["*.json"], start="07/01/2024", end="07/31/2024")
+
+    def test_merge_of_excluded_files_only_left_out(self, git_repo):
+        git(git_repo, "checkout", "-q", "-b", "data")
+        write(git_repo, "data.json", "[1]\n")
+        commit(git_repo, "dave", "2024-07-01T10:00:00")
+        git(git_repo, "checkout", "-q", "main")
+        write(git_repo, "app.py", "a = 2\n")
+        commit(git_repo, "erin", "2024-07-02T10:00:00")
+        env = dict(os.environ, GIT_AUTHOR_DATE="2024-07-03T10:00:00", GIT_COMMITTER_DATE="2024-07-03T10:00:00")
+        git(git_repo, "-c", "user.name=frank", "-c", "user.email=frank@example.com", "merge", "-q", "--no-ff", "-m", "merge", "data", env=env)
+        for exclusions in [[], ["*.json"]]:
+            assert_same_matching(git_repo, exclusions, start="07/01/2024", end="07/31/2024")
+
+    def test_branch_merged_without_its_changes_not_walked(self, git_repo):
+        # the merge is the same as main in every file, so git follows main alone, never walking dave's commit, and leaves the merge out too
+        git(git_repo, "checkout", "-q", "-b", "topic")
+        write(git_repo, "app.py", "a = 2\n")
+        commit(git_repo, "dave", "2024-07-01T10:00:00")
+        git(git_repo, "checkout", "-q", "main")
+        env = dict(os.environ, GIT_AUTHOR_DATE="2024-07-02T10:00:00", GIT_COMMITTER_DATE="2024-07-02T10:00:00")
+        git(git_repo, "-c", "user.name=frank", "-c", "user.email=frank@example.com", "merge", "-q", "--no-ff", "-s", "ours", "-m", "merge", "topic", env=env)
+        parser = GitLogsParser(repo=git_repo, start="07/01/2024", end="07/31/2024", username=None, clean=True, match_exclusions="python")
+        assert parser.parse() == []
+        assert_same_matching(git_repo, [], start="07/01/2024", end="07/31/2024")
+
+    def test_branch_merged_with_only_excluded_changes_not_walked(self, git_repo):
+        # dave's change to app.py is undone on the topic branch, so the merge only brings in data.json
+        git(git_repo, "checkout", "-q", "-b", "topic")
+        write(git_repo, "app.py", "a = 2\n")
+        commit(git_repo, "dave", "2024-07-01T10:00:00")
+        write(git_repo, "app.py", "a = 1\nb = 3\nc = 4\n")
+        write(git_repo, "data.json", "[1]\n")
+        commit(git_repo, "dave", "2024-07-02T10:00:00")
+        git(git_repo, "checkout", "-q", "main")
+        write(git_repo, "README.md", "hi\n")
+        commit(git_repo, "erin", "2024-07-03T10:00:00")
+        env = dict(os.environ, GIT_AUTHOR_DATE="2024-08-01T10:00:00", GIT_COMMITTER_DATE="2024-08-01T10:00:00")
+        git(git_repo, "-c", "user.name=frank", "-c", "user.email=frank@example.com", "merge", "-q", "--no-ff", "-m", "merge", "topic", env=env)
+        for exclusions in [[], ["*.json"]]:
+            # the merge, made after the end date, still decides which commits before it git walks
+            for end in ["07/31/2024", "12/31/2024"]:
+                assert_same_matching(git_repo, exclusions, start="07/01/2024", end=end)
+        parser = GitLogsParser(repo=git_repo, start="07/01/2024", end="07/31/2024", username=None, exclusions=["*.json"], match_exclusions="python")
+        assert parser.get_contributors() == ["erin"]
+
+    def test_results_cached_apart_from_git_matching(self, git_repo, tmp_path):
+        cache = ResultCache(str(tmp_path / "cache.json"))
+        kwargs = {"repo": git_repo, "start": "01/01/2024", "end": "12/31/2024", "username": None, "cache": cache}
+        GitLogsParser(**kwargs).parse()
+        parser = GitLogsParser(match_exclusions="python", **kwargs)
+        assert parser.cache_key() != GitLogsParser(**kwargs).cache_key()
+        with patch.object(parser, "matched_commits", wraps=parser.matched_commits) as walked:
+            parser.parse()
+        assert walked.called
+
+    def test_one_walk_for_every_contributor(self, git_repo):
+        parser = GitLogsParser(repo=git_repo, start="01/01/2024", end="12/31/2024", username=None, clean=True, exclusions=["*.png"], match_exclusions="python")
+        with patch("subprocess.Popen", wraps=subprocess.Popen) as popen:
+            results = parser.parse()
+        assert {e["username"] for e in results} == {"alice", "bob", "carol"}
+        assert popen.call_count == 1
+        assert not any("exclude" in arg for call in popen.call_args_list for arg in call[0][0])
+
+
+
+# ─── several branches at once ─────────────────────────────────────────────────
+
+class TestParseBranches:
+    def checked_out(self, repo, branch, **kwargs):
+        """The results of parsing *branch* the usual way, by checking it out."""
+        git(repo, "checkout", "-q", branch)
+        try:
+            return GitLogsParser(repo=repo, single_pass=True, **kwargs).parse()
+        finally:
+            git(repo, "checkout", "-q", "main")
+
+    def test_same_as_checking_out_each_branch(self, branchy_repo):
+        git(branchy_repo, "branch", "release/1.0", "HEAD~3")
+        git(branchy_repo, "branch", "release/2.0", "feature")
+        for exclusions in [[], ["*.png", "*.json"], ["**/docs/*.md"]]:
+            kwargs = {"start": "01/01/2024", "end": "12/31/2024", "username": None, "exclusions": exclusions, "clean": True}
+            results = GitLogsParser(repo=branchy_repo, branches=["main", "release/*"], **kwargs).parse()
+            assert [e["branch"] for e in results] == sorted(
+                (e["branch"] for e in results), key=["main", "release/1.0", "release/2.0"].index
+            )
+            for branch in ["main", "release/1.0", "release/2.0"]:
+                expected = self.checked_out(branchy_repo, branch, **kwargs)
+                for entry in expected:
+                    entry["branch"] = branch
+                assert sorted(
+                    (e for e in results if e["branch"] == branch), key=lambda e: e["username"]
+                ) == sorted(expected, key=lambda e: e["username"])
+
+    def test_shared_commits_walked_once(self, branchy_repo):
+        p = GitLogsParser(repo=branchy_repo, start="01/01/2024", end="12/31/2024", username=None, clean=True, branches=["main", "feature"])
+        with patch("subprocess.Popen", wraps=subprocess.Popen) as popen:
+            results = p.parse()
+        commands = [call[0][0][:2] for call in popen.call_args_list]
+        assert commands.count(["git", "log"]) == 1
+        dave = [(e["branch"], e["commits"]) for e in results if e["username"] == "dave"]
+        assert dave == [("main", 2), ("feature", 2)]
+
+    def test_branch_column_follows_repository(self, git_repo):
+        p = GitLogsParser(repo=git_repo, start="01/01/2024", end="12/31/2024", username="bob", branches=["main"])
+        assert list(p.parse()[0]) == ["username", "repository", "branch", "start_date", "end_date", "commits", "insertions", "deletions", "files"]
+
+    def test_no_branches_matched(self, git_repo):
+        p = GitLogsParser(repo=git_repo, start="01/01/2024", end="12/31/2024", username=None, branches=["nope/*"])
+        assert p.parse() == []
+
+    def test_cache_key_changes_with_any_branch(self, branchy_repo):
+        kwargs = {"repo": branchy_repo, "start": "01/01/2024", "end": "12/31/2024", "username": None, "branches": ["*"]}
+        key = GitLogsParser(**kwargs).cache_key()
+        git(branchy_repo, "checkout", "-q", "feature")
+        commit(branchy_repo, "dave", "2024-05-01T10:00:00")
+        git(branchy_repo, "checkout", "-q", "main")
+        assert GitLogsParser(**kwargs).cache_key() != key
+
+
+
+# ─── buckets of time ─────────────────────────────────────────────────────────
+
+class TestParseBuckets:
+    KWARGS = {"start": "01/01/2024", "end": "12/31/2024", "username": None, "clean": True}
+
+    def test_monthly_rows(self, git_repo):
+        results = GitLogsParser(repo=git_repo, bucket="month", **self.KWARGS).parse()
+        assert [(e["username"], e["start_date"], e["end_date"], e["commits"]) for e in results] == [
+            ("alice", "01/01/2024", "01/31/2024", 1),
+            ("alice", "02/01/2024", "02/29/2024", 1),
+            ("bob", "02/01/2024", "02/29/2024", 1),
+            ("carol", "03/01/2024", "03/31/2024", 1),
+            ("bob", "06/01/2024", "06/30/2024", 1),
+        ]
+
+    def test_buckets_add_up_to_totals(self, branchy_repo):
+        for bucket in ["day", "week", "month"]:
+            for kwargs in [{}, {"exclusions": ["*.png"]}, {"backend": "python"}, {"match_exclusions": "python", "exclusions": ["*.json"]}]:
+                totals = {}
+                for e in GitLogsParser(repo=branchy_repo, bucket=bucket, **kwargs, **self.KWARGS).parse():
+                    counts = totals.setdefault(e["username"], [0, 0, 0, 0])
+                    for j, key in enumerate(["commits", "files", "insertions", "deletions"]):
+                        counts[j] += e[key]
+                expected = {
+                    e["username"]: [e["commits"], e["files"], e["insertions"], e["deletions"]]
+                    for e in GitLogsParser(repo=branchy_repo, single_pass=True, **kwargs, **self.KWARGS).parse()
+                }
+                assert totals == expected
+
+    def test_one_walk_of_the_logs(self, git_repo):
+        p = GitLogsParser(repo=git_repo, bucket="day", **self.KWARGS)
+        with patch("subprocess.Popen", wraps=subprocess.Popen) as popen:
+            p.parse()
+        assert popen.call_count == 1
+
+    def test_commits_from_the_day_before_the_start_in_first_bucket(self, git_repo):
+        # git's --after is given the day before the start date, so commits made then are counted too
+        results = GitLogsParser(repo=git_repo, start="01/11/2024", end="01/31/2024", username=None, clean=True, bucket="week").parse()
+        assert [(e["username"], e["start_date"]) for e in results] == [("alice", "01/11/2024")]
+
+    def test_same_from_store(self, git_repo, tmp_path):
+        for username in [None, "bob"]:
+            kwargs = dict(self.KWARGS, username=username)
+            expected = GitLogsParser(repo=git_repo, bucket="week", **kwargs).parse()
+            store = CommitStore(str(tmp_path / f"{username}.jsonl"))
+            assert GitLogsParser(repo=git_repo, bucket="week", store=store, **kwargs).parse() == expected
+
+    def test_every_format(self, git_repo):
+        p = GitLogsParser(repo=git_repo, bucket="month", **self.KWARGS)
+        results = p.parse()
+        assert p.format_results(results, "csv").count("\n") == len(results) + 1
+        assert len(json.loads(p.format_results(results, "json"))) == len(results)
+        assert "| 06/01/2024 | 06/30/2024 |" in p.format_results(results, "markdown")
+
+
+
+
+# ─── batch queries ───────────────────────────────────────────────────────────
+
+class TestParseQueries:
+    QUERIES = [
+        (None, "01/01/2024", "12/31/2024"),
+        ("alice", "01/01/2024", "02/29/2024"),
+        ("bob", "02/01/2024", "06/30/2024"),
+        ("bob", "03/01/2024", "05/31/2024"),
+        (None, "02/10/2024", "03/05/2024"),
+        ("ann", "01/01/2024", "12/31/2024"),
+    ]
+
+    def expected(self, repo, query, **kwargs):
+        username, start, end = query
+        return GitLogsParser(repo=repo, start=start, end=end, username=username, single_pass=True, **kwargs).parse()
+
+    def by_user(self, results):
+        return sorted(results, key=lambda e: e["username"])
+
+    @pytest.mark.parametrize("clean", [True, False])
+    def test_same_as_parsing_each_query(self, git_repo, clean):
+        p = GitLogsParser(repo=git_repo, start=None, end=None, username=None, exclusions=["*.png"], clean=clean)
+        for query, results in zip(self.QUERIES, p.parse_queries(self.QUERIES)):
+            assert self.by_user(results) == self.by_user(self.expected(git_repo, query, exclusions=["*.png"], clean=clean))
+
+    def test_same_from_store(self, aliased_repo, tmp_path):
+        aliases = Aliases.parse(TestAliases.ALIASES)
+        queries = self.QUERIES + [("Alice", "06/01/2024", "07/31/2024")]
+        p = GitLogsParser(repo=aliased_repo, start=None, end=None, username=None, clean=True, aliases=aliases, store=CommitStore(str(tmp_path / "commits.jsonl")))
+        for query, results in zip(queries, p.parse_queries(queries)):
+            assert self.by_user(results) == self.by_user(self.expected(aliased_repo, query, clean=True, aliases=aliases))
+
+    def test_one_walk_of_the_logs(self, git_repo):
+        p = GitLogsParser(repo=git_repo, start=None, end=None, username=None, clean=True)
+        with patch("subprocess.Popen", wraps=subprocess.Popen) as popen:
+            p.parse_queries(self.QUERIES * 10)
+        assert popen.call_count == 1
+
+    def test_no_queries(self, git_repo):
+        assert GitLogsParser(repo=git_repo, start=None, end=None, username=None).parse_queries([]) == []
+
+
+# ─── churn ───────────────────────────────────────────────────────────────────
+
+class TestParseChurn:
+    KWARGS = {"start": "01/01/2024", "end": "12/31/2024", "clean": True}
+
+    def test_files_add_up_to_contributions(self, branchy_repo):
+        for kwargs in [{"username": None}, {"username": "bob"}, {"username": None, "exclusions": ["*.png", "*.json"]}]:
+            totals = {}
+            for e in GitLogsParser(repo=branchy_repo, **self.KWARGS, **kwargs).parse_churn(top=1000):
+                if e["kind"] == "file":
+                    counts = totals.setdefault(e["username"], [0, 0, 0])
+                    for j, key in enumerate(["commits", "insertions", "deletions"]):
+                        counts[j] += e[key]
+            expected = {
+                e["username"]: [e["files"], e["insertions"], e["deletions"]]
+                for e in GitLogsParser(repo=branchy_repo, single_pass=True, **self.KWARGS, **kwargs).parse()
+            }
+            assert totals == expected
+
+    def test_most_churned_first(self, git_repo):
+        results = GitLogsParser(repo=git_repo, username="alice", **self.KWARGS).parse_churn()
+        assert [(e["kind"], e["path"], e["commits"], e["insertions"], e["deletions"]) for e in results] == [
+            ("file", "lib.py", 1, 3, 0),
+            ("file", "app.py", 1, 2, 0),
+            ("file", "README.md", 1, 1, 0),
+            ("file", "logo.png", 1, 0, 0),
+        ]
+        assert len(GitLogsParser(repo=git_repo, username="alice", **self.KWARGS).parse_churn(top=2)) == 2
+        assert list(results[0]) == ["username", "repository", "start_date", "end_date", "kind", "path", "commits", "insertions", "deletions"]
+
+    def test_directories(self, git_repo):
+        write(git_repo, "src/app/main.py", "a\nb\n")
+        write(git_repo, "src/util.py", "c\n")
+        git(git_repo, "add", "-A")
+        commit(git_repo, "dave", "2024-07-01T12:00:00", "src")
+        results = GitLogsParser(repo=git_repo, username="dave", **self.KWARGS).parse_churn()
+        assert [(e["path"], e["commits"], e["insertions"]) for e in results if e["kind"] == "directory"] == [
+            ("src/", 1, 3),
+            ("src/app/", 1, 2),
+        ]
+
+    def test_per_bucket(self, git_repo):
+        results = GitLogsParser(repo=git_repo, username=None, bucket="month", **self.KWARGS).parse_churn()
+        assert [(e["username"], e["start_date"], e["end_date"], e["path"]) for e in results][:5] == [
+            ("alice", "01/01/2024", "01/31/2024", "app.py"),
+            ("alice", "01/01/2024", "01/31/2024", "README.md"),
+            ("alice", "02/01/2024", "02/29/2024", "lib.py"),
+            ("alice", "02/01/2024", "02/29/2024", "logo.png"),
+            ("bob", "02/01/2024", "02/29/2024", "app.py"),
+        ]
+
+    def test_one_walk_of_the_logs(self, git_repo):
+        p = GitLogsParser(repo=git_repo, username=None, **self.KWARGS)
+        with patch("subprocess.Popen", wraps=subprocess.Popen) as popen:
+            p.parse_churn()
+        assert popen.call_count == 1
+
+    def test_every_format(self, git_repo):
+        p = GitLogsParser(repo=git_repo, username=None, **self.KWARGS)
+        results = p.parse_churn()
+        assert p.format_results(results, "csv").splitlines()[0] == "username,repository,start_date,end_date,kind,path,commits,insertions,deletions"
+        assert json.loads(p.format_results(results, "json")) == results
+
+# ─── identity resolution ─────────────────────────────────────────────────────
+
+@pytest.fixture
+def aliased_repo(git_repo):
+    """The sample repository, with commits by alice under other names and emails, and by anna, whose name contains "ann"."""
+    for name, email, date in [
+        ("Alice Smith", "alice@example.com", "2024-07-01T10:00:00"),
+        ("ally", "ally@school.edu", "2024-07-02T10:00:00"),
+        ("anna", "anna@example.com", "2024-07-03T10:00:00"),
+        ("ann", "ann@example.com", "2024-07-04T10:00:00"),
+    ]:
+        write(git_repo, f"{name}.txt", f"{name}\n{date}\n")
+        git(git_repo, "add", "-A")
+        env = dict(os.environ, GIT_AUTHOR_NAME=name, GIT_AUTHOR_EMAIL=email, GIT_COMMITTER_NAME=name, GIT_COMMITTER_EMAIL=email, GIT_AUTHOR_DATE=date, GIT_COMMITTER_DATE=date)
+        git(git_repo, "commit", "-q", "-m", "change", env=env)
+    return git_repo
+
+
+class TestAliases:
+    ALIASES = "Alice: alice, alice@example.com, ally@school.edu\nAnn: ann\n"
+    KWARGS = {"start": "01/01/2024", "end": "12/31/2024", "clean": True}
+
+    def commits_by_user(self, repo, **kwargs):
+        results = GitLogsParser(repo=repo, aliases=Aliases.parse(self.ALIASES), **dict(self.KWARGS, **kwargs)).parse()
+        return {e["username"]: e["commits"] for e in results}
+
+    def test_identities_merged(self, aliased_repo):
+        assert self.commits_by_user(aliased_repo, username=None) == {"Ann": 1, "anna": 1, "Alice": 4, "carol": 1, "bob": 2}
+
+    def test_username_matched_exactly(self, aliased_repo):
+        assert self.commits_by_user(aliased_repo, username="Ann") == {"Ann": 1}
+        assert self.commits_by_user(aliased_repo, username="alice") == {"alice": 4}
+        assert self.commits_by_user(aliased_repo, username="ally") == {}  # an email alias, not a name
+        # without aliases, git's --author pattern matches anna's commits too
+        assert GitLogsParser(repo=aliased_repo, username="ann", single_pass=True, **self.KWARGS).parse()[0]["commits"] == 2
+
+    def test_mailmap_applied_first(self, aliased_repo):
+        write(aliased_repo, ".mailmap", "Ann <anna@example.com>\n")
+        assert self.commits_by_user(aliased_repo, username=None)["Ann"] == 2
+
+    def test_one_walk_of_the_logs(self, aliased_repo):
+        p = GitLogsParser(repo=aliased_repo, username=None, aliases=Aliases.parse(self.ALIASES), **self.KWARGS)
+        with patch("subprocess.Popen", wraps=subprocess.Popen) as popen:
+            p.parse()
+        assert popen.call_count == 1
+
+    def test_same_in_every_mode(self, aliased_repo, tmp_path):
+        for username in [None, "Alice", "ann"]:
+            expected = self.commits_by_user(aliased_repo, username=username)
+            assert self.commits_by_user(aliased_repo, username=username, backend="python") == expected
+            assert self.commits_by_user(aliased_repo, username=username, match_exclusions="python") == expected
+            store = CommitStore(str(tmp_path / f"{username}.jsonl"))
+            assert self.commits_by_user(aliased_repo, username=username, store=store) == expected
+            by_bucket = {}
+            for e in GitLogsParser(repo=aliased_repo, username=username, bucket="month", aliases=Aliases.parse(self.ALIASES), **self.KWARGS).parse():
+                by_bucket[e["username"]] = by_bucket.get(e["username"], 0) + e["commits"]
+            assert by_bucket == expected
+
+    def test_iter_commits_by_canonical_id(self, aliased_repo):
+        p = GitLogsParser(repo=aliased_repo, username="Alice", aliases=Aliases.parse(self.ALIASES), **self.KWARGS)
+        assert sorted(commit.author for commit in p.iter_commits()) == ["Alice Smith", "alice", "alice", "ally"]
+
+    def test_cache_key_changes_with_aliases(self, git_repo):
+        keys = {
+            GitLogsParser(repo=git_repo, username=None, aliases=aliases, **self.KWARGS).cache_key()
+            for aliases in [None, Aliases.parse(self.ALIASES), Aliases.parse("Alice: bob")]
+        }
+        assert len(keys) == 3
+
+
+# ─── working directory independence ──────────────────────────────────────────
+
+class TestWorkingDirectory:
+    def test_repository_env_vars_not_passed_to_git(self):
+        p = make_parser(username="alice")
+        with patch.dict(os.environ, {"GIT_DIR": "/elsewhere/.git", "GIT_WORK_TREE": "/elsewhere"}), \
+             patch("subprocess.Popen", git_mock(GIT_LOG_EMPTY)) as mock_popen:
+            p.parse()
+        env = mock_popen.call_args[1]["env"]
+        assert "GIT_DIR" not in env and "GIT_WORK_TREE" not in env
+
+    def test_every_git_call_has_working_directory(self):
+        p = make_parser(repo="/some/path", single_pass=True, clean=False)
+        with patch("subprocess.Popen", git_mock(GIT_LOG_EMPTY, ["alice\n"])) as mock_popen:
+            p.parse()
+        assert mock_popen.call_count == 2
+        assert all(call[1]["cwd"] == "/some/path" for call in mock_popen.call_args_list)
+
+    def test_parsers_run_side_by_side_in_threads(self, git_repo_factory):
+        repos = [
+            git_repo_factory("one", [("alice", "2024-01-10T12:00:00", {"a.txt": "1\n"})]),
+            git_repo_factory("two", [("bob", "2024-01-10T12:00:00", {"b.txt": "1\n2\n"})]),
+        ]
+        cwd = os.getcwd()
+        results = {}
+
+        def run(repo):
+            parser = GitLogsParser(repo=repo, start="01/01/2024", end="12/31/2024", username=None, clean=True)
+            results[repo] = parser.parse()
+
+        threads = [threading.Thread(target=run, args=(repo,)) for repo in repos * 3]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert os.getcwd() == cwd
+        assert [e["username"] for e in results[repos[0]]] == ["alice"]
+        assert [e["insertions"] for e in results[repos[1]]] == [2]
+
+
 # ─── JSON output validity ─────────────────────────────────────────────────────
 
 class TestJsonOutputValidity:
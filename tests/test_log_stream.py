@@ -0,0 +1,255 @@
+"""
+Unit tests for the streaming git log reader, including an equivalence check
+against the whole-output regular expressions parse() used before it.
+"""
+
+import random
+import re
+
+from gitlogstats.log_stream import Commit, CommitFiles, iter_commit_files, iter_commits, iter_numstat_commits, iter_records, simplify_history
+
+# ─── Reference implementation ────────────────────────────────────────────────
+
+LEGACY_PATTERN = re.compile(
+    r"commit ([a-zA-Z0-9]+).*\nAuthor:\s(.*)\s<((.*))>.*\nDate:\s(.*)\n\n(.*)\n\n(.*?(\d+) file[s]? changed)?(.*?(\d+) insertion[s]?)?(.*?(\d+) deletion[s]?)?"
+)
+
+
+def legacy_totals(logs):
+    """The commits, files, insertions and deletions the old regex-based parse() found in *logs*."""
+    totals = {
+        "commits": len(re.findall("commit [a-z0-9]+\n", logs)),
+        "files": 0,
+        "insertions": 0,
+        "deletions": 0,
+    }
+    for match in re.finditer(LEGACY_PATTERN, logs):
+        totals["files"] += int(match.group(8)) if match.group(8) else 0
+        totals["insertions"] += int(match.group(10)) if match.group(10) else 0
+        totals["deletions"] += int(match.group(12)) if match.group(12) else 0
+    return totals
+
+
+def streamed_totals(logs):
+    """The same totals, as found by the streaming reader."""
+    totals = {"commits": 0, "files": 0, "insertions": 0, "deletions": 0}
+    for commit in iter_commits(logs.splitlines(keepends=True)):
+        totals["commits"] += 1
+        totals["files"] += commit.files
+        totals["insertions"] += commit.insertions
+        totals["deletions"] += commit.deletions
+    return totals
+
+
+def random_log(rng, commits):
+    """Generate git log --shortstat output in git's default format, with one-line commit messages."""
+    words = ["fix", "add", "update", "files", "tests", "insertions", "readme", "1", "42"]
+    chunks = []
+    for _ in range(commits):
+        sha = "".join(rng.choice("0123456789abcdef") for _ in range(40))
+        name = rng.choice(["alice", "bob", "Carol King", "d4n"])
+        chunk = f"commit {sha}\n"
+        if rng.random() < 0.1:
+            chunk += f"Merge: {sha[:7]} {sha[7:14]}\n"
+        chunk += f"Author: {name} <{name.replace(' ', '.')}@example.com>\n"
+        chunk += "Date:   Mon Jan 15 12:00:00 2024 -0500\n\n"
+        chunk += "    " + " ".join(rng.choice(words) for _ in range(rng.randrange(1, 6))) + "\n"
+        if not chunk.startswith("Merge", chunk.index("\n") + 1) and rng.random() < 0.9:
+            files = rng.randrange(1, 30)
+            stat = f" {files} file{'s' if files > 1 else ''} changed"
+            insertions, deletions = rng.randrange(0, 500), rng.randrange(0, 500)
+            if insertions or rng.random() < 0.5:
+                stat += f", {insertions} insertion{'s' if insertions != 1 else ''}(+)"
+            if deletions or rng.random() < 0.5:
+                stat += f", {deletions} deletion{'s' if deletions != 1 else ''}(-)"
+            chunk += "\n" + stat + "\n"
+        chunks.append(chunk)
+    return "\n".join(chunks)
+
+
+# ─── iter_commits ────────────────────────────────────────────────────────────
+
+class TestIterCommits:
+    def test_default_format(self):
+        logs = (
+            "commit abc123\n"
+            "Author: alice <alice@example.com>\n"
+            "Date:   Mon Jan 15 12:00:00 2024 -0500\n"
+            "\n"
+            "    Added new feature\n"
+            "\n"
+            " 3 files changed, 45 insertions(+), 12 deletions(-)\n"
+        )
+        assert list(iter_commits(logs.splitlines(keepends=True))) == [
+            Commit("abc123", "alice", "alice@example.com", 3, 45, 12)
+        ]
+
+    def test_single_pass_format(self):
+        logs = "commit abc123\t1705320000\tcarol@example.com\tCarol King\n\n 1 file changed, 1 deletion(-)\n"
+        assert list(iter_commits(logs.splitlines(keepends=True))) == [
+            Commit("abc123", "Carol King", "carol@example.com", 1, 0, 1, 1705320000)
+        ]
+
+    def test_commit_without_stats(self):
+        logs = "commit abc123\t1705320000\tbob@example.com\tbob\ncommit def456\t1705320000\tbob@example.com\tbob\n\n 1 file changed, 2 insertions(+)\n"
+        commits = list(iter_commits(logs.splitlines(keepends=True)))
+        assert [c.files for c in commits] == [0, 1]
+
+    def test_decorations_dropped_from_hash(self):
+        logs = "commit abc123 (HEAD -> main, origin/main)\nAuthor: bob <b@x.org>\n"
+        assert next(iter_commits(iter(logs.splitlines(keepends=True)))).sha == "abc123"
+
+    def test_multi_line_message_does_not_hide_stats(self):
+        logs = (
+            "commit abc123\n"
+            "Author: alice <alice@example.com>\n"
+            "Date:   Mon Jan 15 12:00:00 2024 -0500\n"
+            "\n"
+            "    Subject line\n"
+            "\n"
+            "    A body that mentions 3 files changed\n"
+            "    commit deadbeef\n"
+            "\n"
+            " 2 files changed, 5 insertions(+)\n"
+        )
+        commits = list(iter_commits(logs.splitlines(keepends=True)))
+        assert len(commits) == 1
+        assert (commits[0].files, commits[0].insertions) == (2, 5)
+
+    def test_empty_output(self):
+        assert list(iter_commits([])) == []
+
+    def test_consumes_input_lazily(self):
+        def lines():
+            yield "commit abc123\t1705320000\tbob@example.com\tbob\n"
+            yield "commit def456\t1705320000\tbob@example.com\tbob\n"
+            raise AssertionError("read past the second commit header")
+
+        assert next(iter_commits(lines())).sha == "abc123"
+
+
+
+# ─── git log -m --numstat -z output ──────────────────────────────────────────
+
+
+def numstat_commits(output, excluded=(), recount=None, before=None):
+    """The commits git would show of those read out of git log -m --numstat -z *output*, leaving out the *excluded* paths."""
+    records = iter_records(output.splitlines(keepends=True))
+    return simplify_history(iter_numstat_commits(records, lambda path: path in excluded, recount), before)
+
+
+class TestIterRecords:
+    def test_records_split_across_lines(self):
+        lines = ["commit a\0\n1\t2\tx", ".py\0\n", "commit b\0"]
+        assert list(iter_records(lines)) == ["commit a", "\n1\t2\tx.py", "\ncommit b"]
+
+    def test_unterminated_last_record(self):
+        assert list(iter_records(["a\0b"])) == ["a", "b"]
+
+
+class TestIterNumstatCommits:
+    HEADER = "commit {}\t{}\t{}\t{}\talice@example.com\talice\0"
+
+    def header(self, sha, parents="p", tree="t", timestamp=1700000000):
+        return self.HEADER.format(sha, timestamp, tree, parents)
+
+    def test_stats_summed_and_excluded_files_left_out(self):
+        output = self.header("a") + "\n3\t1\tapp.py\0" + "-\t-\tlogo.png\0" + "5\t0\tdata.json\0"
+        assert numstat_commits(output, excluded={"data.json"}) == [
+            Commit("a", "alice", "alice@example.com", 2, 3, 1, 1700000000)
+        ]
+
+    def test_commit_of_excluded_files_only_left_out(self):
+        output = self.header("a", "b") + "\n1\t0\tdata.json\0" + self.header("b", "") + "\n1\t0\tapp.py\0"
+        assert [c.sha for c in numstat_commits(output, excluded={"data.json"})] == ["b"]
+
+    def test_commit_without_changes_left_out(self):
+        assert numstat_commits(self.header("a")) == []
+
+    def test_rename_counted_once(self):
+        output = self.header("a") + "\n2\t1\t\0old.py\0new.py\0"
+        assert numstat_commits(output)[0][3:6] == (1, 2, 1)
+
+    def test_rename_of_excluded_files_left_out(self):
+        output = self.header("a") + "\n2\t1\t\0old.json\0new.json\0"
+        assert numstat_commits(output, excluded={"old.json", "new.json"}) == []
+
+    def test_rename_between_excluded_and_included_file_recounted(self):
+        output = self.header("a") + "\n0\t0\t\0data.json\0data.py\0"
+        recounted = []
+
+        def recount(sha):
+            recounted.append(sha)
+            return 1, 10, 0
+
+        assert numstat_commits(output, excluded={"data.json"}, recount=recount)[0][3:6] == (1, 10, 0)
+        assert recounted == ["a"]
+
+    def test_merge_kept_only_if_it_differs_from_every_parent(self):
+        both = self.header("m", "p q") + "\n1\t0\tapp.py\0" + self.header("m", "p q") + "\n2\t0\tlib.py\0"
+        assert numstat_commits(both) == [Commit("m", "alice", "alice@example.com", 0, 0, 0, 1700000000)]
+        one = self.header("m", "p q") + "\n1\t0\tapp.py\0" + self.header("m", "p q") + "\n1\t0\tdata.json\0"
+        assert numstat_commits(one, excluded={"data.json"}) == []
+
+    def test_history_of_parents_not_followed_left_out(self):
+        # m took every included file from p, so git follows p alone, and never walks q
+        q = self.header("q", "p", tree="t2") + "\n1\t0\tapp.py\0"
+        p = self.header("p", "", tree="t1") + "\n1\t0\tapp.py\0"
+        identical = self.header("m", "p q", tree="t1") + "\n0\t1\tapp.py\0"  # no diff is logged against p
+        assert [c.sha for c in numstat_commits(identical + q + p)] == ["p"]
+        excluded = self.header("m", "p q", tree="t3") + "\n1\t0\tdata.json\0" + self.header("m", "p q", tree="t3") + "\n0\t1\tapp.py\0"
+        assert [c.sha for c in numstat_commits(excluded + q + p, excluded={"data.json"})] == ["p"]
+        assert [c.sha for c in numstat_commits(excluded + q + p)] == ["m", "q", "p"]
+
+    def test_parent_before_the_walk_identical_by_elimination(self):
+        # q was walked and differs from m, so the diff logged is against q, and m is the same as p, which was not walked
+        output = self.header("m", "p q", tree="t1") + "\n1\t0\tapp.py\0" + self.header("q", "p", tree="t2") + "\n1\t0\tapp.py\0"
+        assert numstat_commits(output) == []
+
+    def test_commits_after_before_followed_but_left_out(self):
+        newest = self.header("m", "p q", tree="t1", timestamp=1800000000)
+        q = self.header("q", "p", tree="t2") + "\n1\t0\tapp.py\0"
+        p = self.header("p", "", tree="t1") + "\n1\t0\tapp.py\0"
+        assert [c.sha for c in numstat_commits(newest + "\n0\t1\tapp.py\0" + q + p, before=1700000000)] == ["p"]
+
+    def test_consumes_input_lazily(self):
+        def records():
+            yield self.header("a")[:-1]
+            yield "\n1\t0\tapp.py"
+            yield self.header("b")[:-1]
+            yield "\n1\t0\tapp.py"
+            raise AssertionError("read past the second commit")
+
+        assert next(iter_numstat_commits(records(), lambda path: False)).commit.sha == "a"
+
+
+# ─── Equivalence with the old regex ──────────────────────────────────────────
+
+class TestEquivalenceWithRegex:
+    def test_random_logs_match_regex_totals(self):
+        rng = random.Random(1234)
+        for _ in range(200):
+            logs = random_log(rng, rng.randrange(0, 25))
+            assert streamed_totals(logs) == legacy_totals(logs), logs
+
+
+class TestIterCommitFiles:
+    HEADER = "commit {}\t1700000000\talice@example.com\talice\0"
+
+    def commit_files(self, output):
+        return list(iter_commit_files(iter_records([output])))
+
+    def test_changes_to_each_file(self):
+        output = self.HEADER.format("a") + "\n3\t1\tsrc/app.py\0" + "-\t-\tlogo.png\0" + self.HEADER.format("b") + "\n1\t0\tREADME.md\0"
+        assert self.commit_files(output) == [
+            CommitFiles("a", "alice", "alice@example.com", 1700000000, [("src/app.py", 3, 1), ("logo.png", 0, 0)]),
+            CommitFiles("b", "alice", "alice@example.com", 1700000000, [("README.md", 1, 0)]),
+        ]
+
+    def test_rename_attributed_to_new_path(self):
+        output = self.HEADER.format("a") + "\n2\t1\t\0old.py\0lib/new.py\0" + "1\t1\tapp.py\0"
+        assert self.commit_files(output)[0].changes == [("lib/new.py", 2, 1), ("app.py", 1, 1)]
+
+    def test_commits_without_changes_left_out(self):
+        output = self.HEADER.format("merge") + self.HEADER.format("a") + "\n1\t0\tapp.py\0"
+        assert [c.sha for c in self.commit_files(output)] == ["a"]
@@ -0,0 +1,32 @@
+"""
+Unit tests for reading .mailmap files.
+"""
+
+from gitlogstats.mailmap import Mailmap
+
+
+def test_proper_name():
+    mailmap = Mailmap.parse("Alice Smith <alice@example.com>\n")
+    assert mailmap.map("alice", "alice@example.com") == ("Alice Smith", "alice@example.com")
+
+
+def test_proper_email():
+    mailmap = Mailmap.parse("<alice@example.org> <alice@example.com>\n")
+    assert mailmap.map("alice", "alice@example.com") == ("alice", "alice@example.org")
+
+
+def test_proper_name_and_email():
+    mailmap = Mailmap.parse("Alice Smith <alice@example.org> <alice@example.com>\n")
+    assert mailmap.map("alice", "ALICE@example.com") == ("Alice Smith", "alice@example.org")
+
+
+def test_only_one_name_mapped():
+    mailmap = Mailmap.parse("Alice Smith <alice@example.org> alice <shared@example.com>\n")
+    assert mailmap.map("Alice", "shared@example.com") == ("Alice Smith", "alice@example.org")
+    assert mailmap.map("bob", "shared@example.com") == ("bob", "shared@example.com")
+
+
+def test_comments_and_unmapped_authors():
+    mailmap = Mailmap.parse("# Robert <bob@example.com>\n")
+    assert not mailmap
+    assert mailmap.map("bob", "bob@example.com") == ("bob", "bob@example.com")
@@ -0,0 +1,82 @@
+"""
+Unit tests for the concurrent fetch and parse pipeline.
+"""
+
+import asyncio
+import os
+import subprocess
+import threading
+
+import pytest
+
+from gitlogstats.pipeline import run_pipeline
+from gitlogstats.repositories import update_repository_async
+
+from conftest import git
+
+
+class TestRunPipeline:
+    def test_results_emitted_in_url_order(self):
+        delays = {"a": 0.05, "b": 0.0, "c": 0.02}
+
+        async def fetch(url):
+            await asyncio.sleep(delays[url])
+            return f"/repos/{url}"
+
+        emitted = []
+        run_pipeline(["a", "b", "c"], fetch, lambda url, path: (url, path), emitted.append, connections=3, jobs=2)
+        assert emitted == [("a", "/repos/a"), ("b", "/repos/b"), ("c", "/repos/c")]
+
+    def test_connection_limit_respected(self):
+        active, peak = 0, 0
+
+        async def fetch(url):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return url
+
+        run_pipeline([str(i) for i in range(10)], fetch, lambda url, path: url, lambda result: None, connections=3)
+        assert peak == 3
+
+    def test_parsing_overlaps_fetching(self):
+        events = []
+        lock = threading.Lock()
+
+        async def fetch(url):
+            await asyncio.sleep(0.05 if url == "slow" else 0)
+            with lock:
+                events.append(f"fetched {url}")
+            return url
+
+        def parse(url, path):
+            with lock:
+                events.append(f"parsed {url}")
+
+        run_pipeline(["fast", "slow"], fetch, parse, lambda result: None, connections=2, jobs=2)
+        assert events.index("parsed fast") < events.index("fetched slow")
+
+    def test_parse_errors_propagate(self):
+        async def fetch(url):
+            return url
+
+        def parse(url, path):
+            raise ValueError(url)
+
+        with pytest.raises(ValueError):
+            run_pipeline(["a"], fetch, parse, lambda result: None)
+
+
+class TestUpdateRepositoryAsync:
+    def test_clones_then_pulls(self, git_repo, tmp_path):
+        repos_dir = str(tmp_path / "repos")
+        repo_dir = asyncio.run(update_repository_async("file://" + git_repo, repos_dir))
+        assert os.path.exists(os.path.join(repo_dir, "README.md"))
+        assert asyncio.run(update_repository_async("file://" + git_repo, repos_dir)) == repo_dir
+        assert git(repo_dir, "rev-parse", "HEAD") == git(git_repo, "rev-parse", "HEAD")
+
+    def test_failed_command_raises(self, tmp_path):
+        with pytest.raises(subprocess.CalledProcessError):
+            asyncio.run(update_repository_async(str(tmp_path / "missing"), str(tmp_path / "repos")))
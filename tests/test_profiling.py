@@ -0,0 +1,122 @@
+"""
+Unit tests for measuring where the time of a run goes.
+"""
+
+import json
+import subprocess
+import threading
+import time
+
+import pytest
+
+from gitlogstats import GitLogsParser
+from gitlogstats.profiling import Profiler
+
+
+class TestPhases:
+    def test_nested_phase_not_counted_twice(self):
+        profiler = Profiler()
+        with profiler.phase("repo", "log"):
+            time.sleep(0.02)
+            with profiler.phase("repo", "git"):
+                time.sleep(0.05)
+        phases = profiler.to_dict()["repositories"]["repo"]
+        assert 0.05 <= phases["git"]["wall"] < 0.1
+        assert 0.02 <= phases["log"]["wall"] < 0.05
+
+    def test_iterate_leaves_out_the_callers_time(self):
+        profiler = Profiler()
+
+        def slow():
+            for i in range(3):
+                time.sleep(0.01)
+                yield i
+
+        items = []
+        for item in profiler.iterate("repo", "log", slow):
+            time.sleep(0.03)
+            items.append(item)
+        assert items == [0, 1, 2]
+        assert 0.03 <= profiler.to_dict()["phases"]["log"]["wall"] < 0.09
+
+    def test_counts_go_to_the_current_phase(self):
+        profiler = Profiler()
+        with profiler.phase("repo", "contributors"):
+            profiler.count("repo", subprocesses=1, bytes_read=10)
+        profiler.count("repo", "fetch", subprocesses=2)
+        phases = profiler.to_dict()["repositories"]["repo"]
+        assert phases["contributors"]["subprocesses"] == 1
+        assert phases["contributors"]["bytes_read"] == 10
+        assert phases["fetch"]["subprocesses"] == 2
+
+    def test_threads_measured_apart(self):
+        profiler = Profiler()
+
+        def work(name):
+            with profiler.phase(name, "log"):
+                time.sleep(0.02)
+
+        threads = [threading.Thread(target=work, args=(f"repo{i}",)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        report = profiler.to_dict()
+        assert sorted(report["repositories"]) == ["repo0", "repo1", "repo2", "repo3"]
+        for phases in report["repositories"].values():
+            assert 0.02 <= phases["log"]["wall"] < 0.1
+
+
+class TestReport:
+    def test_json_and_summary(self):
+        profiler = Profiler()
+        profiler.record("repo", "fetch", 1.5)
+        profiler.count("repo", "fetch", subprocesses=1)
+        report = json.loads(json.dumps(profiler.to_dict()))
+        assert report["phases"]["fetch"] == {"wall": 1.5, "cpu": 0.0, "subprocesses": 1, "bytes_read": 0}
+        assert report["peak_rss"] is None or report["peak_rss"] > 0
+        summary = profiler.summary()
+        assert "fetch" in summary and "repo" in summary
+
+    def test_cprofile(self, tmp_path):
+        profiler = Profiler(cprofile=True)
+        with profiler.cprofiled():
+            sorted(range(1000), key=lambda x: -x)
+        path = str(tmp_path / "stats.prof")
+        profiler.dump_cprofile(path)
+        assert (tmp_path / "stats.prof").stat().st_size > 0
+
+    def test_cprofile_off_by_default(self, tmp_path):
+        profiler = Profiler()
+        with profiler.cprofiled():
+            pass
+        profiler.dump_cprofile(str(tmp_path / "stats.prof"))
+        assert not (tmp_path / "stats.prof").exists()
+
+
+class TestParser:
+    def test_same_results_and_git_output_counted(self, git_repo):
+        kwargs = dict(repo=git_repo, start="01/01/2024", end="12/31/2024", username=None, single_pass=True)
+        profiler = Profiler()
+        assert GitLogsParser(profiler=profiler, **kwargs).parse() == GitLogsParser(**kwargs).parse()
+        repo = GitLogsParser.repo_name_from_url(git_repo)
+        phases = profiler.to_dict()["repositories"][repo]
+        assert phases["log"]["subprocesses"] == 1
+        cmd = GitLogsParser(**kwargs).log_command("--after=2023-12-31 00:00:00", "--before=2025-01-01 00:00:00")
+        output = subprocess.run(cmd, cwd=git_repo, capture_output=True, check=True).stdout
+        assert phases["log"]["bytes_read"] == len(output)
+        assert phases["git"]["wall"] > 0
+
+    def test_per_contributor_phases(self, git_repo):
+        profiler = Profiler()
+        parser = GitLogsParser(repo=git_repo, start="01/01/2024", end="12/31/2024", username=None, clean=True, profiler=profiler)
+        results = parser.parse()
+        phases = profiler.to_dict()["repositories"][GitLogsParser.repo_name_from_url(git_repo)]
+        assert phases["contributors"]["subprocesses"] == 1
+        assert phases["log"]["subprocesses"] == len(results)
+
+    def test_errors_still_raised(self, tmp_path):
+        parser = GitLogsParser(repo=str(tmp_path), start="01/01/2024", end="12/31/2024", username=None, profiler=Profiler())
+        with pytest.raises(subprocess.CalledProcessError) as e:
+            parser.get_head()
+        assert "not a git repository" in e.value.stderr
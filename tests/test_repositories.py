@@ -0,0 +1,171 @@
+"""
+Unit tests for cloning and updating repositories.
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from unittest.mock import patch
+
+import pytest
+
+import gitlogstats
+from gitlogstats import GitLogsParser
+from gitlogstats.backends import PythonBackend
+from gitlogstats.repositories import OPTIMIZE_STEPS, has_commit_graph, record_timings, update_repository, update_repository_async
+
+from conftest import git, make_git_repo
+
+
+class TestUpdateRepository:
+    def test_clones_into_named_directory_when_missing(self, tmp_path):
+        with patch("subprocess.run") as mock_run:
+            repo_dir = update_repository("https://github.com/user/my-repo.git", str(tmp_path))
+        assert repo_dir == os.path.join(str(tmp_path), "my-repo")
+        assert mock_run.call_args[0][0] == [
+            "git", "clone", "https://github.com/user/my-repo.git", repo_dir
+        ]
+
+    def test_pulls_in_repo_directory_when_present(self, tmp_path):
+        (tmp_path / "my-repo" / ".git").mkdir(parents=True)
+        with patch("subprocess.run") as mock_run:
+            repo_dir = update_repository("https://github.com/user/my-repo.git", str(tmp_path))
+        assert mock_run.call_args[0][0] == ["git", "pull"]
+        assert mock_run.call_args[1]["cwd"] == repo_dir
+
+    def test_checks_out_branch_in_repo_directory(self, tmp_path):
+        (tmp_path / "my-repo" / ".git").mkdir(parents=True)
+        with patch("subprocess.run") as mock_run:
+            repo_dir = update_repository("https://github.com/user/my-repo.git", str(tmp_path), branch="dev")
+        assert mock_run.call_args[0][0] == ["git", "checkout", "dev"]
+        assert mock_run.call_args[1]["cwd"] == repo_dir
+
+    def test_working_directory_not_changed(self, tmp_path):
+        with patch("subprocess.run"), patch("os.chdir") as mock_chdir:
+            update_repository("https://github.com/user/my-repo.git", str(tmp_path))
+        mock_chdir.assert_not_called()
+
+    def test_repository_env_vars_not_passed_to_git(self, tmp_path):
+        (tmp_path / "my-repo" / ".git").mkdir(parents=True)
+        with patch.dict(os.environ, {"GIT_DIR": "/elsewhere/.git"}), \
+             patch("subprocess.run") as mock_run:
+            update_repository("https://github.com/user/my-repo.git", str(tmp_path))
+        assert "GIT_DIR" not in mock_run.call_args[1]["env"]
+
+
+# ─── Clone modes, against real repositories ──────────────────────────────────
+
+@pytest.fixture
+def origin(git_repo):
+    """The sample repository, served over file:// so shallow and partial clones work as over a network."""
+    git(git_repo, "config", "uploadpack.allowFilter", "true")
+    return "file://" + git_repo
+
+
+def stats(repo_dir, start="01/01/2024"):
+    parser = GitLogsParser(repo=repo_dir, start=start, end="12/31/2024", username=None, clean=True, single_pass=True)
+    return sorted(parser.parse(), key=lambda entry: entry["username"])
+
+
+class TestCloneModes:
+    @pytest.mark.parametrize("clone_mode", ["bare", "blobless", "shallow-since"])
+    def test_no_working_tree(self, origin, tmp_path, clone_mode):
+        repo_dir = update_repository(origin, str(tmp_path / "repos"), clone_mode=clone_mode, since="02/01/2024")
+        assert not os.path.exists(os.path.join(repo_dir, ".git"))
+        assert not os.path.exists(os.path.join(repo_dir, "README.md"))
+
+    @pytest.mark.parametrize("clone_mode", ["full", "bare", "blobless"])
+    def test_same_stats_as_full_clone(self, origin, git_repo, tmp_path, clone_mode):
+        repo_dir = update_repository(origin, str(tmp_path / "repos"), clone_mode=clone_mode)
+        assert stats(repo_dir) == stats(git_repo)
+
+    def test_shallow_since_has_right_stats_from_start_date(self, origin, git_repo, tmp_path):
+        repo_dir = update_repository(origin, str(tmp_path / "repos"), clone_mode="shallow-since", since="02/15/2024")
+        assert os.path.exists(os.path.join(repo_dir, "shallow"))
+        assert stats(repo_dir, start="02/15/2024") == stats(git_repo, start="02/15/2024")
+        count = git(repo_dir, "rev-list", "--count", "HEAD").strip()
+        assert int(count) < len(git(git_repo, "rev-list", "HEAD").split())
+
+    @pytest.mark.parametrize("clone_mode", ["bare", "shallow-since"])
+    def test_update_fetches_new_commits(self, origin, git_repo, tmp_path, clone_mode):
+        update_repository(origin, str(tmp_path / "repos"), clone_mode=clone_mode, since="02/01/2024")
+        make_git_repo(git_repo, [("dave", "2024-07-01T12:00:00", {"d.txt": "d\n"})])
+        repo_dir = update_repository(origin, str(tmp_path / "repos"), clone_mode=clone_mode, since="02/01/2024")
+        assert "dave" in [entry["username"] for entry in stats(repo_dir)]
+
+    def test_bare_clone_reads_branch_without_checkout(self, origin, git_repo, tmp_path):
+        git(git_repo, "branch", "feature", "HEAD~2")
+        repo_dir = update_repository(origin, str(tmp_path / "repos"), branch="feature", clone_mode="bare")
+        assert git(repo_dir, "rev-parse", "HEAD") == git(git_repo, "rev-parse", "feature")
+
+
+class TestOptimizeRepos:
+    @pytest.mark.parametrize("clone_mode", ["full", "bare"])
+    def test_writes_commit_graph_and_multi_pack_index(self, origin, git_repo, tmp_path, clone_mode):
+        timings = {}
+        repo_dir = update_repository(origin, str(tmp_path / "repos"), clone_mode=clone_mode, optimize=True, timings=timings)
+        objects_dir = os.path.join(repo_dir, git(repo_dir, "rev-parse", "--git-path", "objects").strip())
+        assert os.path.exists(os.path.join(objects_dir, "info", "commit-graph"))
+        assert os.path.exists(os.path.join(objects_dir, "pack", "multi-pack-index"))
+        assert set(timings) == set(OPTIMIZE_STEPS)
+        assert all(seconds >= 0 for seconds in timings.values())
+        assert stats(repo_dir) == stats(git_repo)
+        assert has_commit_graph(repo_dir)
+
+    def test_refreshed_after_each_fetch(self, origin, git_repo, tmp_path):
+        update_repository(origin, str(tmp_path / "repos"), clone_mode="bare", optimize=True)
+        make_git_repo(git_repo, [("dave", "2024-07-01T12:00:00", {"d.txt": "d\n"})])
+        repo_dir = asyncio.run(update_repository_async(origin, str(tmp_path / "repos"), clone_mode="bare", optimize=True))
+        head = git(repo_dir, "rev-parse", "HEAD").strip()
+        graph = PythonBackend(repo_dir).graph
+        assert graph is not None and graph.find(bytes.fromhex(head)) is not None
+        assert stats(repo_dir) == stats(git_repo)
+
+    def test_shallow_clone_is_left_without_commit_graph(self, origin, git_repo, tmp_path):
+        repo_dir = update_repository(origin, str(tmp_path / "repos"), clone_mode="shallow-since", since="02/15/2024", optimize=True)
+        assert stats(repo_dir, start="02/15/2024") == stats(git_repo, start="02/15/2024")
+
+    def test_not_optimized_by_default(self, origin, tmp_path):
+        timings = {}
+        repo_dir = update_repository(origin, str(tmp_path / "repos"), clone_mode="bare", timings=timings)
+        assert not os.path.exists(os.path.join(repo_dir, "objects", "info", "commit-graph"))
+        assert timings == {}
+        assert not has_commit_graph(repo_dir)
+
+    def test_parse_timed_with_and_without_optimizing(self, origin, tmp_path):
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(gitlogstats.__file__)))
+        for flags in [["--no-cache"], ["--no-cache", "--optimize-repos"], [], []]:
+            subprocess.run(
+                [sys.executable, "-m", "gitlogstats", "-r", origin, "-s", "01/01/2024", "-e", "12/31/2024", *flags],
+                cwd=tmp_path, env=env, capture_output=True, check=True,
+            )
+        with open(tmp_path / "repos" / ".gitlogstats-timings.jsonl", encoding="utf8") as f:
+            records = [json.loads(line) for line in f]
+        assert [(r["optimized"], r["cached"], "commit_graph" in r) for r in records] == [
+            (False, False, False),
+            (True, False, True),
+            (True, False, False),  # optimized by the run before
+            (True, True, False),
+        ]
+        assert all(r["parse"] >= 0 for r in records)
+
+
+def test_record_timings_appends_lines(tmp_path):
+    path = str(tmp_path / "timings.jsonl")
+    record_timings(path, "https://github.com/user/a.git", {"commit_graph": 0.5, "parse": 1.25})
+    record_timings(path, "https://github.com/user/b.git", {"parse": 2})
+    with open(path, encoding="utf8") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["repository"] for r in records] == ["https://github.com/user/a.git", "https://github.com/user/b.git"]
+    assert records[0]["commit_graph"] == 0.5 and records[0]["parse"] == 1.25
+    assert "date" in records[1]
+
+
+def test_record_timings_with_details(tmp_path):
+    path = str(tmp_path / "timings.jsonl")
+    record_timings(path, "https://github.com/user/a.git", {"parse": 1}, optimized=True, cached=False)
+    with open(path, encoding="utf8") as f:
+        record = json.loads(f.readline())
+    assert (record["optimized"], record["cached"], record["parse"]) == (True, False, 1)
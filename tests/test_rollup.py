@@ -0,0 +1,112 @@
+"""
+Unit tests for rolling up the results of many repositories.
+"""
+
+import csv
+import io
+import os
+import subprocess
+import sys
+
+import pytest
+
+import gitlogstats
+from gitlogstats.rollup import Rollup
+
+
+def row(username, repository, commits, insertions=0, deletions=0, files=0, **fields):
+    entry = {"username": username, "repository": repository, **fields, "start_date": "01/01/2024", "end_date": "12/31/2024"}
+    entry.update(commits=commits, insertions=insertions, deletions=deletions, files=files)
+    return entry
+
+
+FOO = [row("alice", "foo", 3, 30, 3, 6), row("bob", "foo", 1, 10, 1, 1), row("carol", "foo", 0)]
+BAR = [row("bob", "bar", 2, 20, 2, 2), row("alice", "bar", 1, 5, 0, 1)]
+
+
+class TestRollup:
+    def test_user_and_repo_left_as_is(self):
+        rollup = Rollup()
+        assert rollup.add(FOO) == FOO and rollup.add(BAR) == BAR
+        assert rollup.finish() == []
+
+    def test_by_user(self):
+        rollup = Rollup("user")
+        assert rollup.add(FOO) == [] and rollup.add(BAR) == []
+        assert rollup.finish() == [
+            {"username": "alice", "start_date": "01/01/2024", "end_date": "12/31/2024", "repositories": 2, "commits": 4, "insertions": 35, "deletions": 3, "files": 7},
+            {"username": "bob", "start_date": "01/01/2024", "end_date": "12/31/2024", "repositories": 2, "commits": 3, "insertions": 30, "deletions": 3, "files": 3},
+            {"username": "carol", "start_date": "01/01/2024", "end_date": "12/31/2024", "repositories": 0, "commits": 0, "insertions": 0, "deletions": 0, "files": 0},
+        ]
+        assert rollup.finish() == []
+
+    def test_by_repo_written_as_each_is_added(self):
+        rollup = Rollup("repo")
+        assert rollup.add(FOO) == [
+            {"repository": "foo", "start_date": "01/01/2024", "end_date": "12/31/2024", "contributors": 2, "commits": 4, "insertions": 40, "deletions": 4, "files": 7}
+        ]
+        assert [(r["repository"], r["commits"]) for r in rollup.add(BAR)] == [("bar", 3)]
+        assert rollup.finish() == []
+
+    def test_buckets_and_branches_kept_apart(self):
+        rows = [row("alice", "foo", 1, branch="main"), row("alice", "foo", 2, branch="dev"), row("alice", "bar", 4, branch="main")]
+        rows[1]["start_date"] = "02/01/2024"
+        rollup = Rollup("user")
+        rollup.add(rows)
+        assert [(r["branch"], r["start_date"], r["commits"], r["repositories"]) for r in rollup.finish()] == [
+            ("main", "01/01/2024", 5, 2),
+            ("dev", "02/01/2024", 2, 1),
+        ]
+
+    def test_only_one_row_per_user_kept(self):
+        rollup = Rollup("user")
+        for i in range(100):
+            rollup.add([row("alice", f"repo{i}", 1), row("bob", f"repo{i}", 2)])
+        assert len(rollup.totals) == 2
+        assert [(r["username"], r["commits"], r["repositories"]) for r in rollup.finish()] == [("alice", 100, 100), ("bob", 200, 100)]
+
+    def test_rows_without_files(self):
+        churn = [
+            {"username": "alice", "repository": "foo", "kind": "file", "path": "app.py", "commits": 2, "insertions": 5, "deletions": 1},
+            {"username": "bob", "repository": "foo", "kind": "file", "path": "app.py", "commits": 1, "insertions": 1, "deletions": 1},
+        ]
+        assert Rollup("repo").add(churn) == [
+            {"repository": "foo", "kind": "file", "path": "app.py", "contributors": 2, "commits": 3, "insertions": 6, "deletions": 2}
+        ]
+
+    def test_unknown_rollup(self):
+        with pytest.raises(ValueError):
+            Rollup("org")
+
+
+class TestCommandLine:
+    def test_totals_across_repofile(self, git_repo_factory, tmp_path):
+        repos = [git_repo_factory("foo"), git_repo_factory("bar")]
+        (tmp_path / "repos.txt").write_text("\n".join("file://" + repo for repo in repos))
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(gitlogstats.__file__)))
+        result = subprocess.run(
+            [sys.executable, "-m", "gitlogstats", "-rf", "repos.txt", "-s", "01/01/2024", "-e", "12/31/2024", "-c", "--rollup", "user"],
+            cwd=tmp_path, env=env, capture_output=True, text=True, check=True,
+        )
+        rows = list(csv.DictReader(io.StringIO(result.stdout)))
+        assert {r["username"]: (r["repositories"], r["commits"]) for r in rows} == {"alice": ("2", "4"), "bob": ("2", "4"), "carol": ("2", "2")}
+
+    def test_churned_paths_of_each_repository(self, git_repo_factory, tmp_path):
+        repo = git_repo_factory("foo")
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(gitlogstats.__file__)))
+        result = subprocess.run(
+            [sys.executable, "-m", "gitlogstats", "-r", "file://" + repo, "-s", "01/01/2024", "-e", "12/31/2024", "-c", "--report", "churn", "--rollup", "repo"],
+            cwd=tmp_path, env=env, capture_output=True, text=True, check=True,
+        )
+        rows = list(csv.DictReader(io.StringIO(result.stdout)))
+        assert {r["path"]: r["contributors"] for r in rows} == {"lib.py": "2", "app.py": "2", "README.md": "2"}  # logo.png and data.json are excluded by default
+
+    def test_churn_not_rolled_up_across_repositories(self, git_repo_factory, tmp_path):
+        repo = git_repo_factory("foo")
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(gitlogstats.__file__)))
+        result = subprocess.run(
+            [sys.executable, "-m", "gitlogstats", "-r", "file://" + repo, "--report", "churn", "--rollup", "user"],
+            cwd=tmp_path, env=env, capture_output=True, text=True,
+        )
+        assert result.returncode == 2
+        assert "--report churn can not be used with --rollup user" in result.stderr
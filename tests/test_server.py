@@ -0,0 +1,136 @@
+"""
+Unit tests for the server, which answers queries for stats from repositories kept in memory.
+"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+
+import pytest
+
+from gitlogstats import GitLogsParser
+from gitlogstats.constants import DEFAULT_EXCLUSIONS
+from gitlogstats.server import StatsServer, WarmRepository
+
+from conftest import make_git_repo
+
+
+@pytest.fixture
+def origin(git_repo):
+    return "file://" + git_repo
+
+
+@pytest.fixture
+def repository(origin, tmp_path):
+    repository = WarmRepository(origin, str(tmp_path / "repos"), DEFAULT_EXCLUSIONS)
+    assert repository.refresh()
+    return repository
+
+
+@pytest.fixture
+def server(repository):
+    """A server of the sample repository, listening on any free port."""
+    server = StatsServer(("127.0.0.1", 0), [repository])
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get(server, path, method="GET"):
+    host, port = server.server_address[:2]
+    request = urllib.request.Request(f"http://{host}:{port}{path}", method=method)
+    with urllib.request.urlopen(request) as response:
+        return response.status, response.headers["Content-Type"], response.read().decode("utf-8")
+
+
+def expected(repo_dir, start="01/01/2024", end="12/31/2024", username=None):
+    parser = GitLogsParser(
+        repo=repo_dir, start=start, end=end, username=username, exclusions=DEFAULT_EXCLUSIONS, clean=True, single_pass=True
+    )
+    return parser.parse()
+
+
+class TestWarmRepository:
+    def test_same_stats_as_parsing_the_logs(self, repository):
+        assert repository.query("01/01/2024", "12/31/2024") == expected(repository.repo_dir)
+        assert repository.query("02/01/2024", "03/31/2024", "bob") == expected(repository.repo_dir, "02/01/2024", "03/31/2024", "bob")
+
+    def test_queries_do_not_run_git(self, repository):
+        with patch("subprocess.Popen") as popen, patch("subprocess.run") as run:
+            repository.query("01/01/2024", "12/31/2024")
+        popen.assert_not_called()
+        run.assert_not_called()
+
+    def test_refresh_reads_new_commits(self, repository, git_repo):
+        make_git_repo(git_repo, [("dave", "2024-07-01T12:00:00", {"d.txt": "d\n"})])
+        assert "dave" not in [entry["username"] for entry in repository.query("01/01/2024", "12/31/2024")]
+        assert repository.refresh()
+        assert "dave" in [entry["username"] for entry in repository.query("01/01/2024", "12/31/2024")]
+
+    def test_failed_refresh_keeps_error(self, tmp_path):
+        repository = WarmRepository("file://" + str(tmp_path / "missing"), str(tmp_path / "repos"), DEFAULT_EXCLUSIONS)
+        assert not repository.refresh()
+        assert repository.error
+        with pytest.raises(LookupError):
+            repository.query("01/01/2024", "12/31/2024")
+
+
+class TestEndpoints:
+    def test_stats_as_json(self, server, repository):
+        status, content_type, body = get(server, "/stats?repo=sample&start=01/01/2024&end=12/31/2024")
+        assert status == 200 and content_type == "application/json"
+        assert json.loads(body) == expected(repository.repo_dir)
+
+    def test_stats_as_csv_for_one_user(self, server):
+        status, content_type, body = get(server, "/stats?user=alice&start=01/01/2024&end=12/31/2024&format=csv")
+        assert content_type.startswith("text/csv")
+        lines = body.strip().splitlines()
+        assert len(lines) == 2 and "alice" in lines[1]
+
+    def test_stats_by_bucket(self, server):
+        status, content_type, body = get(server, "/stats?start=01/01/2024&end=03/31/2024&bucket=month&format=ndjson")
+        entries = [json.loads(line) for line in body.splitlines()]
+        assert {(entry["username"], entry["start_date"]) for entry in entries} == {
+            ("alice", "01/01/2024"),
+            ("bob", "02/01/2024"),
+            ("alice", "02/01/2024"),
+            ("carol", "03/01/2024"),
+        }
+
+    def test_stats_rolled_up(self, server):
+        status, content_type, body = get(server, "/stats?start=01/01/2024&end=12/31/2024&rollup=repo")
+        [total] = json.loads(body)
+        assert total["repository"] == "sample" and total["contributors"] == 3 and total["commits"] == 5
+
+    def test_repos(self, server, repository):
+        status, content_type, body = get(server, "/repos")
+        [described] = json.loads(body)
+        assert described["name"] == "sample" and described["commits"] == 5 and described["error"] is None
+
+    def test_refresh(self, server, repository, git_repo):
+        make_git_repo(git_repo, [("dave", "2024-07-01T12:00:00", {"d.txt": "d\n"})])
+        with patch.object(server, "refresh_later", wraps=lambda repositories: server.refresh(repositories)) as refresh:
+            status, content_type, body = get(server, "/refresh?repo=sample", method="POST")
+        assert status == 202 and json.loads(body) == {"refreshing": ["sample"]}
+        refresh.assert_called_once_with([repository])
+        assert len(repository.store.commits) == 6
+
+    @pytest.mark.parametrize(
+        "path, status",
+        [
+            ("/stats?repo=unknown", 404),
+            ("/stats?format=xml", 400),
+            ("/stats?bucket=year", 400),
+            ("/stats?rollup=org", 400),
+            ("/stats?start=2024-01-01", 400),
+            ("/nowhere", 404),
+        ],
+    )
+    def test_bad_requests(self, server, path, status):
+        with pytest.raises(urllib.error.HTTPError) as e:
+            get(server, path)
+        assert e.value.code == status
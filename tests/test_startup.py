@@ -0,0 +1,76 @@
+"""
+Regression checks of what is imported at startup, read from python -X importtime, so the command line stays quick to start.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+import gitlogstats
+
+SRC = os.path.dirname(os.path.dirname(gitlogstats.__file__))
+
+# the most microseconds importing gitlogstats may take for --help
+HELP_IMPORT_BUDGET = 10000
+
+
+def imported(*args, cwd=None):
+    """Run python with -X importtime, returning the names of the modules imported and the cumulative microseconds each took."""
+    env = dict(os.environ, PYTHONPATH=SRC)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args], cwd=cwd, env=env, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            self_time, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestStartup:
+    def test_package_import_does_not_load_parser(self):
+        modules = imported("-c", "import gitlogstats")
+        assert "gitlogstats" in modules
+        assert "gitlogstats.git_logs_parser" not in modules
+        assert "subprocess" not in modules
+
+    def test_parser_loaded_on_first_use(self):
+        modules = imported("-c", "from gitlogstats import GitLogsParser")
+        assert "gitlogstats.git_logs_parser" in modules
+
+    def test_unknown_attribute(self):
+        with pytest.raises(AttributeError):
+            gitlogstats.NoSuchThing
+
+    def test_help_loads_only_the_command_line(self):
+        modules = imported("-m", "gitlogstats", "--help")
+        for heavy in [
+            "asyncio",
+            "concurrent.futures",
+            "json",
+            "subprocess",
+            "gitlogstats.backends",
+            "gitlogstats.cache",
+            "gitlogstats.git_logs_parser",
+            "gitlogstats.objects",
+            "gitlogstats.pipeline",
+            "gitlogstats.rollup",
+            "gitlogstats.server",
+        ]:
+            assert heavy not in modules, heavy
+
+    def test_help_imports_quickly(self):
+        modules = imported("-m", "gitlogstats", "--help")
+        # modules imported by others are counted twice, which only makes the budget stricter.  importing the backends alone took over 20ms
+        microseconds = sum(t for name, t in modules.items() if name.split(".")[0] == "gitlogstats")
+        assert microseconds < HELP_IMPORT_BUDGET, modules
+
+    def test_single_repository_run_without_asyncio(self, git_repo, tmp_path):
+        modules = imported("-m", "gitlogstats", "-r", "file://" + git_repo, "--no-cache", cwd=tmp_path)
+        assert "gitlogstats.git_logs_parser" in modules
+        assert "asyncio" not in modules
+        assert "gitlogstats.pipeline" not in modules
@@ -0,0 +1,77 @@
+"""
+Unit tests for the streaming result writers.
+"""
+
+import csv
+import io
+import json
+
+from gitlogstats.writers import ResultWriter, iter_formatted
+
+ROWS = [
+    {"username": "alice", "repository": "myrepo", "commits": 5, "insertions": 120},
+    {"username": "bob", "repository": "myrepo", "commits": 2, "insertions": 40},
+]
+
+
+def write(output_format, *batches):
+    stream = io.StringIO()
+    writer = ResultWriter(stream, output_format)
+    for batch in batches:
+        writer.write(batch)
+    writer.close()
+    return stream.getvalue()
+
+
+class TestResultWriter:
+    def test_json_identical_to_json_dumps(self):
+        for rows in [[], ROWS[:1], ROWS]:
+            assert write("json", rows) == json.dumps(rows)
+
+    def test_json_batches_form_one_array(self):
+        assert json.loads(write("json", ROWS[:1], [], ROWS[1:])) == ROWS
+
+    def test_ndjson_one_object_per_line(self):
+        lines = write("ndjson", ROWS).splitlines()
+        assert [json.loads(line) for line in lines] == ROWS
+
+    def test_csv_heading_written_once(self):
+        lines = write("csv", ROWS[:1], ROWS[1:]).splitlines()
+        assert lines == [
+            "username,repository,commits,insertions",
+            "alice,myrepo,5,120",
+            "bob,myrepo,2,40",
+        ]
+
+    def test_csv_values_with_commas_quoted(self):
+        row = {"username": "Smith, Jo", "commits": 1}
+        output = write("csv", [row])
+        assert list(csv.reader(io.StringIO(output)))[1] == ["Smith, Jo", "1"]
+
+    def test_markdown_table(self):
+        lines = write("markdown", ROWS[:1], ROWS[1:]).splitlines()
+        assert lines[0] == "| username | repository | commits | insertions |"
+        assert lines[1] == "| :---- | :---- | :---- | :---- |"
+        assert lines[3] == "| bob | myrepo | 2 | 40 |"
+
+    def test_no_rows_written_without_results(self):
+        for output_format in ["csv", "ndjson", "markdown"]:
+            assert write(output_format, []) == ""
+
+
+class TestIterFormatted:
+    def test_rows_consumed_as_pieces_are_produced(self):
+        consumed = []
+
+        def rows():
+            for row in ROWS:
+                consumed.append(row["username"])
+                yield row
+
+        pieces = iter_formatted(rows(), "ndjson")
+        assert json.loads(next(pieces)) == ROWS[0]
+        assert consumed == ["alice"]
+
+    def test_pieces_join_to_whole_output(self):
+        for output_format in ["csv", "json", "ndjson", "markdown"]:
+            assert "".join(iter_formatted(iter(ROWS), output_format)) == write(output_format, ROWS)